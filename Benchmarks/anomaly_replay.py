@@ -0,0 +1,180 @@
+# --- anomaly_replay.py (Replay benchmark for CareLinkAnomalyDetector) ---
+#
+# Replays the one-year sample export through the online detector and reports
+# throughput and alert quality against the file's stable/unstable labels:
+#
+#   precision      warnings followed by an unstable reading within --lookahead-hours
+#   episode recall unstable episodes preceded by a warning within --lookahead-hours
+#   lead time      hours between that first warning and the first hard threshold breach
+#
+# With --persist every reading goes through observe() against the in-memory
+# DynamoDB fake, so the cost of loading and saving state is included.
+#
+# Usage:
+#   python anomaly_replay.py
+#   python anomaly_replay.py --cusum-h 6 --alpha 0.05 --persist --patients 20
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import carelink_fakes
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_DIR = os.path.join(REPO_ROOT, "Lambda Functions")
+SAMPLE_FILE = os.path.join(REPO_ROOT, "Bulk Upload To DynamoDB", "patient_vitals_1year_dynamodb.json")
+TABLE_NAME = "carelink_anomaly_state"
+
+sys.path.insert(0, LAMBDA_DIR)
+
+# Processor defaults, used to find when hard threshold alerts would have fired
+THRESHOLDS = {"heart_rate": (50, 120), "blood_oxygen": (90, float("inf")), "temperature": (35, 39)}
+
+
+def breaches_threshold(reading):
+    return any(not low <= float(reading[field]) <= high for field, (low, high) in THRESHOLDS.items())
+
+
+def episodes(readings):
+    """(start, end) indexes of each run of unstable readings."""
+    runs, start = [], None
+    for i, reading in enumerate(readings):
+        if reading["status"] == "unstable" and start is None:
+            start = i
+        elif reading["status"] != "unstable" and start is not None:
+            runs.append((start, i - 1))
+            start = None
+    if start is not None:
+        runs.append((start, len(readings) - 1))
+    return runs
+
+
+def evaluate(readings, warnings, lookahead):
+    """Alert quality of warning indexes against the unstable labels."""
+    times = [datetime.fromisoformat(r["timestamp"]) for r in readings]
+    unstable = [i for i, r in enumerate(readings) if r["status"] == "unstable"]
+    true_positive = 0
+    for w in warnings:
+        horizon = times[w] + lookahead
+        if any(times[w] <= times[u] <= horizon for u in unstable):
+            true_positive += 1
+
+    detected, lead_hours = 0, []
+    for start, end in episodes(readings):
+        early = [w for w in warnings if times[start] - lookahead <= times[w] <= times[start]]
+        if early:
+            detected += 1
+            breach = next((i for i in range(start - 48 if start > 48 else 0, end + 1) if breaches_threshold(readings[i])), start)
+            lead_hours.append((times[breach] - times[early[0]]).total_seconds() / 3600)
+    weeks = (times[-1] - times[0]).total_seconds() / (7 * 86400)
+    false_alarms = len(warnings) - true_positive
+    return {
+        "warnings": len(warnings),
+        "precision": round(true_positive / len(warnings), 3) if warnings else None,
+        "episodes": len(episodes(readings)),
+        "episode_recall": round(detected / len(episodes(readings)), 3) if episodes(readings) else None,
+        "lead_hours_before_threshold_alert": [round(h, 1) for h in lead_hours],
+        "false_alarms_per_week": round(false_alarms / weeks, 3) if weeks else None,
+        "threshold_alert_readings": sum(1 for r in readings if breaches_threshold(r)),
+    }
+
+
+def run(args):
+    import CareLinkAnomalyDetector as detector
+
+    if args.alpha is not None:
+        detector.ALPHA = args.alpha
+    if args.cusum_h is not None:
+        detector.CUSUM_H = args.cusum_h
+    if args.cusum_k is not None:
+        detector.CUSUM_K = args.cusum_k
+
+    template = sorted(carelink_fakes.load_typed_items(SAMPLE_FILE), key=lambda i: i["timestamp"])
+    readings = [dict(r, heart_rate=float(r["heart_rate"]), blood_oxygen=float(r["blood_oxygen"]),
+                     temperature=float(r["temperature"])) for r in template]
+    timestamps_us = [detector._epoch_us(r["timestamp"]) for r in readings]
+
+    # Quality: one pass over the real sample
+    state = detector.DeviceState()
+    warnings = [i for i, (ts, r) in enumerate(zip(timestamps_us, readings)) if state.update(ts, r)]
+    results = {
+        "config": {**vars(args), "alpha": detector.ALPHA, "cusum_k": detector.CUSUM_K, "cusum_h": detector.CUSUM_H,
+                   "warmup": detector.WARMUP, "cooldown_hours": detector.COOLDOWN_HOURS},
+        "quality": evaluate(readings, warnings, timedelta(hours=args.lookahead_hours)),
+        "warning_times": [readings[w]["timestamp"][:16] for w in warnings],
+    }
+
+    # Throughput: the pure detector, interleaving patients like a live ingest stream
+    states = [detector.DeviceState() for _ in range(args.patients)]
+    start = time.perf_counter()
+    for ts, reading in zip(timestamps_us, readings):
+        for state in states:
+            state.update(ts, reading)
+    elapsed = time.perf_counter() - start
+    total = len(readings) * args.patients
+    results["detector"] = {
+        "readings": total,
+        "readings_per_s": round(total / elapsed),
+        "us_per_reading": round(elapsed / total * 1e6, 2),
+        "state_bytes": detector._STATE.size,
+    }
+
+    if args.persist:
+        aws = carelink_fakes.install(carelink_fakes.FakeAWS(latency_ms={"dynamodb": args.dynamodb_ms}))
+        client = aws.client("dynamodb")
+        detector._cache.clear()
+        start = time.perf_counter()
+        for reading in readings:
+            for p in range(args.patients):
+                detector.observe(client, f"patient-{p + 1:03d}", reading["timestamp"], reading, TABLE_NAME)
+        elapsed = time.perf_counter() - start
+        results["persisted"] = {
+            "readings_per_s": round(total / elapsed),
+            "us_per_reading": round(elapsed / total * 1e6, 2),
+            "dynamodb_calls": {name: len(samples) for name, samples in aws.recorder.calls.items()},
+            "dynamodb_capacity": dict(aws.capacity),
+        }
+    return results
+
+
+def print_report(results):
+    quality, config = results["quality"], results["config"]
+    print(f"Detector: alpha {config['alpha']}, CUSUM k {config['cusum_k']} h {config['cusum_h']}, "
+          f"warm-up {config['warmup']}, cooldown {config['cooldown_hours']} h")
+    print(f"\n[quality] {quality['warnings']} warnings, precision {quality['precision']}, "
+          f"episode recall {quality['episode_recall']} of {quality['episodes']}, "
+          f"{quality['false_alarms_per_week']} false alarms/week")
+    print(f"  lead time before first threshold alert: {quality['lead_hours_before_threshold_alert']} h")
+    print(f"  warnings at: {', '.join(results['warning_times'])}")
+    detector = results["detector"]
+    print(f"\n[detector] {detector['readings']} readings, {detector['readings_per_s']}/s "
+          f"({detector['us_per_reading']} us each), {detector['state_bytes']} bytes of state per device")
+    if "persisted" in results:
+        persisted = results["persisted"]
+        print(f"\n[persisted] {persisted['readings_per_s']}/s ({persisted['us_per_reading']} us each)")
+        print(f"  calls {persisted['dynamodb_calls']}, capacity {persisted['dynamodb_capacity']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay the sample year through the anomaly detector")
+    parser.add_argument("--patients", type=int, default=10, help="Interleaved copies of the sample for throughput")
+    parser.add_argument("--lookahead-hours", type=float, default=12, help="How far ahead a warning may predict instability")
+    parser.add_argument("--alpha", type=float, help="Override ANOMALY_ALPHA")
+    parser.add_argument("--cusum-k", type=float, help="Override ANOMALY_CUSUM_K")
+    parser.add_argument("--cusum-h", type=float, help="Override ANOMALY_CUSUM_H")
+    parser.add_argument("--persist", action="store_true", help="Also replay through observe() with fake DynamoDB")
+    parser.add_argument("--dynamodb-ms", type=float, default=0.0, help="Simulated DynamoDB latency with --persist")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
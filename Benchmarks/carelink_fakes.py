@@ -0,0 +1,673 @@
+# --- carelink_fakes.py (In-memory AWS stand-ins for offline benchmarks) ---
+#
+# The CareLink Lambdas create their boto3 clients at import time, so install()
+# must run before a handler module is loaded. It registers a fake `boto3`
+# package in sys.modules whose clients keep all state in memory and sleep for
+# a configurable latency, so handlers run unchanged on a plain Linux box.
+
+import io
+import json
+import math
+import re
+import sys
+import time
+import types
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+DYNAMODB_PAGE_BYTES = 1024 * 1024  # DynamoDB returns at most 1 MB per query page
+READ_UNIT_BYTES = 4096              # one eventually consistent read unit covers 2 x 4 KB
+WRITE_UNIT_BYTES = 1024
+
+
+# --- CALL RECORDING ---
+class CallRecorder:
+    """Collects the wall time of every fake AWS call, keyed by service.operation."""
+
+    def __init__(self):
+        self.calls = defaultdict(list)
+
+    def record(self, name, seconds):
+        self.calls[name].append(seconds)
+
+    def reset(self):
+        self.calls.clear()
+
+
+class _FakeClient:
+    service = "fake"
+
+    def __init__(self, aws):
+        self._aws = aws
+
+    @contextmanager
+    def _call(self, operation):
+        """Time one operation, including the configured service latency."""
+        latency = self._aws.latency_ms.get(self.service, 0) / 1000
+        start = time.perf_counter()
+        if latency:
+            time.sleep(latency)
+        try:
+            yield
+        finally:
+            self._aws.recorder.record(f"{self.service}.{operation}", time.perf_counter() - start)
+
+
+# --- DYNAMODB ---
+class _Condition:
+    def __init__(self, name, op, values):
+        self.name = name
+        self.op = op
+        self.values = values
+
+    def __and__(self, other):
+        return _And([self, other])
+
+
+class _And:
+    def __init__(self, conditions):
+        self.conditions = conditions
+
+    def __and__(self, other):
+        return _And(self.conditions + [other])
+
+
+class Key:
+    """Subset of boto3.dynamodb.conditions.Key used by the handlers."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def eq(self, value):
+        return _Condition(self.name, "eq", (value,))
+
+    def gte(self, value):
+        return _Condition(self.name, "gte", (value,))
+
+    def gt(self, value):
+        return _Condition(self.name, "gt", (value,))
+
+    def lte(self, value):
+        return _Condition(self.name, "lte", (value,))
+
+    def lt(self, value):
+        return _Condition(self.name, "lt", (value,))
+
+    def between(self, low, high):
+        return _Condition(self.name, "between", (low, high))
+
+    def begins_with(self, prefix):
+        return _Condition(self.name, "begins_with", (prefix,))
+
+
+class FakeTableStore:
+    """Items of one table, partitioned by hash key and sorted by range key."""
+
+    def __init__(self, hash_key="device_id", range_key="timestamp"):
+        self.hash_key = hash_key
+        self.range_key = range_key
+        # hash -> (sorted range keys, items, approximate item sizes)
+        self.partitions = defaultdict(lambda: ([], [], []))
+        # id(item) -> (item, typed form) for the low-level client
+        self._typed = {}
+
+    def typed(self, item, fields=None):
+        """Wire-format copy of an item, memoized so benchmarks time the handler, not the fake."""
+        cached = self._typed.get(id(item))
+        if cached is None or cached[0] is not item:
+            cached = self._typed[id(item)] = (item, {k: serialize_value(v) for k, v in item.items()})
+        typed = cached[1]
+        if fields is None:
+            return dict(typed)
+        return {k: typed[k] for k in fields if k in typed}
+
+    def put(self, item):
+        keys, items, sizes = self.partitions[item[self.hash_key]]
+        range_value = item[self.range_key]
+        index = bisect_left(keys, range_value)
+        if index < len(keys) and keys[index] == range_value:
+            self._typed.pop(id(items[index]), None)
+            items[index] = item
+            sizes[index] = _item_size(item)
+        else:
+            keys.insert(index, range_value)
+            items.insert(index, item)
+            sizes.insert(index, _item_size(item))
+
+    def load(self, items):
+        """Bulk-load items, much faster than repeated put() for seeding."""
+        for item in items:
+            keys, partition_items, sizes = self.partitions[item[self.hash_key]]
+            keys.append(item[self.range_key])
+            partition_items.append(item)
+            sizes.append(_item_size(item))
+        for hash_value, (keys, items, sizes) in self.partitions.items():
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            self.partitions[hash_value] = (
+                [keys[i] for i in order], [items[i] for i in order], [sizes[i] for i in order]
+            )
+
+    def get(self, hash_value, range_value):
+        keys, items, _ = self.partitions.get(hash_value, ([], [], []))
+        index = bisect_left(keys, range_value)
+        if index < len(keys) and keys[index] == range_value:
+            return items[index]
+        return None
+
+    def query(self, hash_value, op=None, values=(), forward=True, limit=None, start_after=None):
+        keys, items, sizes = self.partitions.get(hash_value, ([], [], []))
+        lo, hi = 0, len(keys)
+        if op in ("eq", "between"):
+            lo, hi = bisect_left(keys, values[0]), bisect_right(keys, values[-1])
+        elif op == "gte":
+            lo = bisect_left(keys, values[0])
+        elif op == "gt":
+            lo = bisect_right(keys, values[0])
+        elif op == "lte":
+            hi = bisect_right(keys, values[0])
+        elif op == "lt":
+            hi = bisect_left(keys, values[0])
+        elif op == "begins_with":
+            lo = bisect_left(keys, values[0])
+            hi = bisect_left(keys, values[0] + "\uffff")
+
+        if start_after is not None:
+            if forward:
+                lo = max(lo, bisect_right(keys, start_after))
+            else:
+                hi = min(hi, bisect_left(keys, start_after))
+
+        indexes = range(lo, hi) if forward else range(hi - 1, lo - 1, -1)
+        page, size, last_key = [], 0, None
+        for i in indexes:
+            page.append(items[i])
+            size += sizes[i]
+            if (limit and len(page) >= limit) or size >= DYNAMODB_PAGE_BYTES:
+                if (forward and i < hi - 1) or (not forward and i > lo):
+                    last_key = {self.hash_key: hash_value, self.range_key: keys[i]}
+                break
+        return page, last_key, size
+
+    def size_of(self, hash_value, range_value):
+        keys, _, sizes = self.partitions.get(hash_value, ([], [], []))
+        index = bisect_left(keys, range_value)
+        if index < len(keys) and keys[index] == range_value:
+            return sizes[index]
+        return 0
+
+
+def _value_size(value):
+    """Approximate DynamoDB attribute value size (numbers ~1 byte per 2 digits)."""
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return len(str(value)) // 2 + 1
+    if isinstance(value, dict):
+        return 3 + sum(len(k) + 1 + _value_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 3 + sum(1 + _value_size(v) for v in value)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return len(str(value))
+
+
+def _item_size(item):
+    return sum(len(k) + _value_size(v) for k, v in item.items())
+
+
+def _split_key_condition(expression, hash_key):
+    conditions = expression.conditions if isinstance(expression, _And) else [expression]
+    hash_value, op, values = None, None, ()
+    for condition in conditions:
+        if condition.name == hash_key and condition.op == "eq":
+            hash_value = condition.values[0]
+        else:
+            op, values = condition.op, condition.values
+    return hash_value, op, values
+
+
+class FakeTable(_FakeClient):
+    service = "dynamodb"
+
+    def __init__(self, aws, name):
+        super().__init__(aws)
+        self.name = name
+        self.store = aws.table_store(name)
+
+    def put_item(self, Item, **kwargs):
+        with self._call("PutItem"):
+            self._aws.consume(write_bytes=_item_size(Item))
+            self.store.put(dict(Item))
+            return {}
+
+    def get_item(self, Key, **kwargs):
+        with self._call("GetItem"):
+            item = self.store.get(Key[self.store.hash_key], Key[self.store.range_key])
+            self._aws.consume(read_bytes=_item_size(item) if item is not None else 1)
+            return {"Item": dict(item)} if item is not None else {}
+
+    def query(self, KeyConditionExpression, ScanIndexForward=True, Limit=None, ExclusiveStartKey=None, **kwargs):
+        with self._call("Query"):
+            hash_value, op, values = _split_key_condition(KeyConditionExpression, self.store.hash_key)
+            start_after = ExclusiveStartKey[self.store.range_key] if ExclusiveStartKey else None
+            items, last_key, size = self.store.query(hash_value, op, values, ScanIndexForward, Limit, start_after)
+            self._aws.consume(read_bytes=size)
+            response = {"Items": [dict(i) for i in items], "Count": len(items)}
+            if last_key:
+                response["LastEvaluatedKey"] = last_key
+            return response
+
+
+class FakeDynamoDBResource:
+    def __init__(self, aws):
+        self._aws = aws
+
+    def Table(self, name):
+        return FakeTable(self._aws, name)
+
+
+# Low-level client: typed attributes and string expressions
+_KEY_CONDITION = re.compile(
+    r"^\s*(?P<hash>[#\w]+)\s*=\s*(?P<hash_value>:\w+)"
+    r"(?:\s+AND\s+(?:"
+    r"(?P<range>[#\w]+)\s*(?P<op>>=|<=|>|<|=)\s*(?P<value>:\w+)"
+    r"|(?P<between>[#\w]+)\s+BETWEEN\s+(?P<low>:\w+)\s+AND\s+(?P<high>:\w+)"
+    r"|begins_with\s*\(\s*(?P<prefix_key>[#\w]+)\s*,\s*(?P<prefix>:\w+)\s*\)"
+    r"))?\s*$",
+    re.IGNORECASE,
+)
+_OPERATORS = {"=": "eq", ">=": "gte", ">": "gt", "<=": "lte", "<": "lt"}
+
+
+def serialize_value(value):
+    if isinstance(value, bool):
+        return {"BOOL": value}
+    if value is None:
+        return {"NULL": True}
+    if isinstance(value, (int, float, Decimal)):
+        return {"N": str(value)}
+    if isinstance(value, (bytes, bytearray)):
+        return {"B": bytes(value)}
+    if isinstance(value, dict):
+        return {"M": {k: serialize_value(v) for k, v in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {"L": [serialize_value(v) for v in value]}
+    return {"S": str(value)}
+
+
+def deserialize_value(value):
+    (kind, raw), = value.items()
+    if kind == "N":
+        return Decimal(raw)
+    if kind == "M":
+        return {k: deserialize_value(v) for k, v in raw.items()}
+    if kind == "L":
+        return [deserialize_value(v) for v in raw]
+    if kind == "NULL":
+        return None
+    return raw
+
+
+class ConditionalCheckFailedException(Exception):
+    """Raised like botocore's modeled exception when a ConditionExpression is false."""
+
+
+class FakeDynamoDBClient(_FakeClient):
+    """Subset of the low-level DynamoDB client used by the handlers."""
+
+    service = "dynamodb"
+    exceptions = types.SimpleNamespace(ConditionalCheckFailedException=ConditionalCheckFailedException)
+
+    def _store(self, name):
+        return self._aws.table_store(name)
+
+    def put_item(self, TableName, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, **kwargs):
+        with self._call("PutItem"):
+            store = self._store(TableName)
+            item = {k: deserialize_value(v) for k, v in Item.items()}
+            self._aws.consume(write_bytes=_item_size(item))
+            if ConditionExpression:
+                existing = store.get(item[store.hash_key], item[store.range_key]) or {}
+                values = {k: deserialize_value(v) for k, v in (ExpressionAttributeValues or {}).items()}
+                if not _Expression(ConditionExpression, ExpressionAttributeNames or {}, values).test(existing):
+                    raise ConditionalCheckFailedException("The conditional request failed")
+            store.put(item)
+            return {}
+
+    def update_item(self, TableName, Key, UpdateExpression, ExpressionAttributeValues=None,
+                    ExpressionAttributeNames=None, ConditionExpression=None, ReturnValues="NONE", **kwargs):
+        with self._call("UpdateItem"):
+            store = self._store(TableName)
+            key = {k: deserialize_value(v) for k, v in Key.items()}
+            existing = store.get(key[store.hash_key], key[store.range_key])
+            item = dict(existing) if existing is not None else dict(key)
+            values = {k: deserialize_value(v) for k, v in (ExpressionAttributeValues or {}).items()}
+            old_size = store.size_of(key[store.hash_key], key[store.range_key])
+            if ConditionExpression and not _Expression(ConditionExpression, ExpressionAttributeNames or {}, values).test(item):
+                # A failed condition still consumes write capacity
+                self._aws.consume(write_bytes=max(old_size, 1))
+                raise ConditionalCheckFailedException("The conditional request failed")
+            _Expression(UpdateExpression, ExpressionAttributeNames or {}, values).apply(item)
+            store.put(item)
+            # Updates are billed on the larger of the old and new item
+            self._aws.consume(write_bytes=max(old_size, _item_size(item)))
+            if ReturnValues == "ALL_NEW":
+                return {"Attributes": store.typed(item)}
+            return {}
+
+    def get_item(self, TableName, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        with self._call("GetItem"):
+            store = self._store(TableName)
+            key = {k: deserialize_value(v) for k, v in Key.items()}
+            item = store.get(key[store.hash_key], key[store.range_key])
+            self._aws.consume(read_bytes=_item_size(item) if item is not None else 1)
+            if item is None:
+                return {}
+            fields = _projection(ProjectionExpression, ExpressionAttributeNames)
+            return {"Item": store.typed(item, fields)}
+
+    def query(self, TableName, KeyConditionExpression, ExpressionAttributeValues, ExpressionAttributeNames=None,
+              ProjectionExpression=None, ScanIndexForward=True, Limit=None, ExclusiveStartKey=None, **kwargs):
+        with self._call("Query"):
+            store = self._store(TableName)
+            names = ExpressionAttributeNames or {}
+            match = _KEY_CONDITION.match(KeyConditionExpression)
+            if not match or names.get(match["hash"], match["hash"]) != store.hash_key:
+                raise ValueError(f"Unsupported KeyConditionExpression: {KeyConditionExpression}")
+            values = {k: deserialize_value(v) for k, v in ExpressionAttributeValues.items()}
+            op, range_values = None, ()
+            if match["op"]:
+                op, range_values = _OPERATORS[match["op"]], (values[match["value"]],)
+            elif match["between"]:
+                op, range_values = "between", (values[match["low"]], values[match["high"]])
+            elif match["prefix"]:
+                op, range_values = "begins_with", (values[match["prefix"]],)
+            start_after = deserialize_value(ExclusiveStartKey[store.range_key]) if ExclusiveStartKey else None
+            items, last_key, size = store.query(values[match["hash_value"]], op, range_values, ScanIndexForward, Limit, start_after)
+            self._aws.consume(read_bytes=size)
+            fields = _projection(ProjectionExpression, names)
+            response = {"Items": [store.typed(i, fields) for i in items], "Count": len(items)}
+            if last_key:
+                response["LastEvaluatedKey"] = {k: serialize_value(v) for k, v in last_key.items()}
+            return response
+
+
+class _Expression:
+    """Update and condition expressions on top-level attributes.
+
+    Updates: SET / ADD / REMOVE with if_not_exists(), list_append() and +/-.
+    Conditions: attribute_exists(), attribute_not_exists(), comparisons, AND / OR / NOT.
+    """
+
+    _TOKEN = re.compile(r"\s*(:\w+|#\w+|[A-Za-z_][\w.]*|<>|<=|>=|[(),=<>+-])")
+    _COMPARE = {
+        "=": lambda a, b: a == b, "<>": lambda a, b: a != b,
+        "<": lambda a, b: a < b, "<=": lambda a, b: a <= b,
+        ">": lambda a, b: a > b, ">=": lambda a, b: a >= b,
+    }
+
+    def __init__(self, expression, names, values):
+        self.tokens = self._TOKEN.findall(expression)
+        self.names = names
+        self.values = values
+        self.pos = 0
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _take(self, expected=None):
+        token = self._peek()
+        if expected is not None and (token or "").upper() != expected:
+            raise ValueError(f"Expected {expected!r} in update expression, got {token!r}")
+        self.pos += 1
+        return token
+
+    def _path(self):
+        token = self._take()
+        return self.names.get(token, token)
+
+    def _operand(self, item):
+        token = self._take()
+        if token.startswith(":"):
+            return self.values[token]
+        if token in ("if_not_exists", "list_append"):
+            self._take("(")
+            if token == "if_not_exists":
+                path = self._path()
+                self._take(",")
+                default = self._value(item)
+                self._take(")")
+                return item[path] if path in item else default
+            first = self._value(item)
+            self._take(",")
+            second = self._value(item)
+            self._take(")")
+            return list(first) + list(second)
+        return item[self.names.get(token, token)]
+
+    def _value(self, item):
+        value = self._operand(item)
+        while self._peek() in ("+", "-"):
+            sign = self._take()
+            other = self._operand(item)
+            value = value + other if sign == "+" else value - other
+        return value
+
+    def test(self, item):
+        result = self._or(item)
+        if self._peek() is not None:
+            raise ValueError(f"Unexpected {self._peek()!r} in condition expression")
+        return result
+
+    def _or(self, item):
+        result = self._and(item)
+        while (self._peek() or "").upper() == "OR":
+            self._take()
+            other = self._and(item)
+            result = result or other
+        return result
+
+    def _and(self, item):
+        result = self._not(item)
+        while (self._peek() or "").upper() == "AND":
+            self._take()
+            other = self._not(item)
+            result = result and other
+        return result
+
+    def _not(self, item):
+        if (self._peek() or "").upper() == "NOT":
+            self._take()
+            return not self._not(item)
+        if self._peek() == "(":
+            self._take()
+            result = self._or(item)
+            self._take(")")
+            return result
+        if self._peek() in ("attribute_exists", "attribute_not_exists"):
+            function = self._take()
+            self._take("(")
+            exists = self._path() in item
+            self._take(")")
+            return exists if function == "attribute_exists" else not exists
+        left = self._comparable(item)
+        operator = self._take()
+        if operator not in self._COMPARE:
+            raise ValueError(f"Unsupported comparison {operator!r} in condition expression")
+        right = self._comparable(item)
+        if left is _MISSING or right is _MISSING:
+            return False
+        return self._COMPARE[operator](left, right)
+
+    def _comparable(self, item):
+        token = self._take()
+        if token.startswith(":"):
+            return self.values[token]
+        return item.get(self.names.get(token, token), _MISSING)
+
+    def apply(self, item):
+        while self._peek() is not None:
+            clause = self._take().upper()
+            while True:
+                path = self._path()
+                if clause == "SET":
+                    self._take("=")
+                    item[path] = self._value(item)
+                elif clause == "ADD":
+                    item[path] = item.get(path, 0) + self._value(item)
+                elif clause == "REMOVE":
+                    item.pop(path, None)
+                else:
+                    raise ValueError(f"Unsupported update clause {clause!r}")
+                if self._peek() != ",":
+                    break
+                self._take(",")
+        return item
+
+
+_MISSING = object()
+
+
+def _projection(expression, names):
+    if not expression:
+        return None
+    names = names or {}
+    return tuple(names.get(f.strip(), f.strip()) for f in expression.split(","))
+
+
+# --- OTHER SERVICES ---
+class FakeSNS(_FakeClient):
+    service = "sns"
+
+    def __init__(self, aws):
+        super().__init__(aws)
+        self.messages = aws.sns_messages
+
+    def publish(self, TopicArn=None, Message=None, Subject=None, **kwargs):
+        with self._call("Publish"):
+            self.messages.append({"TopicArn": TopicArn, "Subject": Subject, "Message": Message})
+            return {"MessageId": str(len(self.messages))}
+
+
+class FakeIoTData(_FakeClient):
+    service = "iot"
+
+    def __init__(self, aws):
+        super().__init__(aws)
+        self.messages = aws.iot_messages
+
+    def publish(self, topic, qos=0, payload=b"", **kwargs):
+        with self._call("Publish"):
+            self.messages.append((topic, payload))
+            return {"ResponseMetadata": {"HTTPStatusCode": 200}}
+
+
+class FakeSageMakerRuntime(_FakeClient):
+    """Scores a CSV row by how far its scaled vitals stray from the middle of their range."""
+
+    service = "sagemaker"
+
+    def invoke_endpoint(self, EndpointName, Body, ContentType="text/csv", **kwargs):
+        with self._call("InvokeEndpoint"):
+            values = [float(v) for v in (Body.decode() if isinstance(Body, bytes) else Body).split(",") if v]
+            deviation = sum(abs(v - 0.5) for v in values) / max(len(values), 1)
+            return {"Body": io.BytesIO(f"{min(1.0, deviation):.6f}".encode())}
+
+
+class FakeBedrockRuntime(_FakeClient):
+    """Returns a canned Titan-style completion and reports approximate token counts."""
+
+    service = "bedrock"
+
+    def invoke_model(self, modelId, body, **kwargs):
+        with self._call("InvokeModel"):
+            request = json.loads(body)
+            prompt = request.get("inputText", "")
+            self._aws.bedrock_prompts.append(prompt)
+            result = {
+                "inputTextTokenCount": max(1, len(prompt) // 4),
+                "results": [{
+                    "tokenCount": 24,
+                    "outputText": "Vitals remain broadly stable with no sustained upward or downward trend.",
+                    "completionReason": "FINISH",
+                }],
+            }
+            return {"body": io.BytesIO(json.dumps(result).encode())}
+
+
+class FakeAWS:
+    """Shared state and latency settings for every fake client."""
+
+    SERVICES = {
+        "dynamodb": FakeDynamoDBClient,
+        "sns": FakeSNS,
+        "iot-data": FakeIoTData,
+        "runtime.sagemaker": FakeSageMakerRuntime,
+        "sagemaker-runtime": FakeSageMakerRuntime,
+        "bedrock-runtime": FakeBedrockRuntime,
+    }
+
+    def __init__(self, latency_ms=None):
+        self.latency_ms = dict(latency_ms or {})
+        self.recorder = CallRecorder()
+        self.capacity = defaultdict(float)
+        self.tables = {}
+        self.sns_messages = []
+        self.iot_messages = []
+        self.bedrock_prompts = []
+
+    def table_store(self, name, hash_key="device_id", range_key="timestamp"):
+        """The store for a table, created with the given key schema on first use."""
+        if name not in self.tables:
+            self.tables[name] = FakeTableStore(hash_key, range_key)
+        return self.tables[name]
+
+    def consume(self, read_bytes=0, write_bytes=0):
+        """Account DynamoDB capacity units the way on-demand billing rounds them."""
+        if read_bytes:
+            self.capacity["read_units"] += math.ceil(read_bytes / READ_UNIT_BYTES) / 2
+        if write_bytes:
+            self.capacity["write_units"] += math.ceil(write_bytes / WRITE_UNIT_BYTES)
+
+    def client(self, service_name, *args, **kwargs):
+        if service_name not in self.SERVICES:
+            raise ValueError(f"No fake available for AWS service '{service_name}'")
+        return self.SERVICES[service_name](self)
+
+    def resource(self, service_name, *args, **kwargs):
+        if service_name != "dynamodb":
+            raise ValueError(f"No fake available for AWS resource '{service_name}'")
+        return FakeDynamoDBResource(self)
+
+
+def install(aws):
+    """Register a fake `boto3` package backed by aws in sys.modules."""
+    boto3 = types.ModuleType("boto3")
+    boto3.client = aws.client
+    boto3.resource = aws.resource
+    dynamodb = types.ModuleType("boto3.dynamodb")
+    conditions = types.ModuleType("boto3.dynamodb.conditions")
+    conditions.Key = Key
+    boto3.dynamodb = dynamodb
+    dynamodb.conditions = conditions
+    sys.modules.update({
+        "boto3": boto3,
+        "boto3.dynamodb": dynamodb,
+        "boto3.dynamodb.conditions": conditions,
+    })
+    return aws
+
+
+def load_typed_items(path):
+    """Read a BatchWriteItem JSON file and return plain items with Decimal numbers."""
+    with open(path, "r") as f:
+        records = json.load(f)
+    items = []
+    for record in records:
+        typed = record["PutRequest"]["Item"]
+        items.append({
+            name: Decimal(value["N"]) if "N" in value else value["S"]
+            for name, value in typed.items()
+        })
+    return items
@@ -0,0 +1,193 @@
+# --- cold_start_benchmark.py (Cold-start benchmark for CareLinkGetLatestVitals) ---
+#
+# Every sample is a fresh Python process, like a new Lambda container. Unlike
+# lambda_benchmark.py it uses the real boto3, so client construction and
+# response parsing cost what they cost in Lambda; only the HTTP layer is
+# replaced by a botocore 'before-send' hook that serves canned responses built
+# from the one-year sample export.
+#
+# Usage:
+#   python cold_start_benchmark.py --runs 10
+#   python cold_start_benchmark.py --baseline-ref HEAD~1 --json
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_DIR = os.path.join(REPO_ROOT, "Lambda Functions")
+HANDLER_FILE = os.path.join(LAMBDA_DIR, "CareLinkGetLatestVitals.py")
+SAMPLE_FILE = os.path.join(REPO_ROOT, "Bulk Upload To DynamoDB", "patient_vitals_1year_dynamodb.json")
+TABLE_NAME = "carelink_alerts"
+
+CHILD_ENV = {
+    "AWS_REGION": "us-east-1",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "bench",
+    "AWS_SECRET_ACCESS_KEY": "bench",
+    "AWS_EC2_METADATA_DISABLED": "true",
+    "DYNAMODB_TABLE": TABLE_NAME,
+    "METRICS_SAMPLE_RATE": "0",
+    "LOG_PAYLOAD_SAMPLE_RATE": "0",
+}
+
+
+# --- CANNED HTTP RESPONSES (child process) ---
+class _RawBody(io.BytesIO):
+    """What botocore expects from urllib3: read() for streaming bodies, stream() otherwise."""
+
+    def stream(self, *args, **kwargs):
+        yield self.getvalue()
+
+
+def sample_items():
+    """Wire-format sample items, shifted so the newest reading is an hour old."""
+    with open(SAMPLE_FILE, "r") as f:
+        items = [record["PutRequest"]["Item"] for record in json.load(f)]
+    newest = max(datetime.fromisoformat(i["timestamp"]["S"]) for i in items)
+    shift = datetime.utcnow() - timedelta(hours=1) - newest
+    for item in items:
+        item["timestamp"] = {"S": (datetime.fromisoformat(item["timestamp"]["S"]) + shift).isoformat()}
+    return sorted(items, key=lambda i: i["timestamp"]["S"])
+
+
+def make_responder(items):
+    from botocore.awsrequest import AWSResponse
+
+    def respond(request, event_name, **kwargs):
+        operation = event_name.rsplit(".", 1)[-1]
+        if operation == "Query":
+            body = json.loads(request.body)
+            values = body.get("ExpressionAttributeValues", {})
+            cutoff = min((v["S"] for v in values.values() if "S" in v and v["S"][:2].isdigit()), default="")
+            # Only the readings table has canned data; digests and snapshots live in their own tables
+            selected = [i for i in items if i["timestamp"]["S"] >= cutoff] if body.get("TableName") == TABLE_NAME else []
+            if body.get("ProjectionExpression"):
+                names = body.get("ExpressionAttributeNames", {})
+                fields = [names.get(f.strip(), f.strip()) for f in body["ProjectionExpression"].split(",")]
+                selected = [{k: i[k] for k in fields if k in i} for i in selected]
+            payload = {"Items": selected, "Count": len(selected), "ScannedCount": len(selected)}
+            content_type = "application/x-amz-json-1.0"
+        elif operation == "InvokeEndpoint":
+            payload, content_type = b"0.123456", "text/csv"
+        elif operation == "InvokeModel":
+            payload = {"inputTextTokenCount": 100, "results": [{
+                "tokenCount": 24, "completionReason": "FINISH",
+                "outputText": "Vitals remain broadly stable with no sustained upward or downward trend.",
+            }]}
+            content_type = "application/json"
+        else:
+            raise ValueError(f"No canned response for {event_name}")
+        raw = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        headers = {"Content-Type": content_type, "Content-Length": str(len(raw)), "x-amzn-RequestId": "bench"}
+        return AWSResponse(request.url, 200, headers, _RawBody(raw))
+
+    return respond
+
+
+def child(handler_file, requests):
+    """Measure one cold start, printing a single JSON line."""
+    items = sample_items()
+    sys.path.insert(0, LAMBDA_DIR)
+    timings = {}
+    quiet = contextlib.redirect_stdout(io.StringIO())
+
+    start = time.perf_counter()
+    import boto3
+    timings["boto3_import_ms"] = (time.perf_counter() - start) * 1000
+
+    boto3.setup_default_session()
+    boto3.DEFAULT_SESSION.events.register("before-send", make_responder(items))
+
+    start = time.perf_counter()
+    with quiet:
+        spec = importlib.util.spec_from_file_location("bench_handler", handler_file)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    timings["init_ms"] = (time.perf_counter() - start) * 1000
+
+    for n in range(requests):
+        start = time.perf_counter()
+        with quiet:
+            response = module.lambda_handler({"device_id": "patient-001", "months_back": 3}, None)
+        elapsed = (time.perf_counter() - start) * 1000
+        if response.get("statusCode") != 200:
+            raise RuntimeError(f"Handler returned {response.get('statusCode')}: {response.get('body')}")
+        timings["first_request_ms" if n == 0 else "warm_request_ms"] = elapsed
+    timings["cold_total_ms"] = timings["init_ms"] + timings["first_request_ms"]
+    print(json.dumps(timings))
+
+
+# --- PARENT ---
+def baseline_file(ref, workdir):
+    """Write CareLinkGetLatestVitals.py as of a git ref into workdir."""
+    source = subprocess.run(
+        ["git", "show", f"{ref}:Lambda Functions/CareLinkGetLatestVitals.py"],
+        cwd=REPO_ROOT, check=True, capture_output=True,
+    ).stdout
+    path = os.path.join(workdir, "CareLinkGetLatestVitals.py")
+    with open(path, "wb") as f:
+        f.write(source)
+    return path
+
+
+def measure(handler_file, runs, requests):
+    env = dict(os.environ, **CHILD_ENV)
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", handler_file, "--requests", str(requests)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        name: {
+            "median_ms": round(statistics.median(s[name] for s in samples), 2),
+            "min_ms": round(min(s[name] for s in samples), 2),
+            "max_ms": round(max(s[name] for s in samples), 2),
+        }
+        for name in samples[0]
+    }
+
+
+def print_report(results):
+    names = list(next(iter(results.values())))
+    print(f"{'':<20}" + "".join(f"{label:>16}" for label in results))
+    for name in names:
+        print(f"{name:<20}" + "".join(f"{r[name]['median_ms']:>13} ms" for r in results.values()))
+    print("\n(medians over fresh processes)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for CareLinkGetLatestVitals")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh processes per variant")
+    parser.add_argument("--requests", type=int, default=2, help="Requests per process (first is the cold one)")
+    parser.add_argument("--baseline-ref", help="Also measure the handler as of this git ref, e.g. HEAD~1")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.child:
+        child(args.child, args.requests)
+        sys.exit(0)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.baseline_ref:
+            results[args.baseline_ref] = measure(baseline_file(args.baseline_ref, workdir), args.runs, args.requests)
+        results["current"] = measure(HANDLER_FILE, args.runs, args.requests)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
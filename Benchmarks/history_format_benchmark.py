@@ -0,0 +1,133 @@
+# --- history_format_benchmark.py (Response size and serialization cost of vitals_history) ---
+#
+# Runs CareLinkGetLatestVitals in-process against the in-memory fakes for
+# several history windows and reports, for each response format (rows or
+# columns) with and without gzip:
+#
+#   json_kb        size of the JSON body before compression
+#   wire_kb        bytes the client downloads (gzip bytes when compressed,
+#                  through the Lambda proxy integration)
+#   serialize_ms   building the body (the handler's 'serialize' span)
+#   compress_ms    gzip + base64 (the handler's 'compress' span)
+#   handler_ms     whole invocation
+#
+# Usage:
+#   python history_format_benchmark.py
+#   python history_format_benchmark.py --months 3,6,12 --per-hour 12 --layout bucket
+
+import argparse
+import base64
+import contextlib
+import gzip
+import io
+import json
+import os
+import random
+import statistics
+
+import carelink_fakes
+from lambda_benchmark import BUCKET_TABLE_NAME, SAMPLE_FILE, TABLE_NAME, load_handler, seed_buckets, synthetic_history
+
+VARIANTS = (("rows", False), ("rows", True), ("columns", False), ("columns", True))
+
+
+def records(output):
+    """EMF records printed by the handler."""
+    for line in output.splitlines():
+        if line.startswith('{"_aws"'):
+            yield json.loads(line)
+
+
+def decode(response):
+    body = response["body"]
+    if response.get("isBase64Encoded"):
+        compressed = base64.b64decode(body)
+        return json.loads(gzip.decompress(compressed)), len(compressed)
+    return json.loads(body), len(body.encode("utf-8"))
+
+
+def run(args):
+    os.environ.setdefault("DYNAMODB_TABLE", TABLE_NAME)
+    os.environ["VITALS_LAYOUT"] = args.layout
+    os.environ.setdefault("VITALS_BUCKET_TABLE", BUCKET_TABLE_NAME)
+    os.environ["DIGEST_SUMMARIES"] = "false"
+    os.environ["METRICS_SAMPLE_RATE"] = "1"       # every invocation prints its spans
+    os.environ["LOG_PAYLOAD_SAMPLE_RATE"] = "0"
+
+    aws = carelink_fakes.FakeAWS()
+    carelink_fakes.install(aws)
+    template = carelink_fakes.load_typed_items(SAMPLE_FILE)
+    history = list(synthetic_history(template, 1, random.Random(args.seed), args.per_hour))
+    if args.layout == "bucket":
+        seed_buckets(aws, history)
+    else:
+        aws.table_store(TABLE_NAME).load(history)
+
+    handler = load_handler("CareLinkGetLatestVitals").lambda_handler
+    results = {"config": vars(args), "seeded_readings": len(history), "windows": []}
+    for months in args.months:
+        window = {"months_back": months, "variants": []}
+        for fmt, compressed in VARIANTS:
+            event = {"device_id": "patient-001", "months_back": months, "history_format": fmt}
+            if compressed:
+                event["headers"] = {"Accept-Encoding": "gzip, deflate, br"}
+            spans, response = [], None
+            for _ in range(args.runs):
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    response = handler(event, None)
+                spans.extend(records(output.getvalue()))
+            if response["statusCode"] != 200:
+                raise SystemExit(f"{fmt} request for {months} months failed: {response['body']}")
+            body, wire_bytes = decode(response)
+            readings = len(body["vitals_columns"]["epoch_ms"]) if fmt == "columns" else len(body["vitals_history"])
+            window["readings"] = readings
+
+            def median(name):
+                return round(statistics.median(r.get(name, 0.0) for r in spans), 3)
+
+            window["variants"].append({
+                "format": fmt,
+                "gzip": compressed,
+                "json_kb": round(len(json.dumps(body)) / 1024, 1),
+                "wire_kb": round(wire_bytes / 1024, 1),
+                "serialize_ms": median("serialize_ms"),
+                "compress_ms": median("compress_ms"),
+                "handler_ms": median("total_ms"),
+            })
+        results["windows"].append(window)
+    return results
+
+
+def print_report(results):
+    config = results["config"]
+    print(f"Seeded {results['seeded_readings']} readings ({config['per_hour']}/h, {config['layout']} layout), "
+          f"median of {config['runs']} runs")
+    for window in results["windows"]:
+        print(f"\n[{window['months_back']} months] {window['readings']} readings")
+        print(f"  {'format':<16}{'json KB':>10}{'wire KB':>10}{'serialize':>12}{'compress':>11}{'handler':>11}")
+        for v in window["variants"]:
+            name = v["format"] + (" + gzip" if v["gzip"] else "")
+            print(f"  {name:<16}{v['json_kb']:>10}{v['wire_kb']:>10}{v['serialize_ms']:>10} ms"
+                  f"{v['compress_ms']:>8} ms{v['handler_ms']:>8} ms")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="vitals_history response format benchmark")
+    parser.add_argument("--months", type=lambda s: [int(m) for m in s.split(",")], default=[3, 6, 12],
+                        help="Comma-separated history windows (months_back)")
+    parser.add_argument("--per-hour", type=int, default=1, help="Readings per hour in the seeded history")
+    parser.add_argument("--layout", choices=["item", "bucket"], default="item", help="VITALS_LAYOUT for the run")
+    parser.add_argument("--runs", type=int, default=5, help="Invocations per format and window")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
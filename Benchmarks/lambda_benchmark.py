@@ -0,0 +1,322 @@
+# --- lambda_benchmark.py (Offline end-to-end benchmark for the CareLink Lambdas) ---
+#
+# Runs CareLinkPublishVitals -> CareLinkVitalsProcessor -> CareLinkDailyDigest
+# -> CareLinkGetLatestVitals -> CareLinkGetWardSnapshot -> CareLinkVitalsAnalytics in-process against the in-memory fakes in carelink_fakes.py. The vitals table
+# is seeded from the one-year sample export, cloned to N synthetic patients.
+#
+# Usage:
+#   python lambda_benchmark.py --patients 20 --ingest 24 --reads 5
+#   python lambda_benchmark.py --sagemaker-ms 40 --bedrock-ms 800 --json
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import carelink_fakes
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_DIR = os.path.join(REPO_ROOT, "Lambda Functions")
+SAMPLE_FILE = os.path.join(REPO_ROOT, "Bulk Upload To DynamoDB", "patient_vitals_1year_dynamodb.json")
+TABLE_NAME = "carelink_alerts"
+BUCKET_TABLE_NAME = "carelink_vitals_hourly"
+
+# Shared modules such as CareLinkInstrumentation.py are bundled next to each handler
+sys.path.insert(0, LAMBDA_DIR)
+
+
+# --- HELPERS ---
+def load_handler(name):
+    """Import a Lambda file from 'Lambda Functions' as a fresh module."""
+    spec = importlib.util.spec_from_file_location(f"bench_{name}", os.path.join(LAMBDA_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentiles(samples):
+    """Return count, p50/p95/p99/max in milliseconds for a list of durations in seconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def synthetic_history(template, patients, rng, per_hour=1):
+    """Clone the sample history to N devices, shifted so the newest reading is now.
+
+    With per_hour > 1 each hourly sample is spread over that many readings
+    (with small jitter) to mimic higher-frequency wearables.
+    """
+    newest = max(datetime.fromisoformat(i["timestamp"]) for i in template)
+    shift = datetime.utcnow() - timedelta(hours=1) - newest
+    step = timedelta(seconds=3600 / per_hour)
+    for p in range(patients):
+        device_id = f"patient-{p + 1:03d}"
+        hr_offset = Decimal(str(round(rng.uniform(-5, 5), 1)))
+        for item in template:
+            start = datetime.fromisoformat(item["timestamp"]) + shift - step * (per_hour - 1)
+            for k in range(per_hour):
+                jitter = Decimal(str(round(rng.uniform(-1, 1), 1))) if per_hour > 1 else Decimal(0)
+                yield {
+                    "device_id": device_id,
+                    "timestamp": (start + step * k).isoformat(),
+                    "heart_rate": item["heart_rate"] + hr_offset + jitter,
+                    "blood_oxygen": item["blood_oxygen"],
+                    "temperature": item["temperature"],
+                    "status": item["status"],
+                }
+
+
+def seed_buckets(aws, history):
+    """Load synthetic history into the hourly bucket table, as a backfill would."""
+    from CareLinkVitalsStore import pack_buckets
+
+    by_device = {}
+    for item in history:
+        by_device.setdefault(item["device_id"], []).append(item)
+    store = aws.table_store(BUCKET_TABLE_NAME, range_key="hour")
+    store.load(
+        {k: carelink_fakes.deserialize_value(v) for k, v in bucket.items()}
+        for device_id, readings in by_device.items()
+        for bucket in pack_buckets(device_id, readings)
+    )
+    return store
+
+
+def stored_bytes(store):
+    return sum(sum(sizes) for _, _, sizes in store.partitions.values())
+
+
+class Stage:
+    """Times each call of one pipeline stage and tracks its peak traced memory.
+
+    tracemalloc slows allocation-heavy code noticeably, so latencies measured
+    with --memory are only comparable to other --memory runs.
+    """
+
+    def __init__(self, name, aws):
+        self.name = name
+        self.aws = aws
+        self.samples = []
+        self.errors = 0
+        self.elapsed = 0.0
+        self.peak_bytes = 0
+
+    def __enter__(self):
+        self.aws.recorder.reset()
+        self.aws.capacity.clear()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self._start = time.perf_counter()
+        return self
+
+    def run(self, handler, event):
+        start = time.perf_counter()
+        response = handler(event, None)
+        self.samples.append(time.perf_counter() - start)
+        if response.get("statusCode") != 200:
+            self.errors += 1
+        return response
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._start
+        self.peak_bytes = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+        self.aws_calls = {name: percentiles(s) for name, s in self.aws.recorder.calls.items()}
+        self.capacity = dict(self.aws.capacity)
+
+    def report(self):
+        return {
+            "handler": percentiles(self.samples),
+            "errors": self.errors,
+            "throughput_per_s": round(len(self.samples) / self.elapsed, 2) if self.elapsed else 0.0,
+            "peak_memory_mb": round(self.peak_bytes / (1024 * 1024), 2) if self.peak_bytes else None,
+            "aws_calls": self.aws_calls,
+            "dynamodb_capacity": self.capacity,
+        }
+
+
+# --- BENCHMARK ---
+def run(args):
+    rng = random.Random(args.seed)
+    aws = carelink_fakes.install(carelink_fakes.FakeAWS(latency_ms={
+        "dynamodb": args.dynamodb_ms,
+        "sns": args.sns_ms,
+        "iot": args.iot_ms,
+        "sagemaker": args.sagemaker_ms,
+        "bedrock": args.bedrock_ms,
+    }))
+    os.environ.setdefault("DYNAMODB_TABLE", TABLE_NAME)
+    os.environ.setdefault("SNS_TOPIC_ARN", "arn:aws:sns:us-east-1:000000000000:carelink-bench")
+    os.environ["VITALS_LAYOUT"] = args.layout
+    os.environ.setdefault("VITALS_BUCKET_TABLE", BUCKET_TABLE_NAME)
+    os.environ.setdefault("SNAPSHOT_ENABLED", "true")  # the ward stage reads snapshots
+    os.environ["DIGEST_SUMMARIES"] = "true" if args.digest_days else "false"
+    os.environ["PROMPT_FORMAT"] = args.prompt_format
+
+    template = carelink_fakes.load_typed_items(SAMPLE_FILE)
+    if args.history_hours:
+        template = sorted(template, key=lambda i: i["timestamp"])[-args.history_hours:]
+    history = list(synthetic_history(template, args.patients, rng, args.per_hour))
+    if args.layout == "bucket":
+        store = seed_buckets(aws, history)
+    else:
+        store = aws.table_store(TABLE_NAME)
+        store.load(history)
+    devices = [f"patient-{p + 1:03d}" for p in range(args.patients)]
+
+    if args.memory:
+        tracemalloc.start()
+    results = {
+        "config": vars(args),
+        "seeded_readings": len(history),
+        "seeded_items": sum(len(keys) for keys, _, _ in store.partitions.values()),
+        "stored_mb": round(stored_bytes(store) / (1024 * 1024), 2),
+        "stages": {},
+    }
+    del history
+    logs = contextlib.nullcontext() if args.show_logs else contextlib.redirect_stdout(io.StringIO())
+
+    with logs:
+        publisher = load_handler("CareLinkPublishVitals")
+        processor = load_handler("CareLinkVitalsProcessor")
+        digester = load_handler("CareLinkDailyDigest")
+        reader = load_handler("CareLinkGetLatestVitals")
+        ward = load_handler("CareLinkGetWardSnapshot")
+        analytics = load_handler("CareLinkVitalsAnalytics")
+
+        # Publish: one batch of fresh readings per device
+        now = datetime.utcnow()
+        with Stage("publish", aws) as stage:
+            for device_id in devices:
+                vitals = [{
+                    "heart_rate": round(rng.gauss(78, 12), 1),
+                    "blood_oxygen": round(rng.gauss(97, 1.5), 1),
+                    "temperature": round(rng.gauss(36.8, 0.6), 1),
+                    "timestamp": (now + timedelta(seconds=i)).isoformat(),
+                } for i in range(args.ingest)]
+                stage.run(publisher.lambda_handler, {"device_id": device_id, "vitals": vitals})
+        results["stages"]["publish"] = stage.report()
+
+        # Ingest: the IoT rule delivers every published message to the processor
+        messages = [json.loads(payload) for _, payload in aws.iot_messages]
+        with Stage("ingest", aws) as stage:
+            for message in messages:
+                stage.run(processor.lambda_handler, message)
+        results["stages"]["ingest"] = stage.report()
+        results["stages"]["ingest"]["alerts_published"] = len(aws.sns_messages)
+
+        # Digest: backfill daily digests, as the scheduled job would have built them
+        if args.digest_days:
+            with Stage("digest", aws) as stage:
+                response = stage.run(digester.lambda_handler, {"days": args.digest_days, "device_ids": devices})
+            results["stages"]["digest"] = stage.report()
+            results["stages"]["digest"]["digests_written"] = json.loads(response["body"]).get("written", 0)
+
+        # Read: dashboard requests for each device
+        prompts_before = len(aws.bedrock_prompts)
+        with Stage("read", aws) as stage:
+            for _ in range(args.reads):
+                for device_id in devices:
+                    stage.run(reader.lambda_handler, {"device_id": device_id, "months_back": args.months_back, "ward": "general"})
+        results["stages"]["read"] = stage.report()
+        prompts = aws.bedrock_prompts[prompts_before:]
+        if prompts:
+            results["stages"]["read"]["prompt_tokens_mean"] = round(statistics.fmean(len(p) // 4 for p in prompts))
+
+        # Ward overview: one snapshot request returns every patient
+        with Stage("ward", aws) as stage:
+            for _ in range(args.reads):
+                response = stage.run(ward.lambda_handler, {"ward": "general"})
+        results["stages"]["ward"] = stage.report()
+        results["stages"]["ward"]["patients_returned"] = json.loads(response["body"]).get("patient_count", 0)
+
+        # Analytics: server-side aggregates over the same window as the reads
+        with Stage("analytics", aws) as stage:
+            for _ in range(args.reads):
+                for device_id in devices:
+                    response = stage.run(analytics.lambda_handler, {
+                        "device_id": device_id, "days_back": 30 * args.months_back, "window": "day",
+                    })
+        results["stages"]["analytics"] = stage.report()
+        results["stages"]["analytics"]["response_bytes"] = len(response["body"])
+
+    if args.memory:
+        tracemalloc.stop()
+    return results
+
+
+STAGE_FIELDS = {"handler", "errors", "throughput_per_s", "peak_memory_mb", "aws_calls", "dynamodb_capacity"}
+
+
+def print_report(results):
+    print(f"Seeded {results['seeded_readings']} readings as {results['seeded_items']} {results['config']['layout']} items "
+          f"(~{results['stored_mb']} MB) for {results['config']['patients']} patients")
+    for name, stage in results["stages"].items():
+        handler = stage["handler"]
+        memory = f", peak {stage['peak_memory_mb']} MB" if stage["peak_memory_mb"] is not None else ""
+        print(f"\n[{name}] {handler.get('count', 0)} calls, {stage['errors']} errors, "
+              f"{stage['throughput_per_s']}/s{memory}")
+        if handler.get("count"):
+            print(f"  handler     p50 {handler['p50_ms']:>9} ms  p95 {handler['p95_ms']:>9} ms  p99 {handler['p99_ms']:>9} ms")
+        for call, stats in sorted(stage["aws_calls"].items()):
+            print(f"  {call:<24} x{stats['count']:<6} p50 {stats['p50_ms']:>9} ms  p95 {stats['p95_ms']:>9} ms")
+        capacity = stage["dynamodb_capacity"]
+        if capacity:
+            print(f"  dynamodb capacity        {capacity.get('read_units', 0):g} RCU, {capacity.get('write_units', 0):g} WCU")
+        for key, value in stage.items():
+            if key not in STAGE_FIELDS:
+                print(f"  {key.replace('_', ' '):<24} {value}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline CareLink Lambda benchmark")
+    parser.add_argument("--patients", type=int, default=10, help="Synthetic patients cloned from the sample file")
+    parser.add_argument("--history-hours", type=int, default=0, help="Keep only the newest N hours of sample history (0 = all)")
+    parser.add_argument("--ingest", type=int, default=24, help="Readings published per patient")
+    parser.add_argument("--reads", type=int, default=3, help="Dashboard reads per patient")
+    parser.add_argument("--months-back", type=int, default=3, help="History window requested by reads")
+    parser.add_argument("--digest-days", type=int, default=90, help="Days of daily digests to backfill before reads (0 = none)")
+    parser.add_argument("--prompt-format", choices=["compact", "readings"], default="compact",
+                        help="PROMPT_FORMAT for reads without digests")
+    parser.add_argument("--per-hour", type=int, default=1, help="Readings per hour in the seeded history")
+    parser.add_argument("--layout", choices=["item", "bucket"], default="item", help="VITALS_LAYOUT for the run")
+    parser.add_argument("--dynamodb-ms", type=float, default=0.0, help="Simulated DynamoDB latency")
+    parser.add_argument("--sns-ms", type=float, default=0.0, help="Simulated SNS latency")
+    parser.add_argument("--iot-ms", type=float, default=0.0, help="Simulated IoT publish latency")
+    parser.add_argument("--sagemaker-ms", type=float, default=0.0, help="Simulated SageMaker latency")
+    parser.add_argument("--bedrock-ms", type=float, default=0.0, help="Simulated Bedrock latency")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--memory", action="store_true", help="Track per-stage peak memory with tracemalloc")
+    parser.add_argument("--show-logs", action="store_true", help="Let handler print() output through")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
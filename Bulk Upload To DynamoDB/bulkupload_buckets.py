@@ -0,0 +1,61 @@
+import boto3
+import json
+import os
+import sys
+import time
+
+# Reuse the bucket packing from the Lambda code
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Lambda Functions'))
+from CareLinkVitalsStore import pack_buckets
+
+# --- CONFIG ---
+table_name = 'carelink_vitals_hourly'  # Hourly bucket table (hash: device_id, range: hour)
+region_name = 'eu-north-1'             # Your region
+json_file_path = 'patient_vitals_1year_dynamodb.json'  # Your JSON file location
+
+# --- SETUP AWS RESOURCES ---
+dynamodb = boto3.client('dynamodb', region_name=region_name)
+
+# --- LOAD JSON FILE AND GROUP READINGS BY DEVICE ---
+with open(json_file_path, 'r') as f:
+    records = json.load(f)
+
+readings_by_device = {}
+for record in records:
+    item = record['PutRequest']['Item']
+    readings_by_device.setdefault(item['device_id']['S'], []).append({
+        'timestamp': item['timestamp']['S'],
+        'heart_rate': item['heart_rate']['N'],
+        'blood_oxygen': item['blood_oxygen']['N'],
+        'temperature': item['temperature']['N'],
+    })
+
+buckets = [
+    {'PutRequest': {'Item': bucket}}
+    for device_id, readings in readings_by_device.items()
+    for bucket in pack_buckets(device_id, readings)
+]
+
+# --- BATCH WRITE FUNCTION ---
+def batch_write(items, table_name):
+    request_items = {table_name: items}
+    response = dynamodb.batch_write_item(RequestItems=request_items)
+    unprocessed = response.get('UnprocessedItems', {})
+    return unprocessed
+
+# --- MAIN ---
+batch_size = 25  # DynamoDB limit
+
+print(f"🚀 Packing {len(records)} readings into {len(buckets)} hourly buckets for table: {table_name}")
+
+for i in range(0, len(buckets), batch_size):
+    batch = buckets[i:i+batch_size]
+    unprocessed = batch_write(batch, table_name)
+
+    while unprocessed:
+        print("⚠️ Some unprocessed items detected, retrying...")
+        time.sleep(2)
+        unprocessed = batch_write(unprocessed.get(table_name, []), table_name)
+    print(f"✅ Batch {i//batch_size + 1} uploaded successfully.")
+
+print("🎯 All buckets uploaded to DynamoDB!")
@@ -0,0 +1,158 @@
+# --- CareLinkAnomalyDetector.py (Online early-warning detector for the ingest path) ---
+#
+# Bundle this file with CareLinkVitalsProcessor. For every device and vital it
+# keeps an exponentially weighted baseline (mean and variance) and a two-sided
+# CUSUM of the standardized deviation from it. Each reading is an O(1) update,
+# and a sustained drift raises an early warning long before a hard threshold
+# is breached, without calling SageMaker.
+#
+# The whole per-device state is a fixed 117-byte binary attribute stored in
+# ANOMALY_TABLE under device_id='anomaly#<device>', timestamp='state'. Writes
+# use optimistic concurrency on state_version, and warm containers keep the
+# state in memory so the usual cost is a single PutItem per reading.
+
+import math
+import os
+import struct
+from datetime import datetime, timedelta, timezone
+
+# --- ENVIRONMENT VARIABLES ---
+ANOMALY_DETECTION = os.environ.get('ANOMALY_DETECTION', 'false').lower() == 'true'   # opt-in: about one extra write per reading
+ANOMALY_TABLE = os.environ.get('ANOMALY_TABLE', 'carelink_anomaly_state')
+ALPHA = float(os.environ.get('ANOMALY_ALPHA', '0.01'))                # baseline adaptation per reading
+CUSUM_K = float(os.environ.get('ANOMALY_CUSUM_K', '2.0'))             # drift allowance, in standard deviations
+CUSUM_H = float(os.environ.get('ANOMALY_CUSUM_H', '8'))               # alarm level, in standard deviations
+WARMUP = int(os.environ.get('ANOMALY_WARMUP_READINGS', '48'))         # readings before alarms are allowed
+COOLDOWN_HOURS = float(os.environ.get('ANOMALY_COOLDOWN_HOURS', '6'))  # minimum gap between warnings per device
+Z_CLIP = 3.0  # readings further out than this only nudge the baseline
+
+# (field, direction that matters, minimum standard deviation, label)
+VITALS = (
+    ('heart_rate', 'both', 2.0, 'Heart rate'),
+    ('blood_oxygen', 'low', 0.5, 'Blood oxygen'),
+    ('temperature', 'both', 0.15, 'Temperature'),
+)
+
+# version, readings seen, last reading (us since epoch), last warning (us), then per vital: mean, var, cusum_hi, cusum_lo
+_STATE = struct.Struct('<BIqq' + 'dddd' * len(VITALS))
+_STATE_VERSION = 1
+_EPOCH = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+
+
+def _epoch_us(timestamp_iso):
+    moment = datetime.fromisoformat(timestamp_iso.replace('Z', '+00:00'))
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return (moment - _EPOCH) // _ONE_US
+
+
+class DeviceState:
+    """Baselines and CUSUM sums for one device."""
+
+    __slots__ = ('count', 'last_us', 'warned_us', 'vitals')
+
+    def __init__(self, count=0, last_us=0, warned_us=0, vitals=None):
+        self.count = count
+        self.last_us = last_us
+        self.warned_us = warned_us
+        self.vitals = vitals or [[0.0, 0.0, 0.0, 0.0] for _ in VITALS]
+
+    @classmethod
+    def from_bytes(cls, data):
+        values = _STATE.unpack(data)
+        if values[0] != _STATE_VERSION:
+            return cls()
+        flat = values[4:]
+        return cls(values[1], values[2], values[3], [list(flat[i:i + 4]) for i in range(0, len(flat), 4)])
+
+    def to_bytes(self):
+        return _STATE.pack(_STATE_VERSION, self.count, self.last_us, self.warned_us,
+                           *(value for vital in self.vitals for value in vital))
+
+    def update(self, timestamp_us, readings):
+        """Fold in one reading; returns early-warning findings as (field, direction, score, label)."""
+        findings = []
+        rate = max(ALPHA, 1.0 / (self.count + 1))  # plain running mean while warming up
+        armed = self.count >= WARMUP
+        for (field, direction, floor, label), state in zip(VITALS, self.vitals):
+            value = float(readings[field])
+            mean, var, high, low = state
+            if self.count == 0:
+                mean = value
+            sigma = math.sqrt(max(var, floor * floor))
+            z = (value - mean) / sigma
+
+            high = max(0.0, high + z - CUSUM_K)
+            low = max(0.0, low - z - CUSUM_K)
+            if armed and high > CUSUM_H and direction in ('both', 'high'):
+                findings.append((field, 'rising', round(high, 1), label))
+                high = 0.0
+            if armed and low > CUSUM_H and direction in ('both', 'low'):
+                findings.append((field, 'falling', round(low, 1), label))
+                low = 0.0
+
+            # Robust baseline: outliers are clipped so one spike cannot drag it
+            clipped = mean + max(-Z_CLIP, min(Z_CLIP, z)) * sigma
+            delta = clipped - mean
+            mean += rate * delta
+            var = (1 - rate) * (var + rate * delta * delta)
+            state[:] = (mean, var, high, low)
+
+        self.count += 1
+        self.last_us = timestamp_us
+        if findings and timestamp_us - self.warned_us < COOLDOWN_HOURS * 3600e6:
+            return []
+        if findings:
+            self.warned_us = timestamp_us
+        return findings
+
+
+# --- PERSISTENCE ---
+# Warm containers reuse the last state they wrote; a conflicting write from
+# another container fails the version check and forces a reload.
+_cache = {}
+
+
+def _state_key(device_id):
+    return {'device_id': {'S': f'anomaly#{device_id}'}, 'timestamp': {'S': 'state'}}
+
+
+def _load(client, device_id, table_name):
+    item = client.get_item(TableName=table_name, Key=_state_key(device_id), ConsistentRead=True).get('Item')
+    if not item:
+        return 0, DeviceState()
+    return int(item['state_version']['N']), DeviceState.from_bytes(item['state']['B'])
+
+
+def observe(client, device_id, timestamp_iso, readings, table_name=ANOMALY_TABLE, attempts=3):
+    """Update a device's detector with one reading and persist it.
+
+    Returns early-warning findings. Readings older than the last one seen
+    are ignored, because the detector assumes time order.
+    """
+    timestamp_us = _epoch_us(timestamp_iso)
+    for _ in range(attempts):
+        version, state = _cache.pop(device_id, None) or _load(client, device_id, table_name)
+        if timestamp_us <= state.last_us:
+            _cache[device_id] = (version, state)
+            return []
+        findings = state.update(timestamp_us, readings)
+        item = {**_state_key(device_id), 'state': {'B': state.to_bytes()}, 'state_version': {'N': str(version + 1)}}
+        try:
+            if version:
+                client.put_item(TableName=table_name, Item=item, ConditionExpression='state_version = :version',
+                                ExpressionAttributeValues={':version': {'N': str(version)}})
+            else:
+                client.put_item(TableName=table_name, Item=item, ConditionExpression='attribute_not_exists(state_version)')
+        except client.exceptions.ConditionalCheckFailedException:
+            continue  # another container moved the state on; reload and retry
+        _cache[device_id] = (version + 1, state)
+        return findings
+    print(f"[Anomaly] Gave up updating state for {device_id} after {attempts} conflicts")
+    return []
+
+
+def describe(findings):
+    """Human-readable lines for an alert message."""
+    return [f"{label} {direction} steadily (CUSUM {score} sd)" for _, direction, score, label in findings]
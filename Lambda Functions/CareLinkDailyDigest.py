@@ -0,0 +1,147 @@
+# --- CareLinkDailyDigest.py (Scheduled daily digest per device) ---
+#
+# Run once a day from an EventBridge schedule. For each device it condenses
+# yesterday's readings into a digest (statistics plus a short Bedrock note)
+# and stores it with CareLinkVitalsStore.put_digest. CareLinkGetLatestVitals
+# then builds long-range summaries from the digests instead of raw readings.
+# Bundle CareLinkDigests.py, CareLinkVitalsStore.py and CareLinkInstrumentation.py.
+#
+# Event (all optional):
+#   {"date": "2025-04-27", "days": 1, "device_ids": ["patient-001"], "wards": ["general"], "force": false}
+# "days" > 1 backfills the days up to and including "date" (default yesterday).
+# Days that already have a digest are skipped unless "force" is true, so a
+# rerun or an overlapping backfill only does the missing work.
+
+import json
+import boto3
+import os
+from datetime import date, datetime, timedelta
+from CareLinkDigests import note_prompt, summarize
+from CareLinkInstrumentation import Timer
+from CareLinkVitalsStore import (DEFAULT_WARD, READ_BUCKETS, put_digest, query_buckets, query_digests,
+                                 query_items, query_ward_snapshot, rows)
+
+# --- SETUP AWS RESOURCES ---
+aws_region = os.environ.get('AWS_REGION', 'us-east-1')
+dynamodb = boto3.client('dynamodb', region_name=aws_region)
+bedrock = boto3.client('bedrock-runtime', region_name=aws_region)
+
+# --- ENVIRONMENT VARIABLES ---
+table_name = os.environ.get('DYNAMODB_TABLE', 'carelink_alerts')
+bedrock_model_id = os.environ.get('BEDROCK_MODEL_ID', 'amazon.titan-text-lite-v1')
+digest_notes = os.environ.get('DIGEST_NOTES', 'true').lower() == 'true'
+digest_device_ids = [s.strip() for s in os.environ.get('DIGEST_DEVICE_IDS', '').split(',') if s.strip()]
+digest_wards = [s.strip() for s in os.environ.get('DIGEST_WARDS', DEFAULT_WARD).split(',') if s.strip()]
+
+
+def list_devices(event):
+    """Devices named in the event or DIGEST_DEVICE_IDS, otherwise every device in the ward snapshots."""
+    device_ids = event.get('device_ids') or digest_device_ids
+    if device_ids:
+        return device_ids
+    found = set()
+    for ward in event.get('wards') or digest_wards:
+        found.update(p['device_id'] for p in query_ward_snapshot(dynamodb, ward))
+    return sorted(found)
+
+
+def read_day(device_id, day):
+    start_iso, end_iso = f'{day}T00:00:00', f'{day}T23:59:59.999999'
+    if READ_BUCKETS:
+        return rows(query_buckets(dynamodb, device_id, start_iso, until_iso=end_iso))
+    return query_items(dynamodb, table_name, device_id, start_iso, end_iso)
+
+
+def generate_note(digest, readings):
+    body = {
+        "inputText": note_prompt(digest, readings),
+        "textGenerationConfig": {
+            "temperature": 0.2,
+            "maxTokenCount": 120,
+            "topP": 0.9,
+            "stopSequences": []
+        }
+    }
+    response = bedrock.invoke_model(
+        modelId=bedrock_model_id,
+        body=json.dumps(body),
+        contentType="application/json",
+        accept="application/json"
+    )
+    result = json.loads(response['body'].read())
+    return result.get('results', [{}])[0].get('outputText', '').strip()
+
+
+# --- HANDLER ---
+def lambda_handler(event, context):
+    timer = Timer('CareLinkDailyDigest', event, context)
+    timer.log_payload("[Lambda Start] Event:", event)
+    status_code = 500
+
+    try:
+        last_day = date.fromisoformat(event['date']) if event.get('date') else datetime.utcnow().date() - timedelta(days=1)
+        days = int(event.get('days', 1))
+        force = bool(event.get('force', False))
+        first_day = last_day - timedelta(days=days - 1)
+        dates = [(first_day + timedelta(days=n)).isoformat() for n in range(days)]
+
+        with timer.span('list_devices'):
+            device_ids = list_devices(event)
+        if not device_ids:
+            # An empty run would look like success while no digest is ever built
+            print("[Digest] No devices: set DIGEST_DEVICE_IDS or enable ward snapshots (SNAPSHOT_ENABLED)")
+            return {
+                'statusCode': 500,
+                'body': json.dumps('No devices to digest. Set DIGEST_DEVICE_IDS or enable ward snapshots.')
+            }
+        print(f"[Digest] {len(device_ids)} devices, {dates[0]} to {dates[-1]}")
+
+        counts = {'written': 0, 'existing': 0, 'empty': 0, 'errors': 0}
+        for device_id in device_ids:
+            # One device failing must not stop the rest of the run
+            try:
+                existing = set()
+                if not force:
+                    with timer.span('dynamodb_query'):
+                        existing = {d['date'] for d in query_digests(dynamodb, device_id, dates[0], dates[-1])}
+                counts['existing'] += len(existing)
+
+                for day in dates:
+                    if day in existing:
+                        continue
+                    with timer.span('dynamodb_query'):
+                        readings = read_day(device_id, day)
+                    if not readings:
+                        counts['empty'] += 1
+                        continue
+                    digest = summarize(day, readings)
+                    if digest_notes:
+                        with timer.span('bedrock'):
+                            digest['note'] = generate_note(digest, readings)
+                    with timer.span('dynamodb_put'):
+                        put_digest(dynamodb, device_id, digest)
+                    counts['written'] += 1
+            except Exception as e:
+                counts['errors'] += 1
+                print(f"[Digest] Error for {device_id}: {str(e)}")
+
+        timer.count('digests', counts['written'])
+        print(f"[Digest] Done: {counts}")
+        result = {'devices': len(device_ids), 'from': dates[0], 'to': dates[-1], **counts}
+        if timer.debug:
+            result['timings'] = timer.report()
+
+        status_code = 200
+        return {
+            'statusCode': 200,
+            'body': json.dumps(result)
+        }
+
+    except Exception as e:
+        print("[Lambda Error]", str(e))
+        return {
+            'statusCode': 500,
+            'body': json.dumps('Error building daily digests.')
+        }
+    finally:
+        timer.emit(status_code)
@@ -0,0 +1,129 @@
+# --- CareLinkDigests.py (Daily digests and long-range summary prompts) ---
+#
+# Bundle this file with CareLinkDailyDigest and CareLinkGetLatestVitals.
+# A digest condenses one device-day into a few statistics per vital plus a
+# short generated note. Long-range summaries roll stored digests up into at
+# most DIGEST_PROMPT_LINES periods (days, weeks or months), so the Bedrock
+# prompt stays the same size however much history is requested.
+
+import math
+import os
+from datetime import date, timedelta
+from CareLinkVitalsStore import LIMITS, VITAL_FIELDS
+
+# --- ENVIRONMENT VARIABLES ---
+DIGEST_PROMPT_LINES = int(os.environ.get('DIGEST_PROMPT_LINES', '14'))
+
+PERIOD_DAYS = (1, 7, 30)
+
+
+# --- MAP: ONE DAY ---
+def summarize(day, readings):
+    """Digest of one day's readings (dicts with the three vitals)."""
+    digest = {'date': day, 'readings': len(readings)}
+    for field in VITAL_FIELDS:
+        values = [float(r[field]) for r in readings]
+        lower, upper = LIMITS[field]
+        digest[field] = {
+            'mean': round(math.fsum(values) / len(values), 2),
+            'min': min(values),
+            'max': max(values),
+            'out_of_range': sum(1 for v in values if not lower <= v <= upper),
+        }
+    return digest
+
+
+def hourly_means(readings):
+    """(hour, mean heart rate, mean oxygen, mean temperature) for each hour with readings, oldest first."""
+    hours = {}
+    for reading in readings:
+        hours.setdefault(reading['timestamp'][:13], []).append(reading)
+    return [
+        (hour, *(math.fsum(float(r[field]) for r in group) / len(group) for field in VITAL_FIELDS))
+        for hour, group in sorted(hours.items())
+    ]
+
+
+def note_prompt(digest, readings):
+    """Prompt for the short note stored with a daily digest."""
+    prompt = (
+        "You are a clinical assistant AI.\n"
+        f"Describe the patient's vitals on {digest['date']} in one or two sentences.\n"
+        "Mention only notable trends or excursions, in clinical, professional language.\n\n"
+        f"Day overview: {format_stats(digest)}\n"
+        "Hourly averages (hour, heart rate bpm, oxygen %, temperature °C):\n"
+    )
+    for hour, heart_rate, blood_oxygen, temperature in hourly_means(readings):
+        prompt += f"- {hour[11:13]}:00: {heart_rate:.0f} bpm, {blood_oxygen:.1f}%, {temperature:.1f}°C\n"
+    return prompt + "\nNote:"
+
+
+# --- REDUCE: ANY NUMBER OF DAYS ---
+def merge(label, digests):
+    """Combine consecutive digests into one period digest.
+
+    The period keeps the note of its worst day (most out-of-range readings),
+    or of its only day.
+    """
+    readings = sum(d['readings'] for d in digests)
+    merged = {'date': label, 'readings': readings}
+    for field in VITAL_FIELDS:
+        merged[field] = {
+            'mean': round(math.fsum(d[field]['mean'] * d['readings'] for d in digests) / readings, 2),
+            'min': min(d[field]['min'] for d in digests),
+            'max': max(d[field]['max'] for d in digests),
+            'out_of_range': int(sum(d[field]['out_of_range'] for d in digests)),
+        }
+    worst = max(digests, key=lambda d: sum(d[field]['out_of_range'] for field in VITAL_FIELDS))
+    if len(digests) == 1 or any(worst[field]['out_of_range'] for field in VITAL_FIELDS):
+        merged['note'] = worst.get('note')
+    return merged
+
+
+def rollup(digests, max_lines=DIGEST_PROMPT_LINES):
+    """Group date-sorted daily digests into the finest periods that fit in max_lines."""
+    if not digests:
+        return []
+    first, last = date.fromisoformat(digests[0]['date']), date.fromisoformat(digests[-1]['date'])
+    span = (last - first).days + 1
+    period = next((days for days in PERIOD_DAYS if math.ceil(span / days) <= max_lines), PERIOD_DAYS[-1])
+
+    groups = {}
+    for digest in digests:
+        groups.setdefault((date.fromisoformat(digest['date']) - first).days // period, []).append(digest)
+    periods = []
+    for index, group in sorted(groups.items()):
+        start = first + timedelta(days=index * period)
+        end = min(start + timedelta(days=period - 1), last)
+        label = start.isoformat() if period == 1 else f"{start.isoformat()} to {end.isoformat()}"
+        periods.append(merge(label, group))
+    return periods
+
+
+def format_stats(digest):
+    heart_rate, blood_oxygen, temperature = (digest[field] for field in VITAL_FIELDS)
+    out_of_range = [f"{label} {int(digest[field]['out_of_range'])}"
+                    for field, label in zip(VITAL_FIELDS, ('HR', 'SpO2', 'temp')) if digest[field]['out_of_range']]
+    return (
+        f"HR {heart_rate['mean']:g} bpm ({heart_rate['min']:g}-{heart_rate['max']:g}), "
+        f"SpO2 {blood_oxygen['mean']:g}% (min {blood_oxygen['min']:g}), "
+        f"temp {temperature['mean']:g}°C ({temperature['min']:g}-{temperature['max']:g}), "
+        + (f"out of range: {', '.join(out_of_range)} of {digest['readings']} readings" if out_of_range
+           else f"all {digest['readings']} readings in range")
+    )
+
+
+def summary_prompt(periods, days):
+    """Prompt for a summary over rolled-up digests covering the last `days` days."""
+    prompt = (
+        "You are a clinical assistant AI.\n"
+        f"Analyze the patient's vitals over the past {days} days, summarized by period below.\n"
+        "Summarize any notable *trends* ONLY (e.g., increasing heart rate, dropping oxygen, fever spikes).\n"
+        "Ignore individual values. Do NOT list raw numbers.\n"
+        "Write briefly in clinical, professional language.\n\n"
+        "Periods (averages with ranges, and a note on the most notable day):\n"
+    )
+    for period in periods:
+        prompt += f"- {period['date']}: {format_stats(period)}"
+        prompt += f". {period['note']}\n" if period.get('note') else "\n"
+    return prompt + "\nSummary:"
@@ -3,29 +3,77 @@
 import json
 import boto3
 import os
-from boto3.dynamodb.conditions import Key
-from datetime import datetime, timedelta
-
-# --- SETUP AWS RESOURCES ---
-dynamodb = boto3.resource('dynamodb')
-sagemaker_runtime = boto3.client('runtime.sagemaker', region_name='us-east-1')
-bedrock_runtime = boto3.client('bedrock-runtime', region_name='us-east-1')
+from datetime import date, datetime, timedelta
+from CareLinkDigests import DIGEST_PROMPT_LINES, rollup, summarize, summary_prompt
+from CareLinkHistoryFormat import encode_response, history_format, history_payload, request_param
+from CareLinkInstrumentation import Timer
+from CareLinkTrendPrompt import NUMPY_AVAILABLE, compact_prompt, estimate_tokens
+from CareLinkVitalsStore import (READ_BUCKETS, SNAPSHOT_ENABLED, query_columns, query_digests, query_items, rows,
+                                 update_snapshot_risk)
 
 # --- ENVIRONMENT VARIABLES ---
 table_name = os.environ.get('DYNAMODB_TABLE', 'carelink_alerts')
 sagemaker_endpoint_name = os.environ.get('SAGEMAKER_ENDPOINT_NAME', 'carelink-xgboost-endpoint')
 bedrock_model_id = os.environ.get('BEDROCK_MODEL_ID', 'amazon.titan-text-lite-v1')
+aws_region = os.environ.get('AWS_REGION', 'us-east-1')
+warm_clients = [s.strip() for s in os.environ.get('WARM_CLIENTS', 'dynamodb').split(',') if s.strip()]
+digest_summaries = os.environ.get('DIGEST_SUMMARIES', 'false').lower() == 'true'   # needs DIGEST_TABLE filled by CareLinkDailyDigest
+prompt_format = os.environ.get('PROMPT_FORMAT', 'compact')  # 'compact' facts or the original 'readings' list
+
+# --- LAZY AWS CLIENTS ---
+# Clients are built on first use and kept for the life of the container, so a
+# request that stops early (404, bad input) never pays for SageMaker or Bedrock.
+_clients = {}
+
+def get_client(service_name):
+    client = _clients.get(service_name)
+    if client is None:
+        client = _clients[service_name] = boto3.client(service_name, region_name=aws_region)
+    return client
+
+
+def warm_up(services=None):
+    """Build clients ahead of the first request (runs in the Lambda init phase)."""
+    for service_name in services or warm_clients:
+        get_client(service_name)
+
+
+def query_vitals(device_id, cutoff_iso, fmt='rows'):
+    """All readings for a device since cutoff_iso, oldest first, in either storage layout.
 
-# --- REFERENCE TABLE ---
-table = dynamodb.Table(table_name)
+    Returns (rows, columns). A columns request is read straight into NumPy
+    columns with query_columns and rows is None; the caller builds reading
+    dicts only if it needs them. Without NumPy the item layout returns rows.
+    """
+    dynamodb = get_client('dynamodb')
+    if READ_BUCKETS or (fmt == 'columns' and NUMPY_AVAILABLE):
+        columns = query_columns(dynamodb, device_id, cutoff_iso, table_name)
+        return (rows(columns) if fmt == 'rows' else None), columns
+    vitals = query_items(dynamodb, table_name, device_id, cutoff_iso)
+    vitals.sort(key=lambda x: x['timestamp'])
+    return vitals, None
+
+
+if warm_clients:
+    warm_up()
 
 # --- HANDLER ---
 def lambda_handler(event, context):
-    print("[Lambda Start] Event:", json.dumps(event))
+    if event.get('warmup'):
+        # Scheduled keep-warm ping: build every client, skip the real work
+        warm_up(['dynamodb', 'sagemaker-runtime', 'bedrock-runtime'])
+        return {'statusCode': 200, 'body': json.dumps('Warm.')}
+
+    timer = Timer('CareLinkGetLatestVitals', event, context)
+    timer.log_payload("[Lambda Start] Event:", event)
+    status_code = 500
 
     try:
-        device_id = event.get('device_id', 'patient-001')
-        months_back = int(event.get('months_back', 3))
+        device_id = request_param(event, 'device_id', 'patient-001')
+        months_back = int(request_param(event, 'months_back', 3))
+        fmt = history_format(event)
+        # analyze=false returns the history only, without SageMaker or Bedrock (voice prefetch)
+        analyze = str(request_param(event, 'analyze', 'true')).lower() not in ('false', '0', 'no')
 
         if not device_id:
             raise ValueError("Device ID must be provided.")
@@ -36,64 +84,117 @@ def lambda_handler(event, context):
 
         print(f"[Query] Fetching vitals since: {cutoff_iso}")
 
-        response = table.query(
-            KeyConditionExpression=Key('device_id').eq(device_id) & Key('timestamp').gte(cutoff_iso),
-            ScanIndexForward=True
-        )
+        with timer.span('dynamodb_query'):
+            vitals, columns = query_vitals(device_id, cutoff_iso, fmt)
+        reading_count = len(vitals) if vitals is not None else len(columns['timestamp'])
+        timer.count('readings', reading_count)
 
-        vitals = response.get('Items', [])
-
-        # Sort vitals just in case
-        vitals.sort(key=lambda x: x['timestamp'])
-
-        if not vitals:
+        if not reading_count:
+            status_code = 404
             return {
                 'statusCode': 404,
                 'body': json.dumps('No vitals found.')
             }
 
+        if not analyze:
+            with timer.span('serialize'):
+                body = json.dumps(history_payload(vitals, fmt, columns))
+            with timer.span('compress'):
+                response = encode_response(200, body, event)
+            timer.count('response_bytes', len(response['body']))
+            status_code = 200
+            return response
+
+        if vitals is None:
+            # The analysis below works on reading dicts
+            with timer.span('rows'):
+                vitals = rows(columns)
+
         # --- PREPARE DATA FOR SAGEMAKER ---
         latest_24hr = vitals[-24:]  # last 24 readings (assume 1/hr readings)
 
         if len(latest_24hr) < 24:
             raise ValueError("Not enough recent vitals for prediction.")
 
-        payload_list = []
-        for v in latest_24hr:
-            heart_rate_scaled = (float(v['heart_rate']) - 50) / (120 - 50)
-            blood_oxygen_scaled = (float(v['blood_oxygen']) - 90) / (100 - 90)
-            temperature_scaled = (float(v['temperature']) - 35) / (39 - 35)
-            payload_list.append(f"{heart_rate_scaled},{blood_oxygen_scaled},{temperature_scaled}")
+        with timer.span('featurize'):
+            payload_list = []
+            for v in latest_24hr:
+                heart_rate_scaled = (v['heart_rate'] - 50) / (120 - 50)
+                blood_oxygen_scaled = (v['blood_oxygen'] - 90) / (100 - 90)
+                temperature_scaled = (v['temperature'] - 35) / (39 - 35)
+                payload_list.append(f"{heart_rate_scaled},{blood_oxygen_scaled},{temperature_scaled}")
 
-        # SageMaker expects 1 CSV row
-        payload_csv = ",".join(payload_list)
+            # SageMaker expects 1 CSV row
+            payload_csv = ",".join(payload_list)
 
-        print("[SageMaker] Sending Payload:", payload_csv)
+        timer.log_payload("[SageMaker] Sending Payload:", payload_csv)
 
         # --- INVOKE SAGEMAKER ---
-        prediction = sagemaker_runtime.invoke_endpoint(
-            EndpointName=sagemaker_endpoint_name,
-            ContentType="text/csv",
-            Body=payload_csv
-        )
-        prediction_value = float(prediction['Body'].read().decode('utf-8').strip())
+        with timer.span('sagemaker'):
+            prediction = get_client('sagemaker-runtime').invoke_endpoint(
+                EndpointName=sagemaker_endpoint_name,
+                ContentType="text/csv",
+                Body=payload_csv
+            )
+            prediction_value = float(prediction['Body'].read().decode('utf-8').strip())
 
         print("[SageMaker] Prediction Probability:", prediction_value)
 
-        # --- PREPARE DATA FOR BEDROCK ---
-        trend_summary_prompt = (
-            "You are a clinical assistant AI.\n"
-            "Analyze the patient's vitals over the past 24 hours.\n"
-            "Summarize any notable *trends* ONLY (e.g., increasing heart rate, dropping oxygen, fever spikes).\n"
-            "Ignore individual values. Do NOT list raw numbers.\n"
-            "Write briefly in clinical, professional language.\n\n"
-            "Patient Vitals (timestamp, heart rate bpm, oxygen %, temperature °C):\n"
-        )
-
-        for v in latest_24hr:
-            trend_summary_prompt += f"- {v['timestamp']}: {v['heart_rate']} bpm, {v['blood_oxygen']}%, {v['temperature']}°C\n"
+        # --- UPDATE WARD SNAPSHOT ---
+        # Only the caller knows the ward; without one the score is not recorded
+        ward = request_param(event, 'ward')
+        if SNAPSHOT_ENABLED and ward:
+            try:
+                with timer.span('snapshot_update'):
+                    if not update_snapshot_risk(get_client('dynamodb'), ward, device_id,
+                                                prediction_value, datetime.utcnow().isoformat()):
+                        print(f"[Snapshot] Skipped risk score for {device_id}, not in ward {ward} or stale")
+            except Exception as e:
+                print("[Snapshot] Risk Update Error:", str(e))
 
-        trend_summary_prompt += "\nSummary:"
+        # --- PREPARE DATA FOR BEDROCK ---
+        # With daily digests the whole window fits one fixed-size prompt;
+        # without them, summarize recent readings as precomputed facts.
+        periods = []
+        if digest_summaries:
+            try:
+                with timer.span('digest_query'):
+                    digests = query_digests(get_client('dynamodb'), device_id, cutoff_date.date().isoformat())
+                timer.count('digests', len(digests))
+                if digests:
+                    # Readings after the newest digest have not been digested yet
+                    next_day = (date.fromisoformat(digests[-1]['date']) + timedelta(days=1)).isoformat()
+                    recent = [v for v in vitals if v['timestamp'] >= next_day]
+                    periods = rollup(digests, max(1, DIGEST_PROMPT_LINES - 1) if recent else DIGEST_PROMPT_LINES)
+                    if recent:
+                        periods.append(summarize(f"since {next_day}", recent))
+            except Exception as e:
+                print("[Digest] Query Error:", str(e))
+                periods = []
+
+        if periods:
+            trend_summary_prompt = summary_prompt(periods, 30 * months_back)
+        elif prompt_format == 'compact' and NUMPY_AVAILABLE:
+            with timer.span('prompt_build'):
+                trend_summary_prompt = compact_prompt(vitals)
+        else:
+            trend_summary_prompt = (
+                "You are a clinical assistant AI.\n"
+                "Analyze the patient's vitals over the past 24 hours.\n"
+                "Summarize any notable *trends* ONLY (e.g., increasing heart rate, dropping oxygen, fever spikes).\n"
+                "Ignore individual values. Do NOT list raw numbers.\n"
+                "Write briefly in clinical, professional language.\n\n"
+                "Patient Vitals (timestamp, heart rate bpm, oxygen %, temperature °C):\n"
+            )
+
+            for v in latest_24hr:
+                trend_summary_prompt += f"- {v['timestamp']}: {v['heart_rate']:g} bpm, {v['blood_oxygen']:g}%, {v['temperature']:g}°C\n"
+
+            trend_summary_prompt += "\nSummary:"
+
+        prompt_tokens = estimate_tokens(trend_summary_prompt)
+        timer.count('prompt_tokens', prompt_tokens)
+        timer.log_payload("[Bedrock] Prompt:", trend_summary_prompt)
 
         bedrock_body = {
             "inputText": trend_summary_prompt,
@@ -105,37 +206,40 @@ def lambda_handler(event, context):
             }
         }
 
-        bedrock_response = bedrock_runtime.invoke_model(
-            modelId=bedrock_model_id,
-            body=json.dumps(bedrock_body),
-            contentType="application/json",
-            accept="application/json"
-        )
-
-        bedrock_result = json.loads(bedrock_response['body'].read())
+        with timer.span('bedrock'):
+            bedrock_response = get_client('bedrock-runtime').invoke_model(
+                modelId=bedrock_model_id,
+                body=json.dumps(bedrock_body),
+                contentType="application/json",
+                accept="application/json"
+            )
+
+            bedrock_result = json.loads(bedrock_response['body'].read())
+        timer.count('bedrock_input_tokens', bedrock_result.get('inputTextTokenCount', 0))
+        print(f"[Bedrock] Input tokens: {bedrock_result.get('inputTextTokenCount')} (estimated {prompt_tokens})")
         summary_text = bedrock_result.get('results', [{}])[0].get('outputText', "No summary generated.")
 
         print("[Bedrock] Summary:", summary_text)
 
         # --- FINAL RETURN ---
-        clean_vitals = [
-            {
-                'timestamp': v['timestamp'],
-                'heart_rate': float(v['heart_rate']),
-                'blood_oxygen': float(v['blood_oxygen']),
-                'temperature': float(v['temperature'])
-            }
-            for v in vitals
-        ]
-
-        return {
-            'statusCode': 200,
-            'body': json.dumps({
-                'vitals_history': clean_vitals,
+        with timer.span('serialize'):
+            result = {
+                **history_payload(vitals, fmt, columns),
                 'sagemaker_prediction': prediction_value,
                 'bedrock_summary': summary_text
-            })
-        }
+            }
+            body = json.dumps(result)
+
+        if timer.debug:
+            result['timings'] = timer.report()
+            body = json.dumps(result)
+
+        with timer.span('compress'):
+            response = encode_response(200, body, event)
+        timer.count('response_bytes', len(response['body']))
+
+        status_code = 200
+        return response
 
     except Exception as e:
         print("[Lambda Error]", str(e))
@@ -143,3 +247,5 @@ def lambda_handler(event, context):
             'statusCode': 500,
             'body': json.dumps('Error retrieving and analyzing vitals.')
         }
+    finally:
+        timer.emit(status_code)
@@ -0,0 +1,62 @@
+# --- CareLinkGetWardSnapshot.py (Latest state of every patient in a ward) ---
+#
+# Reads the per-device snapshot items kept up to date by CareLinkVitalsProcessor
+# (latest reading + alert severity) and CareLinkGetLatestVitals (risk score).
+# A ward costs one query per SNAPSHOT_SHARDS shard, whatever the patient count.
+
+import json
+import boto3
+import os
+from CareLinkInstrumentation import Timer
+from CareLinkVitalsStore import DEFAULT_WARD, query_ward_snapshot
+
+# --- SETUP AWS RESOURCES ---
+dynamodb = boto3.client('dynamodb', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
+
+SEVERITY_ORDER = {'critical': 0, 'warning': 1, 'normal': 2}
+
+# --- HANDLER ---
+def lambda_handler(event, context):
+    timer = Timer('CareLinkGetWardSnapshot', event, context)
+    timer.log_payload("[Lambda Start] Event:", event)
+    status_code = 500
+
+    try:
+        ward = event.get('ward') or (event.get('queryStringParameters') or {}).get('ward')
+
+        with timer.span('dynamodb_query'):
+            patients = query_ward_snapshot(dynamodb, ward)
+        timer.count('patients', len(patients))
+
+        # Most urgent first: critical alerts, then highest risk
+        with timer.span('serialize'):
+            patients.sort(key=lambda p: (
+                SEVERITY_ORDER.get(p.get('alert_severity'), 3),
+                -(p.get('risk_score') or 0.0),
+                p['device_id'],
+            ))
+            result = {
+                'ward': ward or DEFAULT_WARD,
+                'patient_count': len(patients),
+                'critical_count': sum(1 for p in patients if p.get('alert_severity') == 'critical'),
+                'patients': patients
+            }
+            if timer.debug:
+                result['timings'] = timer.report()
+            body = json.dumps(result)
+
+        print(f"[Snapshot] Returned {len(patients)} patients for ward {result['ward']}")
+        status_code = 200
+        return {
+            'statusCode': 200,
+            'body': body
+        }
+
+    except Exception as e:
+        print("[Lambda Error]", str(e))
+        return {
+            'statusCode': 500,
+            'body': json.dumps('Error retrieving ward snapshot.')
+        }
+    finally:
+        timer.emit(status_code)
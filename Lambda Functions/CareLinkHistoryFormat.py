@@ -0,0 +1,101 @@
+# --- CareLinkHistoryFormat.py (Compact vitals_history responses) ---
+#
+# Bundle this file with CareLinkGetLatestVitals. By default the history is
+# returned as it always was: one JSON object per reading. Callers that ask for
+# history_format=columns get parallel arrays instead (epoch milliseconds plus
+# one list per vital), which is about a third of the size and much cheaper to
+# build for long windows. Independently, a response is gzipped when the
+# request's Accept-Encoding allows it. That works only behind the Lambda proxy
+# integration (API Gateway passes headers and decodes isBase64Encoded bodies);
+# a non-proxy integration never sends the header, so its responses stay plain.
+
+import base64
+import gzip
+import os
+from datetime import datetime, timezone
+from CareLinkVitalsStore import VITAL_FIELDS
+
+try:
+    import numpy as np
+except ImportError:  # timestamps are converted one by one instead
+    np = None
+
+# --- ENVIRONMENT VARIABLES ---
+HISTORY_FORMAT = os.environ.get('HISTORY_FORMAT', 'rows')                # default for requests without history_format
+RESPONSE_GZIP = os.environ.get('RESPONSE_GZIP', 'true').lower() == 'true'
+GZIP_MIN_BYTES = int(os.environ.get('GZIP_MIN_BYTES', '4096'))           # smaller bodies are sent as-is
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '5'))
+
+HISTORY_FORMATS = ('rows', 'columns')
+
+
+def request_param(event, name, default=None):
+    """A request parameter from the event itself or, behind the proxy integration, its query string."""
+    value = event.get(name)
+    if value is None:
+        value = (event.get('queryStringParameters') or {}).get(name)
+    return default if value is None else value
+
+
+def history_format(event):
+    value = str(request_param(event, 'history_format', HISTORY_FORMAT)).lower()
+    if value not in HISTORY_FORMATS:
+        raise ValueError(f"history_format must be one of {', '.join(HISTORY_FORMATS)}.")
+    return value
+
+
+def epoch_millis(timestamps):
+    """ISO timestamps (naive means UTC) as integer milliseconds since the epoch."""
+    if np is not None:
+        return np.array(timestamps, dtype='datetime64[us]').astype('datetime64[ms]').astype(np.int64).tolist()
+    millis = []
+    for timestamp in timestamps:
+        moment = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        millis.append(int(moment.timestamp() * 1000))
+    return millis
+
+
+def history_columns(vitals, columns=None):
+    """Readings as parallel arrays, from query_columns' NumPy columns.
+
+    The per-reading dicts are only used when there are no columns (no NumPy).
+    """
+    if columns is not None:
+        epoch_ms = columns['timestamp'].astype('datetime64[ms]').astype(np.int64).tolist()
+        return {'epoch_ms': epoch_ms, **{field: columns[field].tolist() for field in VITAL_FIELDS}}
+    return {
+        'epoch_ms': epoch_millis([v['timestamp'] for v in vitals]),
+        **{field: [v[field] for v in vitals] for field in VITAL_FIELDS},
+    }
+
+
+def history_payload(vitals, fmt, columns=None):
+    """The history part of the response body in the requested format."""
+    if fmt == 'columns':
+        return {'vitals_columns': history_columns(vitals, columns)}
+    return {'vitals_history': vitals}
+
+
+def accepts_gzip(event):
+    """True when the request's Accept-Encoding header allows gzip (proxy integration events only)."""
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    accepted = headers.get('accept-encoding') or ''
+    for part in accepted.split(','):
+        coding, _, params = part.strip().partition(';')
+        if coding.strip().lower() in ('gzip', '*'):
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+def encode_response(status_code, body, event):
+    """Lambda response for a JSON body, gzipped when the caller accepts it and it is worth it."""
+    if not (RESPONSE_GZIP and len(body) >= GZIP_MIN_BYTES and accepts_gzip(event)):
+        return {'statusCode': status_code, 'body': body}
+    return {
+        'statusCode': status_code,
+        'headers': {'Content-Type': 'application/json', 'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'},
+        'isBase64Encoded': True,
+        'body': base64.b64encode(gzip.compress(body.encode('utf-8'), GZIP_LEVEL)).decode('ascii'),
+    }
@@ -0,0 +1,94 @@
+# --- CareLinkInstrumentation.py (Shared timing spans for the CareLink Lambdas) ---
+#
+# Bundle this file in the deployment package of every CareLink Lambda.
+# Timings are emitted as CloudWatch Embedded Metric Format (EMF) log lines, so
+# CloudWatch turns them into metrics without any extra API calls.
+
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+
+# --- ENVIRONMENT VARIABLES ---
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'CareLink')
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', '0.1'))          # share of invocations that emit timings
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get('LOG_PAYLOAD_SAMPLE_RATE', '0.01'))  # share of invocations that log full payloads
+
+
+def is_debug(event):
+    """True when the caller asked for timings with debug=true (event or query string)."""
+    if not isinstance(event, dict):
+        return False
+    value = event.get('debug')
+    if value is None:
+        value = (event.get('queryStringParameters') or {}).get('debug')
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+class Timer:
+    """Per-invocation spans and counters.
+
+    Usage:
+        timer = Timer('CareLinkVitalsProcessor', event, context)
+        with timer.span('dynamodb_put'):
+            table.put_item(Item=item)
+        timer.emit()
+    """
+
+    def __init__(self, function_name, event=None, context=None):
+        self.function_name = getattr(context, 'function_name', None) or os.environ.get('AWS_LAMBDA_FUNCTION_NAME', function_name)
+        self.debug = is_debug(event)
+        self.sampled = self.debug or random.random() < METRICS_SAMPLE_RATE
+        self.log_payloads = self.debug or random.random() < LOG_PAYLOAD_SAMPLE_RATE
+        self.timings = {}
+        self.counters = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def log_payload(self, label, payload):
+        """Print a full payload only for sampled or debug invocations."""
+        if self.log_payloads:
+            print(label, payload if isinstance(payload, str) else json.dumps(payload, default=str))
+
+    def report(self):
+        """Rounded timings in milliseconds, including the total so far."""
+        timings = {name: round(ms, 3) for name, ms in self.timings.items()}
+        timings['total'] = round((time.perf_counter() - self._start) * 1000, 3)
+        return timings
+
+    def emit(self, status_code=None):
+        """Print one EMF record for sampled invocations."""
+        if not self.sampled:
+            return
+        timings = self.report()
+        record = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['FunctionName']],
+                    'Metrics': (
+                        [{'Name': f'{name}_ms', 'Unit': 'Milliseconds'} for name in timings]
+                        + [{'Name': name, 'Unit': 'Count'} for name in self.counters]
+                    ),
+                }],
+            },
+            'FunctionName': self.function_name,
+            'SampleRate': 1.0 if self.debug else METRICS_SAMPLE_RATE,
+        }
+        record.update({f'{name}_ms': ms for name, ms in timings.items()})
+        record.update(self.counters)
+        if status_code is not None:
+            record['statusCode'] = status_code
+        print(json.dumps(record))
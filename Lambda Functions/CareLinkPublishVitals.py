@@ -3,6 +3,7 @@
 import json
 import boto3
 import os
+from CareLinkInstrumentation import Timer
 
 # --- Setup ---
 iot_client = boto3.client('iot-data')
@@ -10,8 +11,10 @@ topic = 'carelink/vitals'
 
 # --- Lambda Handler ---
 def lambda_handler(event, context):
+    timer = Timer('CareLinkPublishVitals', event, context)
+    status_code = 500
     try:
-        print("[Lambda Start] Event:", json.dumps(event))
+        timer.log_payload("[Lambda Start] Event:", event)
 
         # Accepts a list of vitals
         vitals_list = event.get('vitals', [])
@@ -29,19 +32,24 @@ def lambda_handler(event, context):
                 "temperature": vitals['temperature'],
                 "timestamp": vitals.get('timestamp')  # Optional, can fallback on processor side
             }
-
-            print("[IoT Publish] Publishing to topic:", topic)
-            response = iot_client.publish(
-                topic=topic,
-                qos=1,
-                payload=json.dumps(body)
-            )
-            print("[IoT Publish] Response:", response)
-
-        print("[Lambda End] All vitals published successfully.")
+            if event.get('ward'):
+                body["ward"] = event['ward']  # Optional, groups the device in the ward snapshot
+
+            with timer.span('iot_publish'):
+                response = iot_client.publish(
+                    topic=topic,
+                    qos=1,
+                    payload=json.dumps(body)
+                )
+            timer.log_payload("[IoT Publish] Response:", response)
+        timer.count('readings', len(vitals_list))
+
+        print(f"[Lambda End] {len(vitals_list)} vitals published successfully to {topic}.")
+        status_code = 200
+        message = 'Vitals published to IoT successfully.'
         return {
             'statusCode': 200,
-            'body': json.dumps('Vitals published to IoT successfully.')
+            'body': json.dumps({'message': message, 'timings': timer.report()} if timer.debug else message)
         }
 
     except Exception as e:
@@ -50,3 +58,5 @@ def lambda_handler(event, context):
             'statusCode': 500,
             'body': json.dumps('Error publishing vitals to IoT.')
         }
+    finally:
+        timer.emit(status_code)
@@ -0,0 +1,106 @@
+# --- CareLinkTrendPrompt.py (Compact statistical prompt for Bedrock trend summaries) ---
+#
+# Bundle this file with CareLinkGetLatestVitals. Instead of listing every
+# reading with its full timestamp, the facts the model is asked about (slopes,
+# extremes and when they happened, threshold excursions, variability) are
+# computed up front with NumPy and written as a few short lines. Facts are
+# added in priority order until PROMPT_TOKEN_BUDGET is reached, so a week of
+# readings costs about the same prompt as a day.
+
+import math
+import os
+from CareLinkVitalsStore import LIMITS
+
+try:
+    import numpy as np
+except ImportError:  # callers fall back to the plain readings prompt
+    np = None
+
+# --- ENVIRONMENT VARIABLES ---
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', '200'))
+PROMPT_WINDOW_HOURS = float(os.environ.get('PROMPT_WINDOW_HOURS', '24'))
+
+NUMPY_AVAILABLE = np is not None
+
+# (field, label, unit, decimals)
+VITALS = (
+    ('heart_rate', 'HR', 'bpm', 0),
+    ('blood_oxygen', 'SpO2', '%', 1),
+    ('temperature', 'Temp', '°C', 1),
+)
+
+INSTRUCTIONS = (
+    "You are a clinical assistant AI.\n"
+    "Summarize any notable *trends* in the patient's vitals (e.g., increasing heart rate, dropping oxygen, fever spikes).\n"
+    "The facts below are precomputed. Do NOT list raw numbers.\n"
+    "Write briefly in clinical, professional language.\n\n"
+)
+
+
+def estimate_tokens(text):
+    """Rough Titan token count (about four characters per token)."""
+    return math.ceil(len(text) / 4)
+
+
+def _ago(hours):
+    if hours < 1 / 60:
+        return "latest reading"
+    return f"{hours:.0f}h ago" if hours >= 1 else f"{hours * 60:.0f}m ago"
+
+
+def _runs(mask):
+    """Start and end (exclusive) indexes of each run of True values."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def trend_facts(vitals, window_hours=PROMPT_WINDOW_HOURS):
+    """Fact lines for the readings in the last window_hours, most important first.
+
+    vitals must be sorted oldest first, with naive UTC ISO timestamps.
+    """
+    timestamps = np.array([v['timestamp'] for v in vitals], dtype='datetime64[us]')
+    keep = timestamps > timestamps[-1] - np.timedelta64(int(window_hours * 3600e6), 'us')
+    # Hours before the newest reading (0 = newest)
+    hours_ago = (timestamps[-1] - timestamps[keep]) / np.timedelta64(1, 'h')
+    elapsed = hours_ago[0] - hours_ago
+    count = len(hours_ago)
+    quarter = max(1, count // 4)
+
+    trends, excursions, extremes = [], [], []
+    for field, label, unit, decimals in VITALS:
+        values = np.array([v[field] for v in vitals], dtype=np.float64)[keep]
+        slope = np.polyfit(elapsed, values, 1)[0] if count > 2 and elapsed[0] != elapsed[-1] else 0.0
+        trends.append(
+            f"{label} ({unit}): {values[:quarter].mean():.{decimals}f} -> {values[-quarter:].mean():.{decimals}f}, "
+            f"slope {slope:+.{decimals + 1}f}/h, mean {values.mean():.{decimals}f}, sd {values.std():.{decimals + 1}f}"
+        )
+        low, high = int(values.argmin()), int(values.argmax())
+        extremes.append(
+            f"{label} min {values[low]:.{decimals}f} ({_ago(hours_ago[low])}), "
+            f"max {values[high]:.{decimals}f} ({_ago(hours_ago[high])})"
+        )
+
+        lower, upper = LIMITS[field]
+        for mask, side, limit in ((values < lower, 'below', lower), (values > upper, 'above', upper)):
+            starts, ends = _runs(mask)
+            if len(starts):
+                excursions.append(
+                    f"{label} {side} {limit:g}: {int(mask.sum())} readings in {len(starts)} episode(s), "
+                    f"longest {int((ends - starts).max())}, last {_ago(hours_ago[ends[-1] - 1])}"
+                )
+
+    header = f"Window: last {elapsed[-1]:.0f} h, {count} readings."
+    return [header, *trends, *(excursions or ["No threshold excursions."]), *extremes]
+
+
+def compact_prompt(vitals, window_hours=PROMPT_WINDOW_HOURS, budget=PROMPT_TOKEN_BUDGET):
+    """Trend prompt built from precomputed facts, kept within budget (estimated tokens)."""
+    prompt = INSTRUCTIONS + "Facts:\n"
+    ending = "\nSummary:"
+    for line in trend_facts(vitals, window_hours):
+        candidate = prompt + f"- {line}\n"
+        if estimate_tokens(candidate + ending) > budget:
+            break
+        prompt = candidate
+    return prompt + ending
@@ -0,0 +1,222 @@
+# --- CareLinkVitalsAnalytics.py (Server-side vitals statistics with NumPy) ---
+#
+# Returns compact aggregates instead of raw history: per-window percentiles,
+# time-in-range against the processor thresholds, linear trend slopes, EWMA and
+# threshold-crossing counts. Needs NumPy (e.g. the AWS SDK for pandas layer)
+# and CareLinkVitalsStore.py / CareLinkInstrumentation.py in the package.
+#
+# Event: {"device_id": "patient-001", "days_back": 30, "window": "day", "ewma_span": 12}
+
+import json
+import boto3
+import os
+from datetime import datetime, timedelta
+import numpy as np
+from CareLinkInstrumentation import Timer
+from CareLinkVitalsStore import LIMITS, VITAL_FIELDS, query_columns
+
+# --- SETUP AWS RESOURCES ---
+dynamodb = boto3.client('dynamodb', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
+
+# --- ENVIRONMENT VARIABLES ---
+table_name = os.environ.get('DYNAMODB_TABLE', 'carelink_alerts')
+max_windows = int(os.environ.get('ANALYTICS_MAX_WINDOWS', '1000'))
+
+WINDOWS = {'hour': 'h', 'day': 'D', 'week': 'W'}
+PERCENTILES = np.array([5, 25, 50, 75, 95])
+US_PER_DAY = 86400e6
+
+
+# --- VECTORIZED HELPERS ---
+def window_starts(timestamps, window):
+    """Index of the first reading in each window, and the window start times (timestamps must be sorted)."""
+    unit = WINDOWS[window]
+    if unit == 'W':
+        # numpy weeks start on Thursday (the epoch); shift so windows start on Monday
+        floored = (timestamps - np.timedelta64(4, 'D')).astype('datetime64[W]').astype('datetime64[D]') + np.timedelta64(4, 'D')
+    else:
+        floored = timestamps.astype(f'datetime64[{unit}]')
+    starts, first = np.unique(floored, return_index=True)
+    return first, starts
+
+
+def grouped_percentiles(values, first, q):
+    """Linear-interpolated percentiles per contiguous group, without a Python loop over groups."""
+    counts = np.diff(np.append(first, len(values)))
+    group = np.repeat(np.arange(len(first)), counts)
+    ordered = values[np.lexsort((values, group))]
+    position = first[:, None] + (q / 100.0)[None, :] * (counts - 1)[:, None]
+    low = np.floor(position).astype(np.int64)
+    high = np.minimum(low + 1, (first + counts - 1)[:, None])
+    fraction = position - low
+    return ordered[low] * (1 - fraction) + ordered[high] * fraction
+
+
+def grouped_slopes(x, y, first):
+    """Least-squares slope of y against x for each contiguous group (0 where undefined)."""
+    n = np.diff(np.append(first, len(x)))
+    sx, sy = np.add.reduceat(x, first), np.add.reduceat(y, first)
+    sxx, sxy = np.add.reduceat(x * x, first), np.add.reduceat(x * y, first)
+    denominator = n * sxx - sx * sx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slopes = (n * sxy - sx * sy) / denominator
+    return np.where(np.abs(denominator) > 1e-12, slopes, 0.0)
+
+
+def ewma(values, span):
+    """Exponentially weighted moving average, computed a block at a time.
+
+    Inside a block the recurrence is unrolled into a cumulative sum; only the
+    carry between blocks is sequential, so a year of minute data takes a few
+    hundred vector steps instead of half a million Python iterations.
+    """
+    alpha = 2.0 / (max(span, 1) + 1)
+    decay = 1.0 - alpha
+    if decay <= 0:
+        return values.copy()
+    # Keep decay ** -block below ~1e12 so the cumulative sum stays precise
+    block = int(max(1, min(1024, 12 * np.log(10) / -np.log(decay))))
+    out = np.empty_like(values)
+    powers = decay ** np.arange(block + 1)
+    carry = values[0] if len(values) else 0.0
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        size = len(chunk)
+        scaled = np.cumsum(chunk / powers[:size]) * powers[:size]
+        out[start:start + size] = alpha * scaled + powers[1:size + 1] * carry
+        carry = out[start + size - 1]
+    return out
+
+
+def durations_us(timestamps):
+    """Time each reading stands for: until the next one, capped at 3x the median gap."""
+    if len(timestamps) < 2:
+        return np.ones(len(timestamps))
+    gaps = np.diff(timestamps).astype(np.float64)
+    cap = 3 * np.median(gaps)
+    if cap <= 0:
+        return np.ones(len(timestamps))
+    gaps = np.minimum(gaps, cap)
+    return np.append(gaps, np.median(gaps))
+
+
+def analyze(columns, first, starts, span):
+    """Summary and per-window statistics for time-sorted columns."""
+    timestamps = columns['timestamp']
+    elapsed_days = (timestamps - timestamps[0]).astype(np.float64) / US_PER_DAY
+    weights = durations_us(timestamps)
+    total_weight = weights.sum()
+
+    window_days = elapsed_days - np.repeat(elapsed_days[first], np.diff(np.append(first, len(timestamps))))
+    last = np.append(first[1:], len(timestamps)) - 1
+    window_rows = [{'start': str(start), 'count': int(count)} for start, count in zip(starts, np.diff(np.append(first, len(timestamps))))]
+
+    summary, any_out = {}, np.zeros(len(timestamps), dtype=bool)
+    for field in VITAL_FIELDS:
+        values = columns[field]
+        lower, upper = LIMITS[field]
+        below, above = values < lower, values > upper
+        out = below | above
+        any_out |= out
+        # A crossing is a reading that leaves the range after an in-range one
+        crossings = out & ~np.concatenate(([False], out[:-1]))
+        smoothed = ewma(values, span)
+
+        percentiles = grouped_percentiles(values, first, PERCENTILES)
+        means = np.add.reduceat(values, first) / np.diff(np.append(first, len(values)))
+        minimums, maximums = np.minimum.reduceat(values, first), np.maximum.reduceat(values, first)
+        slopes = grouped_slopes(window_days, values, first)
+        window_crossings = np.add.reduceat(crossings.astype(np.int64), first)
+
+        for i, row in enumerate(window_rows):
+            row[field] = {
+                'mean': round(float(means[i]), 2),
+                'min': round(float(minimums[i]), 2),
+                'max': round(float(maximums[i]), 2),
+                **{f'p{int(q)}': round(float(v), 2) for q, v in zip(PERCENTILES, percentiles[i])},
+                'slope_per_day': round(float(slopes[i]), 3),
+                'ewma': round(float(smoothed[last[i]]), 2),
+                'crossings': int(window_crossings[i]),
+            }
+
+        overall = np.percentile(values, PERCENTILES)
+        summary[field] = {
+            'mean': round(float(values.mean()), 2),
+            **{f'p{int(q)}': round(float(v), 2) for q, v in zip(PERCENTILES, overall)},
+            'limits': {'lower': lower, 'upper': upper if np.isfinite(upper) else None},
+            'time_in_range_pct': round(float(weights[~out].sum() / total_weight * 100), 2),
+            'time_below_pct': round(float(weights[below].sum() / total_weight * 100), 2),
+            'time_above_pct': round(float(weights[above].sum() / total_weight * 100), 2),
+            'slope_per_day': round(float(grouped_slopes(elapsed_days, values, np.array([0]))[0]), 3),
+            'ewma': round(float(smoothed[-1]), 2),
+            'crossings': int(crossings.sum()),
+        }
+    summary['all_vitals_in_range_pct'] = round(float(weights[~any_out].sum() / total_weight * 100), 2)
+    return summary, window_rows
+
+
+# --- HANDLER ---
+def lambda_handler(event, context):
+    timer = Timer('CareLinkVitalsAnalytics', event, context)
+    timer.log_payload("[Lambda Start] Event:", event)
+    status_code = 500
+
+    try:
+        device_id = event.get('device_id', 'patient-001')
+        days_back = int(event.get('days_back', 30))
+        window = event.get('window', 'day')
+        span = int(event.get('ewma_span', 12))
+
+        if window not in WINDOWS:
+            status_code = 400
+            return {'statusCode': 400, 'body': json.dumps(f"window must be one of {', '.join(WINDOWS)}.")}
+
+        cutoff_iso = (datetime.utcnow() - timedelta(days=days_back)).isoformat()
+        print(f"[Query] Fetching {device_id} vitals since: {cutoff_iso}")
+
+        with timer.span('dynamodb_query'):
+            columns = query_columns(dynamodb, device_id, cutoff_iso, table_name)
+        readings = len(columns['timestamp'])
+        timer.count('readings', readings)
+
+        if not readings:
+            status_code = 404
+            return {'statusCode': 404, 'body': json.dumps('No vitals found.')}
+
+        with timer.span('analyze'):
+            order = np.argsort(columns['timestamp'], kind='stable')
+            columns = {name: values[order] for name, values in columns.items()}
+            first, starts = window_starts(columns['timestamp'], window)
+            if len(starts) > max_windows:
+                status_code = 400
+                return {'statusCode': 400, 'body': json.dumps(f"{len(starts)} windows requested; use a coarser window or fewer days.")}
+            summary, windows = analyze(columns, first, starts, span)
+
+        with timer.span('serialize'):
+            result = {
+                'device_id': device_id,
+                'from': str(columns['timestamp'][0]),
+                'to': str(columns['timestamp'][-1]),
+                'readings': readings,
+                'window': window,
+                'summary': summary,
+                'windows': windows
+            }
+            if timer.debug:
+                result['timings'] = timer.report()
+            body = json.dumps(result)
+
+        status_code = 200
+        return {
+            'statusCode': 200,
+            'body': body
+        }
+
+    except Exception as e:
+        print("[Lambda Error]", str(e))
+        return {
+            'statusCode': 500,
+            'body': json.dumps('Error computing vitals analytics.')
+        }
+    finally:
+        timer.emit(status_code)
@@ -5,9 +5,13 @@ import boto3
 import os
 from datetime import datetime
 from decimal import Decimal
+from CareLinkAnomalyDetector import ANOMALY_DETECTION, describe, observe
+from CareLinkInstrumentation import Timer
+from CareLinkVitalsStore import SNAPSHOT_ENABLED, WRITE_BUCKETS, WRITE_ITEMS, append_reading, update_snapshot_reading
 
 # Initialize AWS resources
 dynamodb = boto3.resource('dynamodb')
+dynamodb_client = boto3.client('dynamodb') if WRITE_BUCKETS or SNAPSHOT_ENABLED or ANOMALY_DETECTION else None
 sns = boto3.client('sns')
 
 # Environment variables
@@ -61,15 +65,39 @@ def publish_critical_alert(device_id, critical_messages, timestamp):
         print(f"[SNS] Publish Error: {str(e)}")
         raise
 
+def publish_early_warning(device_id, warning_messages, timestamp):
+    try:
+        message = "CareLink Early Warning\n"
+        message += f"Device ID: {device_id}\n"
+        message += "Vitals are drifting away from this patient's baseline:\n"
+        for msg in warning_messages:
+            message += f"- {msg}\n"
+        message += f"Timestamp: {timestamp}"
+
+        print(f"[SNS] Publishing early warning:\n{message}")
+
+        sns.publish(
+            TopicArn=sns_topic_arn,
+            Message=message,
+            Subject="CareLink Early Warning"
+        )
+
+    except Exception as e:
+        print(f"[SNS] Publish Error: {str(e)}")
+        raise
+
 def lambda_handler(event, context):
-    print(f"[Lambda Start] Event: {json.dumps(event)}")
+    timer = Timer('CareLinkVitalsProcessor', event, context)
+    timer.log_payload("[Lambda Start] Event:", event)
+    status_code = 500
 
     try:
         device_id = event.get('device_id')
         heart_rate = Decimal(str(event.get('heart_rate')))
         blood_oxygen = Decimal(str(event.get('blood_oxygen')))
         temperature = Decimal(str(event.get('temperature')))
-        timestamp = event.get('timestamp', datetime.utcnow().isoformat())
+        timestamp = event.get('timestamp') or datetime.utcnow().isoformat()
+        ward = event.get('ward')
 
         item = {
             'device_id': device_id,
@@ -79,18 +107,59 @@ def lambda_handler(event, context):
             'temperature': temperature
         }
 
-        print(f"[DynamoDB] Saving Item: {item}")
-        table.put_item(Item=item)
-
-        critical_messages = check_vitals_critical(heart_rate, blood_oxygen, temperature)
+        timer.log_payload("[DynamoDB] Saving Item:", item)
+        if WRITE_ITEMS:
+            with timer.span('dynamodb_put'):
+                table.put_item(Item=item)
+        if WRITE_BUCKETS:
+            with timer.span('dynamodb_bucket_append'):
+                append_reading(dynamodb_client, device_id, timestamp, heart_rate, blood_oxygen, temperature)
+
+        with timer.span('threshold_check'):
+            critical_messages = check_vitals_critical(heart_rate, blood_oxygen, temperature)
+
+        warning_messages = []
+        if ANOMALY_DETECTION:
+            # Early warnings are advisory: a detector failure must not lose the reading
+            try:
+                with timer.span('anomaly_check'):
+                    findings = observe(dynamodb_client, device_id, timestamp, {
+                        'heart_rate': heart_rate,
+                        'blood_oxygen': blood_oxygen,
+                        'temperature': temperature
+                    })
+                warning_messages = describe(findings)
+                print(f"[Anomaly Check] Early Warnings: {warning_messages}")
+            except Exception as e:
+                print(f"[Anomaly] Detector Error: {str(e)}")
+
+        if SNAPSHOT_ENABLED:
+            # The snapshot is a derived view: a failure here must not lose the reading
+            try:
+                with timer.span('snapshot_update'):
+                    if not update_snapshot_reading(dynamodb_client, ward, device_id, timestamp,
+                                                   heart_rate, blood_oxygen, temperature, critical_messages,
+                                                   warning_messages):
+                        print(f"[Snapshot] Skipped out-of-order reading for {device_id} at {timestamp}")
+            except Exception as e:
+                print(f"[Snapshot] Update Error: {str(e)}")
 
         if critical_messages:
-            publish_critical_alert(device_id, critical_messages, timestamp)
+            timer.count('alerts')
+            with timer.span('sns_publish'):
+                publish_critical_alert(device_id, critical_messages, timestamp)
+        elif warning_messages:
+            # A critical alert already covers the patient; only warn ahead of one
+            timer.count('early_warnings')
+            with timer.span('sns_publish'):
+                publish_early_warning(device_id, warning_messages, timestamp)
 
         print("[Lambda End] Completed successfully")
+        status_code = 200
+        message = 'Vitals stored and alerts processed successfully.'
         return {
             'statusCode': 200,
-            'body': json.dumps('Vitals stored and alerts processed successfully.')
+            'body': json.dumps({'message': message, 'timings': timer.report()} if timer.debug else message)
         }
 
     except Exception as e:
@@ -99,3 +168,5 @@ def lambda_handler(event, context):
             'statusCode': 500,
             'body': json.dumps('Error processing vitals.')
         }
+    finally:
+        timer.emit(status_code)
@@ -0,0 +1,443 @@
+# --- CareLinkVitalsStore.py (Shared DynamoDB access for vitals readings) ---
+#
+# Bundle this file with CareLinkVitalsProcessor and CareLinkGetLatestVitals.
+# Two storage layouts are supported, picked with VITALS_LAYOUT:
+#
+#   item    one item per reading in carelink_alerts (the original layout)
+#   bucket  one item per device per hour in VITALS_BUCKET_TABLE, readings
+#           appended to parallel lists with list_append
+#   both    write both layouts (for migrating), read items
+#
+# A bucket item looks like:
+#   device_id      S   'patient-001'                  (hash key)
+#   hour           S   '2025-04-28T14'                (range key; '2025-04-28T14#001'
+#                                                  and on for the later parts of a busy hour)
+#   offsets        L   [N seconds into the hour, ...]
+#   heart_rate     L   [N, ...]
+#   blood_oxygen   L   [N, ...]
+#   temperature    L   [N, ...]
+#   reading_count  N   appends so far (may count duplicate deliveries)
+#
+# UpdateItem is billed on the size of the whole item, so a bucket takes at most
+# VITALS_BUCKET_MAX_READINGS readings; the rest of the hour goes to further parts.
+#
+# The ward snapshot keeps one small item per device in SNAPSHOT_TABLE, grouped
+# under a few partition keys so a whole ward is read with one query per shard:
+#   device_id             S   'snapshot#<ward>#<shard>'   (hash key)
+#   timestamp             S   patient device id           (range key)
+#   reading_timestamp     S   time of the latest reading
+#   heart_rate, blood_oxygen, temperature   N
+#   alert_severity        S   'normal' or 'critical' for the latest reading
+#   last_alert_timestamp  S   last critical reading, with last_alert text
+#   risk_score            N   latest SageMaker prediction, with risk_timestamp
+#
+# Daily digests (written by CareLinkDailyDigest) live in DIGEST_TABLE:
+#   device_id             S   'digest#<device id>'       (hash key)
+#   timestamp             S   'YYYY-MM-DD'               (range key)
+#   readings              N   readings that day
+#   heart_rate, blood_oxygen, temperature   M   mean/min/max/out_of_range
+#   note                  S   short generated note (optional)
+
+import os
+import zlib
+from datetime import datetime, timezone
+
+try:
+    import numpy as np
+except ImportError:  # only the bucket reader needs NumPy
+    np = None
+
+# --- ENVIRONMENT VARIABLES ---
+VITALS_LAYOUT = os.environ.get('VITALS_LAYOUT', 'item')
+VITALS_READ_LAYOUT = os.environ.get('VITALS_READ_LAYOUT', 'bucket' if VITALS_LAYOUT == 'bucket' else 'item')
+VITALS_BUCKET_TABLE = os.environ.get('VITALS_BUCKET_TABLE', 'carelink_vitals_hourly')
+VITALS_BUCKET_MAX_READINGS = int(os.environ.get('VITALS_BUCKET_MAX_READINGS', '50'))   # per bucket item, about 1 KB; 0 = no limit
+SNAPSHOT_TABLE = os.environ.get('SNAPSHOT_TABLE', 'carelink_ward_snapshot')     # kept apart from the raw readings
+SNAPSHOT_SHARDS = int(os.environ.get('SNAPSHOT_SHARDS', '1'))    # raise for very busy wards
+DEFAULT_WARD = os.environ.get('DEFAULT_WARD', 'general')
+SNAPSHOT_ENABLED = os.environ.get('SNAPSHOT_ENABLED', 'false').lower() == 'true'   # needs SNAPSHOT_TABLE to exist
+DIGEST_TABLE = os.environ.get('DIGEST_TABLE', 'carelink_daily_digests')
+
+WRITE_ITEMS = VITALS_LAYOUT in ('item', 'both')
+WRITE_BUCKETS = VITALS_LAYOUT in ('bucket', 'both')
+READ_BUCKETS = VITALS_READ_LAYOUT == 'bucket'
+
+VITAL_FIELDS = ('heart_rate', 'blood_oxygen', 'temperature')
+
+# Same thresholds (and defaults) as CareLinkVitalsProcessor
+LIMITS = {
+    'heart_rate': (float(os.environ.get('HEART_RATE_LOWER_LIMIT', '50')), float(os.environ.get('HEART_RATE_UPPER_LIMIT', '120'))),
+    'blood_oxygen': (float(os.environ.get('BLOOD_OXYGEN_LOWER_LIMIT', '90')), float('inf')),
+    'temperature': (float(os.environ.get('TEMPERATURE_LOWER_LIMIT', '35')), float(os.environ.get('TEMPERATURE_UPPER_LIMIT', '39'))),
+}
+
+_EMPTY_LIST = {'L': []}
+
+
+# --- FAST DYNAMODB DESERIALIZER ---
+# The low-level client returns typed attributes ({'N': '72.5'}). Numbers become
+# floats directly instead of going through the resource layer's Decimal types.
+def _deserialize(value):
+    (kind, raw), = value.items()
+    if kind == 'S':
+        return raw
+    if kind == 'N':
+        return float(raw)
+    if kind == 'BOOL':
+        return raw
+    if kind == 'NULL':
+        return None
+    if kind == 'M':
+        return {k: _deserialize(v) for k, v in raw.items()}
+    if kind == 'L':
+        return [_deserialize(v) for v in raw]
+    if kind == 'NS':
+        return [float(v) for v in raw]
+    return raw
+
+
+def deserialize_item(item):
+    return {k: _deserialize(v) for k, v in item.items()}
+
+
+def _query_pages(client, **kwargs):
+    """Yield the raw items of each query page as a list."""
+    while True:
+        response = client.query(**kwargs)
+        yield response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _query_all(client, **kwargs):
+    """Yield raw items from every page of a query."""
+    for page in _query_pages(client, **kwargs):
+        yield from page
+
+
+# --- ITEM LAYOUT ---
+def query_items(client, table_name, device_id, cutoff_iso, until_iso=None):
+    """Readings for a device since cutoff_iso (up to until_iso, inclusive) as dicts, oldest first."""
+    values = {':device_id': {'S': device_id}, ':cutoff': {'S': cutoff_iso}}
+    condition = 'device_id = :device_id AND #ts >= :cutoff'
+    if until_iso:
+        condition = 'device_id = :device_id AND #ts BETWEEN :cutoff AND :until'
+        values[':until'] = {'S': until_iso}
+    return [deserialize_item(i) for i in _query_all(
+        client,
+        TableName=table_name,
+        KeyConditionExpression=condition,
+        ProjectionExpression='#ts, heart_rate, blood_oxygen, temperature',
+        ExpressionAttributeNames={'#ts': 'timestamp'},
+        ExpressionAttributeValues=values,
+        ScanIndexForward=True,
+    )]
+
+
+# --- BUCKET LAYOUT ---
+def _utc_naive(timestamp_iso):
+    moment = datetime.fromisoformat(timestamp_iso.replace('Z', '+00:00'))
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def _offset_number(offset):
+    """Shortest exact-to-the-microsecond form, e.g. 300.5 rather than 300.500000."""
+    return f'{offset:.6f}'.rstrip('0').rstrip('.')
+
+
+def bucket_key(timestamp_iso):
+    """('YYYY-MM-DDTHH', seconds into the hour) for a reading timestamp."""
+    moment = _utc_naive(timestamp_iso)
+    offset = moment.minute * 60 + moment.second + moment.microsecond / 1e6
+    return moment.strftime('%Y-%m-%dT%H'), offset
+
+
+def bucket_part_key(hour, part):
+    """Range key of one part of an hour's bucket; the first part is the plain hour."""
+    return f'{hour}#{part:03d}' if part else hour
+
+
+# Bucket part each device last appended to, kept across warm invocations
+_open_parts = {}
+
+
+def append_reading(client, device_id, timestamp_iso, heart_rate, blood_oxygen, temperature, table_name=VITALS_BUCKET_TABLE):
+    """Append one reading to its hourly bucket, moving on to the next part once a part is full."""
+    hour, offset = bucket_key(timestamp_iso)
+    open_hour, part = _open_parts.get(device_id, (hour, 0))
+    if open_hour != hour:
+        part = 0
+    values = {
+        ':empty': _EMPTY_LIST,
+        ':offset': {'L': [{'N': _offset_number(offset)}]},
+        ':heart_rate': {'L': [{'N': str(heart_rate)}]},
+        ':blood_oxygen': {'L': [{'N': str(blood_oxygen)}]},
+        ':temperature': {'L': [{'N': str(temperature)}]},
+        ':one': {'N': '1'},
+    }
+    condition = {}
+    if VITALS_BUCKET_MAX_READINGS:
+        condition['ConditionExpression'] = 'attribute_not_exists(reading_count) OR reading_count < :max'
+        values[':max'] = {'N': str(VITALS_BUCKET_MAX_READINGS)}
+    while True:
+        try:
+            client.update_item(
+                TableName=table_name,
+                Key={'device_id': {'S': device_id}, 'hour': {'S': bucket_part_key(hour, part)}},
+                UpdateExpression=(
+                    'SET offsets = list_append(if_not_exists(offsets, :empty), :offset), '
+                    'heart_rate = list_append(if_not_exists(heart_rate, :empty), :heart_rate), '
+                    'blood_oxygen = list_append(if_not_exists(blood_oxygen, :empty), :blood_oxygen), '
+                    'temperature = list_append(if_not_exists(temperature, :empty), :temperature) '
+                    'ADD reading_count :one'
+                ),
+                ExpressionAttributeValues=values,
+                **condition,
+            )
+            break
+        except client.exceptions.ConditionalCheckFailedException:
+            part += 1
+    _open_parts[device_id] = (hour, part)
+
+
+def pack_buckets(device_id, readings):
+    """Wire-format bucket items for a batch of reading dicts (used for backfills)."""
+    buckets = {}
+    for reading in sorted(readings, key=lambda r: r['timestamp']):
+        hour, offset = bucket_key(reading['timestamp'])
+        bucket = buckets.setdefault(hour, {'offsets': [], **{field: [] for field in VITAL_FIELDS}})
+        bucket['offsets'].append({'N': _offset_number(offset)})
+        for field in VITAL_FIELDS:
+            bucket[field].append({'N': str(reading[field])})
+    items = []
+    for hour, bucket in buckets.items():
+        count = len(bucket['offsets'])
+        size = VITALS_BUCKET_MAX_READINGS or count
+        for part, start in enumerate(range(0, count, size)):
+            items.append({
+                'device_id': {'S': device_id},
+                'hour': {'S': bucket_part_key(hour, part)},
+                **{name: {'L': values[start:start + size]} for name, values in bucket.items()},
+                'reading_count': {'N': str(min(size, count - start))},
+            })
+    return items
+
+
+def _unpack_bucket(item):
+    base = np.datetime64(item['hour']['S'].partition('#')[0], 'us')
+    offsets = np.array([v['N'] for v in item.get('offsets', _EMPTY_LIST)['L']], dtype=np.float64)
+    columns = {'timestamp': base + np.round(offsets * 1e6).astype('timedelta64[us]')}
+    for field in VITAL_FIELDS:
+        columns[field] = np.array([v['N'] for v in item.get(field, _EMPTY_LIST)['L']], dtype=np.float64)
+    return columns
+
+
+def query_buckets(client, device_id, cutoff_iso, table_name=VITALS_BUCKET_TABLE, until_iso=None):
+    """Readings since cutoff_iso (up to until_iso) as NumPy arrays keyed by field, oldest first.
+
+    'timestamp' is datetime64[us]; vitals are float64. Readings delivered twice
+    (same timestamp) are kept once.
+    """
+    if np is None:
+        raise RuntimeError("VITALS_LAYOUT=bucket needs NumPy (add a NumPy layer to the Lambda)")
+    cutoff_hour, _ = bucket_key(cutoff_iso)
+    values = {':device_id': {'S': device_id}, ':cutoff_hour': {'S': cutoff_hour}}
+    condition = 'device_id = :device_id AND #hour >= :cutoff_hour'
+    if until_iso:
+        condition = 'device_id = :device_id AND #hour BETWEEN :cutoff_hour AND :until_hour'
+        values[':until_hour'] = {'S': bucket_key(until_iso)[0] + '#~'}  # and that hour's later parts
+    parts = [_unpack_bucket(item) for item in _query_all(
+        client,
+        TableName=table_name,
+        KeyConditionExpression=condition,
+        ExpressionAttributeNames={'#hour': 'hour'},
+        ExpressionAttributeValues=values,
+        ScanIndexForward=True,
+    )]
+    if not parts:
+        return {'timestamp': np.array([], dtype='datetime64[us]'), **{f: np.array([]) for f in VITAL_FIELDS}}
+
+    columns = {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+    keep = columns['timestamp'] >= np.datetime64(_utc_naive(cutoff_iso), 'us')
+    if until_iso:
+        keep &= columns['timestamp'] <= np.datetime64(_utc_naive(until_iso), 'us')
+    _, first = np.unique(columns['timestamp'][keep], return_index=True)
+    order = np.flatnonzero(keep)[first]
+    return {name: values[order] for name, values in columns.items()}
+
+
+def query_columns(client, device_id, cutoff_iso, table_name, bucket_table_name=VITALS_BUCKET_TABLE):
+    """Readings since cutoff_iso as NumPy columns, whichever layout is being read.
+
+    Pages are converted to arrays as they arrive, so peak memory stays close to
+    the final arrays even for a year of minute-level data.
+    """
+    if np is None:
+        raise RuntimeError("Columnar reads need NumPy (add a NumPy layer to the Lambda)")
+    if READ_BUCKETS:
+        return query_buckets(client, device_id, cutoff_iso, bucket_table_name)
+
+    parts = []
+    for page in _query_pages(
+        client,
+        TableName=table_name,
+        KeyConditionExpression='device_id = :device_id AND #ts >= :cutoff',
+        ProjectionExpression='#ts, heart_rate, blood_oxygen, temperature',
+        ExpressionAttributeNames={'#ts': 'timestamp'},
+        ExpressionAttributeValues={':device_id': {'S': device_id}, ':cutoff': {'S': cutoff_iso}},
+        ScanIndexForward=True,
+    ):
+        page = [i for i in page if all(field in i for field in VITAL_FIELDS)]
+        part = {'timestamp': np.array([i['timestamp']['S'] for i in page], dtype='datetime64[us]')}
+        for field in VITAL_FIELDS:
+            part[field] = np.array([i[field]['N'] for i in page], dtype=np.float64)
+        parts.append(part)
+    if not parts:
+        return {'timestamp': np.array([], dtype='datetime64[us]'), **{f: np.array([]) for f in VITAL_FIELDS}}
+    return {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+
+def rows(columns):
+    """Bucket arrays as the list of reading dicts the item layout returns."""
+    timestamps = np.datetime_as_string(columns['timestamp'], unit='us').tolist()
+    values = [columns[field].tolist() for field in VITAL_FIELDS]
+    return [
+        {'timestamp': ts, 'heart_rate': hr, 'blood_oxygen': spo2, 'temperature': temp}
+        for ts, hr, spo2, temp in zip(timestamps, *values)
+    ]
+
+
+def get_reading(client, device_id, timestamp_iso, table_name=VITALS_BUCKET_TABLE):
+    """Point lookup of one reading in the bucket layout, or None."""
+    hour, offset = bucket_key(timestamp_iso)
+    for item in _query_all(
+        client,
+        TableName=table_name,
+        KeyConditionExpression='device_id = :device_id AND #hour BETWEEN :hour AND :last_part',
+        ExpressionAttributeNames={'#hour': 'hour'},
+        ExpressionAttributeValues={':device_id': {'S': device_id}, ':hour': {'S': hour}, ':last_part': {'S': hour + '#~'}},
+    ):
+        offsets = [float(v['N']) for v in item.get('offsets', _EMPTY_LIST)['L']]
+        for index, value in enumerate(offsets):
+            if abs(value - offset) < 1e-6:
+                reading = {'timestamp': timestamp_iso}
+                for field in VITAL_FIELDS:
+                    reading[field] = float(item[field]['L'][index]['N'])
+                return reading
+    return None
+
+
+# --- WARD SNAPSHOT ---
+def snapshot_key(ward, device_id):
+    """Partition key of the snapshot shard holding a device."""
+    shard = zlib.crc32(device_id.encode('utf-8')) % SNAPSHOT_SHARDS
+    return f'snapshot#{ward or DEFAULT_WARD}#{shard}'
+
+
+def _update_snapshot(client, ward, device_id, update, values, newer_than, table_name, existing_only=False):
+    """Apply update only if newer_than is later than what the item holds; False if it is stale.
+
+    With existing_only the device must already have a reading in this ward's
+    snapshot, so an update never creates a patient in the wrong ward.
+    """
+    condition = f'attribute_not_exists({newer_than}) OR {newer_than} < :ts'
+    if existing_only:
+        condition = f'attribute_exists(reading_timestamp) AND ({condition})'
+    try:
+        client.update_item(
+            TableName=table_name,
+            Key={'device_id': {'S': snapshot_key(ward, device_id)}, 'timestamp': {'S': device_id}},
+            UpdateExpression=update,
+            ConditionExpression=condition,
+            ExpressionAttributeValues=values,
+        )
+        return True
+    except client.exceptions.ConditionalCheckFailedException:
+        return False
+
+
+def update_snapshot_reading(client, ward, device_id, timestamp_iso, heart_rate, blood_oxygen, temperature,
+                            critical_messages=(), warning_messages=(), table_name=SNAPSHOT_TABLE):
+    """Record a device's latest reading; out-of-order deliveries are ignored."""
+    update = ('SET reading_timestamp = :ts, heart_rate = :heart_rate, blood_oxygen = :blood_oxygen, '
+              'temperature = :temperature, alert_severity = :severity')
+    values = {
+        ':ts': {'S': timestamp_iso},
+        ':heart_rate': {'N': str(heart_rate)},
+        ':blood_oxygen': {'N': str(blood_oxygen)},
+        ':temperature': {'N': str(temperature)},
+        ':severity': {'S': 'critical' if critical_messages else 'warning' if warning_messages else 'normal'},
+    }
+    if critical_messages or warning_messages:
+        update += ', last_alert_timestamp = :ts, last_alert = :alert'
+        values[':alert'] = {'S': '; '.join(critical_messages or warning_messages)}
+    return _update_snapshot(client, ward, device_id, update, values, 'reading_timestamp', table_name)
+
+
+def update_snapshot_risk(client, ward, device_id, risk_score, timestamp_iso, table_name=SNAPSHOT_TABLE):
+    """Record the latest risk score of a device already in the ward; older scores never overwrite newer ones."""
+    return _update_snapshot(
+        client, ward, device_id,
+        'SET risk_score = :risk, risk_timestamp = :ts',
+        {':risk': {'N': str(risk_score)}, ':ts': {'S': timestamp_iso}},
+        'risk_timestamp', table_name, existing_only=True,
+    )
+
+
+def query_ward_snapshot(client, ward, table_name=SNAPSHOT_TABLE):
+    """Latest state of every device in a ward, one query (plus pages) per shard."""
+    patients = []
+    for shard in range(SNAPSHOT_SHARDS):
+        for item in _query_all(
+            client,
+            TableName=table_name,
+            KeyConditionExpression='device_id = :snapshot',
+            ExpressionAttributeValues={':snapshot': {'S': f'snapshot#{ward or DEFAULT_WARD}#{shard}'}},
+        ):
+            patient = deserialize_item(item)
+            del patient['device_id']
+            patient['device_id'] = patient.pop('timestamp')
+            patients.append(patient)
+    return patients
+
+
+# --- DAILY DIGESTS ---
+def put_digest(client, device_id, digest, table_name=DIGEST_TABLE):
+    """Store (or replace) one device-day digest as built by CareLinkDigests.summarize."""
+    item = {
+        'device_id': {'S': f'digest#{device_id}'},
+        'timestamp': {'S': digest['date']},
+        'readings': {'N': str(digest['readings'])},
+        'generated_at': {'S': datetime.utcnow().isoformat()},
+    }
+    for field in VITAL_FIELDS:
+        item[field] = {'M': {name: {'N': str(value)} for name, value in digest[field].items()}}
+    if digest.get('note'):
+        item['note'] = {'S': digest['note']}
+    client.put_item(TableName=table_name, Item=item)
+
+
+def query_digests(client, device_id, start_date, end_date=None, table_name=DIGEST_TABLE):
+    """Digests for a device from start_date to end_date (inclusive, 'YYYY-MM-DD'), oldest first."""
+    digests = []
+    for item in _query_all(
+        client,
+        TableName=table_name,
+        KeyConditionExpression='device_id = :digest AND #ts BETWEEN :start AND :end',
+        ExpressionAttributeNames={'#ts': 'timestamp'},
+        ExpressionAttributeValues={
+            ':digest': {'S': f'digest#{device_id}'},
+            ':start': {'S': start_date},
+            ':end': {'S': end_date or '9999-12-31'},
+        },
+        ScanIndexForward=True,
+    ):
+        digest = deserialize_item(item)
+        digest['date'] = digest.pop('timestamp')
+        digest['readings'] = int(digest['readings'])
+        del digest['device_id']
+        digests.append(digest)
+    return digests
@@ -1,12 +1,34 @@
 import json
 import boto3
 import os
+from kb_cache import RetrievalCache
 
 KB_ID = os.environ.get('KB_ID')
 KB_REGION = os.environ.get('KB_REGION', 'us-east-1')
 bedrock_agent_runtime = boto3.client('bedrock-agent-runtime', region_name=KB_REGION) 
 
+# Retrieval cache: set KB_CACHE_MAX_ENTRIES=0 to disable
+KB_CACHE_MAX_ENTRIES = int(os.environ.get('KB_CACHE_MAX_ENTRIES', '256'))
+KB_CACHE_TTL_SECONDS = float(os.environ.get('KB_CACHE_TTL_SECONDS', '900'))
+KB_CACHE_RAG = os.environ.get('KB_CACHE_RAG', 'false').lower() == 'true'
+retrieval_cache = RetrievalCache(max_entries=KB_CACHE_MAX_ENTRIES, ttl_seconds=KB_CACHE_TTL_SECONDS)
+
 def retrieve_kb(query):
+    """Retrieve KB passages for query, served from the retrieval cache when possible."""
+    key = retrieval_cache.make_key('retrieve', KB_ID, query)
+    return list(retrieval_cache.get_or_load(key, lambda: _retrieve_kb(query)))
+
+def retrieve_and_generation(query):
+    """Retrieve and generate an answer; cached only when KB_CACHE_RAG=true."""
+    if not KB_CACHE_RAG:
+        return _retrieve_and_generation(query)
+    key = retrieval_cache.make_key('retrieve_and_generate', KB_ID, query)
+    return list(retrieval_cache.get_or_load(key, lambda: _retrieve_and_generation(query)))
+
+def cache_stats():
+    return retrieval_cache.stats()
+
+def _retrieve_kb(query):
     #print(KB_ID,query)
     results = []
     # Call KB
@@ -27,7 +49,7 @@ def retrieve_kb(query):
             results.append(r["content"]["text"])
     return results
 
-def retrieve_and_generation(query):
+def _retrieve_and_generation(query):
     results = []
     custom_prompt = """
       You are a question answering agent. I will provide you with a set of search results.
@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+import boto3
+
+# Fetch a new session token once the current one expires within this many seconds
+CREDENTIAL_REFRESH_S = float(os.environ.get("S2S_CREDENTIAL_REFRESH_S", "900"))
+
+# expire_at is epoch seconds, or None for a token that cannot be refreshed here
+Credentials = namedtuple("Credentials", "access_key_id secret_access_key session_token expire_at")
+
+# A session token supplied through the environment is used as-is until restart
+_current = None
+if "AWS_SESSION_TOKEN" in os.environ:
+    _current = Credentials(
+        os.environ["AWS_ACCESS_KEY_ID"],
+        os.environ["AWS_SECRET_ACCESS_KEY"],
+        os.environ["AWS_SESSION_TOKEN"],
+        None,
+    )
+_lock = threading.Lock()
+
+# Clients shared by every session in this process, keyed by (service, region,
+# session token). Replaced, never mutated in place, when the token changes, so
+# a reader holding the old dict is unaffected; reset in forked workers so that
+# no client (and its connection pool) is shared across processes.
+_client_pool = {}
+
+
+def _reset_client_pool():
+    global _client_pool
+    _client_pool = {}
+
+
+os.register_at_fork(after_in_child=_reset_client_pool)
+
+
+def refresh_credentials(aws_key, aws_secret, region):
+    """Return current STS session credentials, fetching new ones if missing or expiring.
+
+    Blocking (the STS call and the lock): call it from a worker thread, never
+    from the event loop. Nothing is written to os.environ.
+    """
+    global _current, _client_pool
+    with _lock:
+        current = _current
+        if current is not None and (current.expire_at is None or current.expire_at - time.time() >= CREDENTIAL_REFRESH_S):
+            return current
+        sts_client = boto3.client(
+            'sts',
+            aws_access_key_id=aws_key,
+            aws_secret_access_key=aws_secret,
+            region_name=region,
+        )
+        response = sts_client.get_session_token(DurationSeconds=7200)
+        fetched = response['Credentials']
+        _current = Credentials(
+            fetched['AccessKeyId'],
+            fetched['SecretAccessKey'],
+            fetched['SessionToken'],
+            fetched['Expiration'].timestamp(),
+        )
+        # Clients signed with the previous token are dropped with the old dict
+        _client_pool = {}
+        return _current
+
+
+def pooled_client(service, region, credentials, make):
+    """Return this process's client for service and region signed with credentials.
+
+    make(credentials) builds one on first use; two sessions racing here may both
+    build, and the first stored wins.
+    """
+    pool = _client_pool
+    key = (service, region, credentials.session_token)
+    return pool.get(key) or pool.setdefault(key, make(credentials))
@@ -0,0 +1,146 @@
+import asyncio
+import base64
+import json
+import os
+import time
+import uuid
+
+# Behaviour of the fake Nova Sonic backend (S2S_BACKEND=fake)
+FAKE_TURN_AUDIO_MS = int(os.environ.get("S2S_FAKE_TURN_AUDIO_MS", "1500"))        # user audio that ends a turn
+FAKE_RESPONSE_DELAY_MS = int(os.environ.get("S2S_FAKE_RESPONSE_DELAY_MS", "100"))  # "model thinking" time
+FAKE_REPLY_AUDIO_MS = int(os.environ.get("S2S_FAKE_REPLY_AUDIO_MS", "2000"))      # assistant audio per turn
+FAKE_TOOL_EVERY = int(os.environ.get("S2S_FAKE_TOOL_EVERY", "3"))                  # every Nth turn uses a tool, 0 = never
+FAKE_TOOL_NAME = os.environ.get("S2S_FAKE_TOOL_NAME", "getDateTool")
+FAKE_OPEN_MS = int(os.environ.get("S2S_FAKE_OPEN_MS", "0"))                        # time to open a stream
+
+INPUT_BYTES_PER_MS = 16000 * 2 // 1000    # 16 kHz, 16-bit mono microphone audio
+OUTPUT_BYTES_PER_MS = 24000 * 2 // 1000   # 24 kHz, 16-bit mono assistant audio
+OUTPUT_CHUNK_MS = 40
+
+
+class _Payload:
+    def __init__(self, data):
+        self.bytes_ = data
+
+
+class _Chunk:
+    def __init__(self, data):
+        self.value = _Payload(data)
+
+
+class _OutputStream:
+    def __init__(self, stream):
+        self._stream = stream
+
+    async def receive(self):
+        return _Chunk(await self._stream._outbox.get())
+
+
+class _InputStream:
+    def __init__(self, stream):
+        self._stream = stream
+
+    async def send(self, chunk):
+        self._stream._handle(json.loads(chunk.value.bytes_.decode("utf-8")))
+
+    async def close(self):
+        self._stream._close()
+
+
+class FakeBidirectionalStream:
+    """Local stand-in for invoke_model_with_bidirectional_stream.
+
+    Mimics the shape of the Bedrock SDK stream used by S2sSessionManager.
+    Once enough user audio has arrived for a turn, it emits a USER transcript,
+    optionally a toolUse round trip, and then ASSISTANT audioOutput chunks
+    paced in real time followed by the ASSISTANT text.
+    """
+
+    def __init__(self):
+        self.input_stream = _InputStream(self)
+        self._output = (None, _OutputStream(self))
+        self._outbox = asyncio.Queue()
+        self._prompt_name = None
+        self._audio_bytes = 0
+        self._turns = 0
+        self._turn_task = None
+        self._tool_result = asyncio.Event()
+        self._closed = False
+
+    async def await_output(self):
+        return self._output
+
+    def _emit(self, event_name, body):
+        body.setdefault("promptName", self._prompt_name)
+        self._outbox.put_nowait(json.dumps({"event": {event_name: body}}).encode("utf-8"))
+
+    def _handle(self, data):
+        event = data.get("event", {})
+        if "promptStart" in event:
+            self._prompt_name = event["promptStart"].get("promptName")
+        elif "audioInput" in event:
+            self._audio_bytes += len(event["audioInput"].get("content", "")) * 3 // 4
+            turn_ready = self._audio_bytes >= FAKE_TURN_AUDIO_MS * INPUT_BYTES_PER_MS
+            if turn_ready and (self._turn_task is None or self._turn_task.done()):
+                self._audio_bytes = 0
+                self._turn_task = asyncio.create_task(self._respond())
+        elif "toolResult" in event:
+            self._tool_result.set()
+        elif "sessionEnd" in event:
+            self._close()
+
+    def _close(self):
+        self._closed = True
+        if self._turn_task and not self._turn_task.done():
+            self._turn_task.cancel()
+
+    async def _respond(self):
+        self._turns += 1
+        await asyncio.sleep(FAKE_RESPONSE_DELAY_MS / 1000)
+
+        user_content = str(uuid.uuid4())
+        self._emit("contentStart", {"contentId": user_content, "type": "TEXT", "role": "USER"})
+        self._emit("textOutput", {"contentId": user_content, "role": "USER", "content": f"Test question {self._turns}"})
+        self._emit("contentEnd", {"contentId": user_content, "type": "TEXT", "stopReason": "END_TURN"})
+
+        if FAKE_TOOL_EVERY and self._turns % FAKE_TOOL_EVERY == 0:
+            tool_content = str(uuid.uuid4())
+            self._tool_result.clear()
+            self._emit("contentStart", {"contentId": tool_content, "type": "TOOL", "role": "TOOL"})
+            self._emit("toolUse", {
+                "contentId": tool_content,
+                "toolUseId": str(uuid.uuid4()),
+                "toolName": FAKE_TOOL_NAME,
+                "content": json.dumps({"query": "What is the latest heart rate?"}),
+            })
+            self._emit("contentEnd", {"contentId": tool_content, "type": "TOOL", "stopReason": "TOOL_USE"})
+            try:
+                await asyncio.wait_for(self._tool_result.wait(), timeout=10)
+            except asyncio.TimeoutError:
+                pass
+
+        audio_content = str(uuid.uuid4())
+        self._emit("contentStart", {"contentId": audio_content, "type": "AUDIO", "role": "ASSISTANT"})
+        chunk = base64.b64encode(bytes(OUTPUT_CHUNK_MS * OUTPUT_BYTES_PER_MS)).decode("ascii")
+        started = time.monotonic()
+        for i in range(max(1, FAKE_REPLY_AUDIO_MS // OUTPUT_CHUNK_MS)):
+            if self._closed:
+                return
+            self._emit("audioOutput", {"contentId": audio_content, "role": "ASSISTANT", "content": chunk})
+            # Nova Sonic streams audio roughly in real time
+            delay = started + (i + 1) * OUTPUT_CHUNK_MS / 1000 - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        self._emit("contentEnd", {"contentId": audio_content, "type": "AUDIO", "stopReason": "END_TURN"})
+
+        text_content = str(uuid.uuid4())
+        self._emit("contentStart", {"contentId": text_content, "type": "TEXT", "role": "ASSISTANT"})
+        self._emit("textOutput", {"contentId": text_content, "role": "ASSISTANT", "content": f"Test answer {self._turns}."})
+        self._emit("contentEnd", {"contentId": text_content, "type": "TEXT", "stopReason": "END_TURN"})
+
+
+async def open_fake_stream():
+    """Open a fake stream, taking S2S_FAKE_OPEN_MS like the Bedrock handshake would."""
+    if FAKE_OPEN_MS:
+        await asyncio.sleep(FAKE_OPEN_MS / 1000)
+    return FakeBidirectionalStream()
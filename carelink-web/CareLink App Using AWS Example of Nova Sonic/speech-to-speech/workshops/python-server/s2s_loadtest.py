@@ -0,0 +1,398 @@
+"""Load generator for the speech-to-speech WebSocket server.
+
+Opens many concurrent WebSocket sessions that behave like the React client:
+the session/prompt setup events followed by microphone audioInput chunks
+sent at real-time pace. Audio comes from a recorded JSONL event file
+(--recording, one client event per line) or is synthesized.
+
+Run it against a server started with S2S_BACKEND=fake to measure the server
+alone, without Bedrock in the loop:
+
+    python s2s_loadtest.py --spawn-server --sessions 100 --duration 30
+    python s2s_loadtest.py --spawn-server --levels 25,50,100,200,400
+    python s2s_loadtest.py --url ws://localhost:8081 --metrics-url http://localhost:8082/metrics
+"""
+import argparse
+import array
+import asyncio
+import base64
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+
+import websockets
+
+INPUT_BYTES_PER_MS = 16000 * 2 // 1000  # 16 kHz, 16-bit mono
+
+
+# --- EVENT SOURCES ---
+def setup_events(prompt_name, text_content_name, audio_content_name):
+    """The events the React client sends when a conversation starts."""
+    return [
+        {"event": {"sessionStart": {"inferenceConfiguration": {"maxTokens": 1024, "topP": 0.95, "temperature": 0.7}}}},
+        {"event": {"promptStart": {
+            "promptName": prompt_name,
+            "textOutputConfiguration": {"mediaType": "text/plain"},
+            "audioOutputConfiguration": {
+                "mediaType": "audio/lpcm", "sampleRateHertz": 24000, "sampleSizeBits": 16,
+                "channelCount": 1, "voiceId": "matthew", "encoding": "base64", "audioType": "SPEECH",
+            },
+        }}},
+        {"event": {"contentStart": {
+            "promptName": prompt_name, "contentName": text_content_name, "type": "TEXT",
+            "interactive": True, "role": "SYSTEM", "textInputConfiguration": {"mediaType": "text/plain"},
+        }}},
+        {"event": {"textInput": {
+            "promptName": prompt_name, "contentName": text_content_name,
+            "content": "You are a clinical assistant. Keep answers short.",
+        }}},
+        {"event": {"contentEnd": {"promptName": prompt_name, "contentName": text_content_name}}},
+        {"event": {"contentStart": {
+            "promptName": prompt_name, "contentName": audio_content_name, "type": "AUDIO",
+            "interactive": True, "role": "USER",
+            "audioInputConfiguration": {
+                "mediaType": "audio/lpcm", "sampleRateHertz": 16000, "sampleSizeBits": 16,
+                "channelCount": 1, "audioType": "SPEECH", "encoding": "base64",
+            },
+        }}},
+    ]
+
+
+def synthetic_audio(chunk_ms, seconds, silence_pct=0):
+    """Base64 PCM chunks of a 220 Hz tone, loud enough to count as speech.
+
+    With silence_pct, that share of the chunks at the end is faint room noise
+    instead, like a caregiver listening or reading the dashboard.
+    """
+    samples_per_chunk = chunk_ms * 16
+    total = int(seconds * 1000 / chunk_ms)
+    speech_chunks = total - int(total * silence_pct / 100)
+    noise = random.Random(0)
+    chunks = []
+    for c in range(total):
+        if c < speech_chunks:
+            pcm = array.array("h", (
+                int(3000 * math.sin(2 * math.pi * 220 * (c * samples_per_chunk + i) / 16000))
+                for i in range(samples_per_chunk)
+            ))
+        else:
+            pcm = array.array("h", (int(noise.gauss(0, 30)) for _ in range(samples_per_chunk)))
+        chunks.append(base64.b64encode(pcm.tobytes()).decode("ascii"))
+    return chunks
+
+
+def load_recording(path):
+    """Read recorded client events and split them into setup events and audio chunks."""
+    setup, audio = [], []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            event = json.loads(line)
+            name = next(iter(event.get("event", {})), None)
+            if name == "audioInput":
+                audio.append(event["event"]["audioInput"]["content"])
+            elif name not in ("promptEnd", "sessionEnd") and not audio:
+                setup.append(event)
+    return setup, audio
+
+
+def rename_setup(events, prompt_name, audio_content_name):
+    """Give recorded setup events this session's prompt and content names."""
+    renamed = json.loads(json.dumps(events))
+    for event in renamed:
+        body = next(iter(event["event"].values()))
+        if "promptName" in body:
+            body["promptName"] = prompt_name
+        if body.get("type") == "AUDIO":
+            body["contentName"] = audio_content_name
+    return renamed
+
+
+# --- CLIENT SESSION ---
+class SessionResult:
+    def __init__(self):
+        self.connect_s = None
+        self.first_audio_s = None
+        self.audio_chunks_out = 0
+        self.events_in = 0
+        self.frames_in = 0
+        self.error = None
+
+
+async def run_session(url, setup, audio, duration, chunk_ms, results, start_gate):
+    result = SessionResult()
+    results.append(result)
+    prompt_name = str(uuid.uuid4())
+    audio_content_name = str(uuid.uuid4())
+    if setup:
+        events = rename_setup(setup, prompt_name, audio_content_name)
+    else:
+        events = setup_events(prompt_name, str(uuid.uuid4()), audio_content_name)
+    await start_gate.wait()
+
+    started = time.perf_counter()
+    try:
+        async with websockets.connect(url, max_size=None, open_timeout=30) as ws:
+            result.connect_s = time.perf_counter() - started
+            first_audio_sent = None
+
+            async def reader():
+                async for message in ws:
+                    data = json.loads(message)
+                    batch = data if isinstance(data, list) else [data]
+                    result.frames_in += 1
+                    result.events_in += len(batch)
+                    for event in batch:
+                        if "audioOutput" in event.get("event", {}):
+                            result.audio_chunks_out += 1
+                            if result.first_audio_s is None and first_audio_sent is not None:
+                                result.first_audio_s = time.perf_counter() - first_audio_sent
+
+            read_task = asyncio.create_task(reader())
+            for event in events:
+                await ws.send(json.dumps(event))
+
+            # Stream microphone audio in real time, looping the source as needed
+            deadline = time.perf_counter() + duration
+            i = 0
+            next_send = time.perf_counter()
+            while time.perf_counter() < deadline:
+                content = audio[i % len(audio)]
+                await ws.send(json.dumps({"event": {"audioInput": {
+                    "promptName": prompt_name, "contentName": audio_content_name, "content": content,
+                }}}))
+                if first_audio_sent is None:
+                    first_audio_sent = time.perf_counter()
+                i += 1
+                next_send += len(content) * 3 / 4 / INPUT_BYTES_PER_MS / 1000 if content else chunk_ms / 1000
+                await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+            await ws.send(json.dumps({"event": {"contentEnd": {"promptName": prompt_name, "contentName": audio_content_name}}}))
+            await ws.send(json.dumps({"event": {"promptEnd": {"promptName": prompt_name}}}))
+            await ws.send(json.dumps({"event": {"sessionEnd": {}}}))
+            read_task.cancel()
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    return result
+
+
+async def client_loop_lag(samples, interval=0.1):
+    """Lag of the load generator's own loop; high values make results unreliable."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append((loop.time() - start - interval) * 1000)
+
+
+# --- SERVER SIDE ---
+def fetch_metrics(metrics_url):
+    if not metrics_url:
+        return None
+    try:
+        with urllib.request.urlopen(metrics_url, timeout=5) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except Exception:
+        return None
+
+
+def rss_bytes(pid):
+    """Resident set size of a process on Linux, or None."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_server(args):
+    """Start server.py against the fake backend and wait for its health endpoint."""
+    ws_port, health_port = free_port(), free_port()
+    env = dict(os.environ)
+    env.update({
+        "S2S_BACKEND": "fake",
+        "HOST": "127.0.0.1",
+        "WS_PORT": str(ws_port),
+        "HEALTH_PORT": str(health_port),
+        "AWS_ACCESS_KEY_ID": env.get("AWS_ACCESS_KEY_ID", "loadtest"),
+        "AWS_SECRET_ACCESS_KEY": env.get("AWS_SECRET_ACCESS_KEY", "loadtest"),
+        "AWS_SESSION_TOKEN": env.get("AWS_SESSION_TOKEN", "loadtest"),
+        "LOGLEVEL": "WARNING",
+    })
+    server_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+    process = subprocess.Popen([sys.executable, server_py], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    health_url = f"http://127.0.0.1:{health_port}/health"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(health_url, timeout=1).read()
+            break
+        except Exception:
+            if process.poll() is not None:
+                raise RuntimeError("server.py exited during startup")
+            time.sleep(0.1)
+    args.url = f"ws://127.0.0.1:{ws_port}"
+    args.metrics_url = f"http://127.0.0.1:{health_port}/metrics"
+    return process
+
+
+# --- REPORTING ---
+def pct(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+
+async def run_level(args, sessions, setup, audio, server_pid):
+    results = []
+    lag_samples = []
+    gate = asyncio.Event()
+    rss_before = rss_bytes(server_pid) if server_pid else None
+    server_before = (await asyncio.to_thread(fetch_metrics, args.metrics_url)) or {}
+    lag_task = asyncio.create_task(client_loop_lag(lag_samples))
+
+    tasks = []
+    for i in range(sessions):
+        tasks.append(asyncio.create_task(run_session(args.url, setup, audio, args.duration, args.chunk_ms, results, gate)))
+    gate.set()
+
+    # Sample the server while the sessions are running
+    peak_rss, peak_buffered, server_lag_max = rss_before or 0, 0, 0.0
+    while not all(t.done() for t in tasks):
+        await asyncio.sleep(1)
+        if server_pid:
+            peak_rss = max(peak_rss, rss_bytes(server_pid) or 0)
+        snapshot = await asyncio.to_thread(fetch_metrics, args.metrics_url)
+        if snapshot:
+            peak_buffered = max(peak_buffered, snapshot.get("queues", {}).get("buffered_bytes", 0))
+            server_lag_max = max(server_lag_max, snapshot.get("loop_lag_ms", {}).get("last", 0.0))
+    lag_task.cancel()
+    server_after = (await asyncio.to_thread(fetch_metrics, args.metrics_url)) or {}
+
+    connect = [r.connect_s for r in results if r.connect_s is not None]
+    first_audio = [r.first_audio_s for r in results if r.first_audio_s is not None]
+    errors = [r.error for r in results if r.error]
+    no_audio = sum(1 for r in results if r.error is None and r.first_audio_s is None)
+    report = {
+        "sessions": sessions,
+        "errors": len(errors),
+        "sessions_without_audio": no_audio,
+        "connect_ms": {"p50": pct(connect, 0.5), "p95": pct(connect, 0.95), "max": pct(connect, 1.0)},
+        "first_audio_ms": {"p50": pct(first_audio, 0.5), "p95": pct(first_audio, 0.95), "max": pct(first_audio, 1.0)},
+        "events_in": sum(r.events_in for r in results),
+        "frames_in": sum(r.frames_in for r in results),
+        "server_loop_lag_max_ms": round(server_lag_max, 1),
+        "server_peak_buffered_bytes": peak_buffered,
+        "client_loop_lag_max_ms": round(max(lag_samples, default=0.0), 1),
+    }
+    if rss_before:
+        report["server_rss_mb"] = round(peak_rss / (1024 * 1024), 1)
+        report["server_rss_per_session_kb"] = round((peak_rss - rss_before) / 1024 / sessions, 1)
+    for key, path in (("server_vad_chunks", ("vad", "chunks")), ("server_warm_pool", ("warm_pool", "events"))):
+        before, after = server_before.get(path[0], {}).get(path[1]), server_after.get(path[0], {}).get(path[1])
+        if isinstance(after, dict):
+            before = before if isinstance(before, dict) else {}
+            report[key] = {k: v - before.get(k, 0) for k, v in after.items()}
+    # Mean time to attach a Bedrock stream during this level, warm (pooled) or cold
+    setup_before = server_before.get("session_setup_ms", {})
+    for label, after in server_after.get("session_setup_ms", {}).items():
+        before = setup_before.get(label, {"count": 0, "sum": 0.0})
+        if after["count"] > before["count"]:
+            report.setdefault("server_setup_mean_ms", {})[label] = round(
+                (after["sum"] - before["sum"]) / (after["count"] - before["count"]), 1)
+    if errors:
+        report["first_error"] = errors[0]
+
+    first_audio_p95 = report["first_audio_ms"]["p95"]
+    report["stable"] = (
+        not errors
+        and no_audio == 0
+        and first_audio_p95 is not None
+        and first_audio_p95 <= args.max_first_audio_ms
+        and server_lag_max <= args.max_loop_lag_ms
+    )
+    return report
+
+
+async def main(args):
+    if args.recording:
+        setup, audio = load_recording(args.recording)
+    else:
+        setup, audio = [], synthetic_audio(args.chunk_ms, 5 if not args.silence_pct else 20, args.silence_pct)
+    if not audio:
+        raise SystemExit("No audioInput events found in the recording")
+
+    process = spawn_server(args) if args.spawn_server else None
+    server_pid = process.pid if process else args.server_pid
+    try:
+        levels = [int(n) for n in args.levels.split(",")] if args.levels else [args.sessions]
+        reports, max_stable = [], 0
+        for sessions in levels:
+            report = await run_level(args, sessions, setup, audio, server_pid)
+            reports.append(report)
+            print(json.dumps(report) if args.json else format_report(report), flush=True)
+            if not report["stable"]:
+                break
+            max_stable = sessions
+        if len(levels) > 1:
+            print(json.dumps({"max_stable_sessions": max_stable}) if args.json else f"Max stable sessions: {max_stable}")
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=60)
+
+
+def format_report(r):
+    line = (f"{r['sessions']:>5} sessions  errors {r['errors']}  "
+            f"connect p50/p95 {r['connect_ms']['p50']}/{r['connect_ms']['p95']} ms  "
+            f"first audio p50/p95 {r['first_audio_ms']['p50']}/{r['first_audio_ms']['p95']} ms  "
+            f"server lag max {r['server_loop_lag_max_ms']} ms")
+    if "server_rss_per_session_kb" in r:
+        line += f"  rss/session {r['server_rss_per_session_kb']} KB"
+    if "server_vad_chunks" in r:
+        vad = r["server_vad_chunks"]
+        line += f"  vad dropped {vad.get('dropped', 0)} of {sum(vad.values())} chunks"
+    if "server_warm_pool" in r:
+        pool = r["server_warm_pool"]
+        line += f"  warm pool hits {pool.get('hit', 0)}/{pool.get('hit', 0) + pool.get('miss', 0)}"
+    return line + ("  stable" if r["stable"] else "  UNSTABLE")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Speech-to-speech WebSocket load generator")
+    parser.add_argument("--url", default="ws://localhost:8081", help="WebSocket server URL")
+    parser.add_argument("--metrics-url", default=None, help="Server /metrics URL for loop lag and buffer sampling")
+    parser.add_argument("--server-pid", type=int, default=None, help="Server PID for RSS sampling (Linux)")
+    parser.add_argument("--spawn-server", action="store_true", help="Start server.py with S2S_BACKEND=fake on free ports")
+    parser.add_argument("--sessions", type=int, default=50, help="Concurrent sessions")
+    parser.add_argument("--levels", default=None, help="Comma-separated session counts to step through, stopping at the first unstable one")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of audio each session streams")
+    parser.add_argument("--chunk-ms", type=int, default=32, help="Synthetic audio chunk length")
+    parser.add_argument("--silence-pct", type=float, default=0, help="Share of synthetic audio that is room noise (for S2S_VAD)")
+    parser.add_argument("--recording", default=None, help="JSONL file of recorded client events to replay")
+    parser.add_argument("--max-first-audio-ms", type=float, default=3000, help="Stability limit for first-audio p95")
+    parser.add_argument("--max-loop-lag-ms", type=float, default=100, help="Stability limit for server event-loop lag")
+    parser.add_argument("--json", action="store_true", help="Print reports as JSON lines")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
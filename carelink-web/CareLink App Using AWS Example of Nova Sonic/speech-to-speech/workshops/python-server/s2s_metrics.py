@@ -0,0 +1,154 @@
+import asyncio
+import bisect
+import threading
+
+
+class Counter:
+    """Monotonic counter, optionally split by a label value."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, label=None, amount=1):
+        with self._lock:
+            self._values[label] = self._values.get(label, 0) + amount
+
+    def value(self, label=None):
+        return self._values.get(label, 0)
+
+    def snapshot(self):
+        with self._lock:
+            if not self._values or list(self._values) == [None]:
+                return self._values.get(None, 0)
+            return {str(k): v for k, v in self._values.items()}
+
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum and max."""
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"le_{b:g}" for b in self.buckets] + ["le_inf"]
+            return {
+                "count": self.count,
+                "sum": round(self.sum, 3),
+                "mean": round(self.sum / self.count, 3) if self.count else 0.0,
+                "max": round(self.max, 3),
+                "buckets": dict(zip(labels, self._counts)),
+            }
+
+
+class LabeledHistogram:
+    """One Histogram per label value, created on first use."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, label, value):
+        histogram = self._histograms.get(label)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(label, Histogram(self.buckets))
+        histogram.observe(value)
+
+    def snapshot(self):
+        return {str(k): h.snapshot() for k, h in list(self._histograms.items())}
+
+
+# Event throughput, by event type
+events_in = Counter()       # client -> Bedrock
+events_out = Counter()      # Bedrock -> client
+bedrock_stream_errors = Counter()
+
+# Tool calls, by tool name
+tool_latency_ms = LabeledHistogram([10, 50, 100, 250, 500, 1000, 2500, 5000, 10000])
+tool_errors = Counter()
+
+# Event loop responsiveness
+loop_lag_ms = Histogram([1, 5, 10, 25, 50, 100, 250, 1000])
+loop_lag_last_ms = 0.0
+
+# Output forwarding
+forward_batch_size = Histogram([1, 2, 4, 8, 16, 32, 64])
+forward_queue_delay_ms = Histogram([1, 5, 10, 25, 50, 100, 250, 1000])
+forward_events = Counter()
+forward_frames = Counter()
+
+# Voice-activity detection on microphone audio, by decision
+# (speech, hangover, preroll, keepalive, dropped)
+vad_chunks = Counter()
+vad_bytes_dropped = Counter()
+vad_process_us = Histogram([10, 25, 50, 100, 250, 500, 1000])
+
+# Pre-opened Bedrock streams, by outcome (hit, miss, opened, expired, open_error),
+# and how long a connection waited for its stream (warm or cold)
+warm_pool = Counter()
+warm_pool_open_ms = Histogram([10, 50, 100, 250, 500, 1000, 2500])
+session_setup_ms = LabeledHistogram([1, 5, 10, 50, 100, 250, 500, 1000, 2500])
+
+# Patient context prefetched at promptStart, by outcome (started, hit, joined,
+# miss, vitals_error, kb_error), and fetch time by kind (vitals, kb)
+prefetch = Counter()
+prefetch_ms = LabeledHistogram([50, 100, 250, 500, 1000, 2500, 5000, 10000])
+
+
+async def monitor_loop_lag(interval=0.5):
+    """Measure how late the event loop wakes up a sleeping task, forever."""
+    global loop_lag_last_ms
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        loop_lag_last_ms = max(0.0, (loop.time() - start - interval) * 1000)
+        loop_lag_ms.observe(loop_lag_last_ms)
+
+
+def snapshot():
+    """Return all registered metrics as a JSON-serializable dict."""
+    return {
+        "events_in": events_in.snapshot(),
+        "events_out": events_out.snapshot(),
+        "bedrock_stream_errors": bedrock_stream_errors.snapshot(),
+        "tool_latency_ms": tool_latency_ms.snapshot(),
+        "tool_errors": tool_errors.snapshot(),
+        "loop_lag_ms": dict(loop_lag_ms.snapshot(), last=round(loop_lag_last_ms, 3)),
+        "forward": {
+            "events": forward_events.snapshot(),
+            "frames": forward_frames.snapshot(),
+            "batch_size": forward_batch_size.snapshot(),
+            "queue_delay_ms": forward_queue_delay_ms.snapshot(),
+        },
+        "vad": {
+            "chunks": vad_chunks.snapshot(),
+            "bytes_dropped": vad_bytes_dropped.snapshot(),
+            "process_us": vad_process_us.snapshot(),
+        },
+        "warm_pool": {
+            "events": warm_pool.snapshot(),
+            "open_ms": warm_pool_open_ms.snapshot(),
+        },
+        "session_setup_ms": session_setup_ms.snapshot(),
+        "prefetch": {
+            "events": prefetch.snapshot(),
+            "latency_ms": prefetch_ms.snapshot(),
+        },
+    }
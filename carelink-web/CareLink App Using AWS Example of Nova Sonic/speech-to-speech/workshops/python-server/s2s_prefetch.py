@@ -0,0 +1,128 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+import bedrock_knowledge_bases as kb
+import s2s_metrics as metrics
+
+# Patient context fetched in the background as soon as promptStart arrives,
+# so the first tool call of a conversation does not wait on Lambda or the KB.
+# A promptStart may carry "deviceId" (removed before it reaches Bedrock);
+# otherwise S2S_PREFETCH_DEVICE_ID is used, and empty means no prefetch.
+PREFETCH_DEVICE_ID = os.environ.get("S2S_PREFETCH_DEVICE_ID", "")
+PREFETCH_VITALS_LAMBDA = os.environ.get("S2S_PREFETCH_VITALS_LAMBDA", "CareLinkGetLatestVitals")   # latest vitals, risk score and trend summary
+# Also ask that Lambda for the SageMaker risk score and Bedrock trend summary on every
+# promptStart; off, the prefetch is a single DynamoDB query (analyze=false)
+PREFETCH_ANALYSIS = os.environ.get("S2S_PREFETCH_ANALYSIS", "false").lower() == "true"
+PREFETCH_MONTHS_BACK = int(os.environ.get("S2S_PREFETCH_MONTHS_BACK", "1"))                       # history window requested from that Lambda
+PREFETCH_TTL_S = float(os.environ.get("S2S_PREFETCH_TTL_S", "300"))                               # refetch vitals older than this
+PREFETCH_RECENT_READINGS = int(os.environ.get("S2S_PREFETCH_RECENT_READINGS", "6"))               # readings returned to the model
+# Common questions whose KB passages are loaded into the shared retrieval cache, separated by "|"
+PREFETCH_KB_QUERIES = [q.strip() for q in os.environ.get("S2S_PREFETCH_KB_QUERIES", "").split("|") if q.strip()]
+
+
+def history_rows(columns, last):
+    """The last readings of a history_format=columns response as the default per-reading dicts."""
+    if not columns:
+        return []
+    fields = [name for name in columns if name != "epoch_ms"]
+    start = max(0, len(columns["epoch_ms"]) - last)
+    return [
+        {"timestamp": datetime.fromtimestamp(ms / 1000, timezone.utc).replace(tzinfo=None).isoformat(),
+         **{name: columns[name][i] for name in fields}}
+        for i, ms in enumerate(columns["epoch_ms"][start:], start)
+    ]
+
+
+def patient_vitals(device_id, response):
+    """Tool result for the patient vitals Lambda response: recent readings, plus risk score and summary if analyzed."""
+    if not response or response.get("statusCode") != 200:
+        raise RuntimeError(f"{PREFETCH_VITALS_LAMBDA} returned {response.get('statusCode') if response else None} for {device_id}")
+    body = response["body"]
+    if isinstance(body, str):
+        body = json.loads(body)
+    history = body.get("vitals_history") or history_rows(body.get("vitals_columns"), PREFETCH_RECENT_READINGS)
+    result = {"device_id": device_id, "recent_readings": history[-PREFETCH_RECENT_READINGS:]}
+    if "sagemaker_prediction" in body:
+        result["risk_score"] = body["sagemaker_prediction"]
+        result["trend_summary"] = body.get("bedrock_summary")
+    return result
+
+
+class PatientContext:
+    """Per-session cache of the patient lookups that tool calls commonly need.
+
+    start() launches the vitals Lambda and the common KB questions in worker
+    threads. vitals() hands a tool call the prefetched result, waits for it
+    if it is still in flight, or fetches again once it is older than
+    PREFETCH_TTL_S or failed. KB passages go into the process-wide retrieval
+    cache, so getKbTool finds them through bedrock_knowledge_bases as usual.
+    """
+
+    def __init__(self, call_lambda, logger):
+        self.call_lambda = call_lambda  # S2sSessionManager.call_lambda
+        self.logger = logger or logging.getLogger(__name__)
+        self.device_id = None
+        self._vitals = None  # (started_at, task)
+        self._tasks = set()
+
+    def start(self, device_id=None):
+        device_id = device_id or PREFETCH_DEVICE_ID
+        if not device_id or device_id == self.device_id:
+            return
+        self.device_id = device_id
+        metrics.prefetch.inc("started")
+        self._vitals = (time.monotonic(), self._spawn("vitals", self._load_vitals, device_id))
+        for query in PREFETCH_KB_QUERIES:
+            self._spawn("kb", kb.retrieve_kb, query)
+
+    def _spawn(self, kind, func, *args):
+        task = asyncio.create_task(self._timed(kind, func, *args))
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+        return task
+
+    def _done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled():
+            task.exception()  # already logged by _timed; a prefetch nobody used is not an error
+
+    async def _timed(self, kind, func, *args):
+        start = time.perf_counter()
+        try:
+            return await asyncio.to_thread(func, *args)
+        except Exception as e:
+            metrics.prefetch.inc(f"{kind}_error")
+            self.logger.warning(f"Prefetch of {kind} failed: {e}")
+            raise
+        finally:
+            metrics.prefetch_ms.observe(kind, (time.perf_counter() - start) * 1000)
+
+    def _load_vitals(self, device_id):
+        response = self.call_lambda(PREFETCH_VITALS_LAMBDA, "", device_id=device_id, months_back=PREFETCH_MONTHS_BACK,
+                                    history_format="rows", analyze=PREFETCH_ANALYSIS)
+        return patient_vitals(device_id, response)
+
+    async def vitals(self):
+        """The patient's vitals for a tool call, from the prefetch when it is usable."""
+        if not self.device_id:
+            return "No patient is linked to this conversation."
+        if self._vitals:
+            started_at, task = self._vitals
+            fresh = time.monotonic() - started_at < PREFETCH_TTL_S
+            if fresh and not (task.done() and (task.cancelled() or task.exception())):
+                metrics.prefetch.inc("hit" if task.done() else "joined")
+                try:
+                    return await task
+                except Exception:
+                    pass  # failed while we waited; fetch again below
+        metrics.prefetch.inc("miss")
+        self._vitals = (time.monotonic(), self._spawn("vitals", self._load_vitals, self.device_id))
+        return await self._vitals[1]
+
+    def close(self):
+        for task in list(self._tasks):
+            task.cancel()
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import time
+from collections import deque
+
+# Overflow policies
+BLOCK = "block"              # put() waits for space, put_nowait() raises QueueFull
+DROP_OLDEST = "drop_oldest"  # discard the oldest queued item to make room
+
+
+def event_size(item):
+    """Approximate in-memory size of a queued item in bytes."""
+    if isinstance(item, dict):
+        if "audio_bytes" in item:
+            return len(item["audio_bytes"] or "")
+        event = item.get("event")
+        if isinstance(event, dict) and event:
+            body = next(iter(event.values()))
+            if isinstance(body, dict) and isinstance(body.get("content"), str):
+                return len(body["content"]) + 256
+        return len(json.dumps(item, default=str))
+    if isinstance(item, (bytes, str)):
+        return len(item)
+    return 0
+
+
+def coalesce_text_output(last, item):
+    """Merge two textOutput events for the same content block.
+
+    Returns the merged event, or None when the events cannot be merged.
+    """
+    try:
+        prev = last["event"]["textOutput"]
+        new = item["event"]["textOutput"]
+    except (KeyError, TypeError):
+        return None
+    if prev.get("contentId") != new.get("contentId") or prev.get("role") != new.get("role"):
+        return None
+    # Interruption markers are JSON payloads the client parses on their own
+    if prev.get("content", "").startswith("{") or new.get("content", "").startswith("{"):
+        return None
+    prev["content"] = prev.get("content", "") + new.get("content", "")
+    if "timestamp" in item:
+        last["timestamp"] = item["timestamp"]
+    return last
+
+
+class BoundedEventQueue(asyncio.Queue):
+    """asyncio.Queue bounded by item count and approximate byte size.
+
+    When the queue is full the overflow policy decides what happens:
+    BLOCK applies backpressure to the producer, DROP_OLDEST discards the
+    oldest queued item. An optional coalesce(last, item) callback is tried
+    first on overflow so that mergeable events (e.g. text deltas) are folded
+    into the newest queued item instead of taking a slot.
+    """
+
+    def __init__(self, maxsize=0, max_bytes=0, overflow=BLOCK, coalesce=None, sizeof=event_size):
+        super().__init__(maxsize=maxsize)
+        self.max_bytes = max_bytes
+        self.overflow = overflow
+        self._coalesce = coalesce
+        self._sizeof = sizeof
+
+        self.bytes = 0
+        self.peak_bytes = 0
+        self.peak_depth = 0
+        self.dropped = 0
+        self.coalesced = 0
+        # Seconds the most recently dequeued item spent waiting in the queue
+        self.last_wait = 0.0
+        self._enqueued_at = deque()
+
+    def full(self):
+        if super().full():
+            return True
+        return bool(self.max_bytes) and self.bytes >= self.max_bytes
+
+    def _put(self, item):
+        super()._put(item)
+        self._enqueued_at.append(time.monotonic())
+        self.bytes += self._sizeof(item)
+        self.peak_bytes = max(self.peak_bytes, self.bytes)
+        self.peak_depth = max(self.peak_depth, self.qsize())
+
+    def _get(self):
+        item = super()._get()
+        self.last_wait = time.monotonic() - self._enqueued_at.popleft()
+        self.bytes -= self._sizeof(item)
+        return item
+
+    def _try_coalesce(self, item):
+        if self._coalesce is None or self.empty():
+            return False
+        last = self._queue[-1]
+        before = self._sizeof(last)
+        merged = self._coalesce(last, item)
+        if merged is None:
+            return False
+        self._queue[-1] = merged
+        self.bytes += self._sizeof(merged) - before
+        self.peak_bytes = max(self.peak_bytes, self.bytes)
+        self.coalesced += 1
+        return True
+
+    def put_nowait(self, item):
+        if self.full():
+            if self._try_coalesce(item):
+                return
+            if self.overflow == DROP_OLDEST:
+                while self.full() and not self.empty():
+                    self.get_nowait()
+                    self.dropped += 1
+        super().put_nowait(item)
+
+    async def put(self, item):
+        if self.overflow == DROP_OLDEST:
+            return self.put_nowait(item)
+        if self.full() and self._try_coalesce(item):
+            return
+        return await super().put(item)
+
+    def stats(self):
+        return {
+            "depth": self.qsize(),
+            "bytes": self.bytes,
+            "peak_depth": self.peak_depth,
+            "peak_bytes": self.peak_bytes,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
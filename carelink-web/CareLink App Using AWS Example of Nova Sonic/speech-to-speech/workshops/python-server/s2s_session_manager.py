@@ -3,13 +3,19 @@ import json
 import warnings
 import uuid
 from s2s_events import S2sEvent
+from s2s_queues import BoundedEventQueue, DROP_OLDEST, BLOCK, coalesce_text_output
+import s2s_metrics as metrics
+from s2s_vad import VoiceActivityDetector, VAD_MODE, DROP, THIN
+from s2s_prefetch import PatientContext
 import bedrock_knowledge_bases as kb
 import time
 
 from aws_sdk_bedrock_runtime.client import BedrockRuntimeClient, InvokeModelWithBidirectionalStreamOperationInput
 from aws_sdk_bedrock_runtime.models import InvokeModelWithBidirectionalStreamInputChunk, BidirectionalInputPayloadPart
 from aws_sdk_bedrock_runtime.config import Config, HTTPAuthSchemeResolver, SigV4AuthScheme
-from smithy_aws_core.credentials_resolvers.environment import EnvironmentCredentialsResolver
+from smithy_aws_core.credentials_resolvers.static import StaticCredentialsResolver
+from smithy_aws_core.identity import AWSCredentialsIdentity
+from s2s_credentials import refresh_credentials, pooled_client
 
 import boto3
 import json
@@ -18,26 +24,55 @@ import os
 # Suppress warnings
 warnings.filterwarnings("ignore")
 
+# Per-session queue bounds; 0 means unbounded
+AUDIO_QUEUE_MAX_CHUNKS = int(os.environ.get("S2S_AUDIO_QUEUE_MAX_CHUNKS", "200"))
+AUDIO_QUEUE_MAX_BYTES = int(os.environ.get("S2S_AUDIO_QUEUE_MAX_BYTES", str(2 * 1024 * 1024)))
+OUTPUT_QUEUE_MAX_EVENTS = int(os.environ.get("S2S_OUTPUT_QUEUE_MAX_EVENTS", "500"))
+OUTPUT_QUEUE_MAX_BYTES = int(os.environ.get("S2S_OUTPUT_QUEUE_MAX_BYTES", str(8 * 1024 * 1024)))
+# How long Bedrock responses may wait for room in a full output queue before the session is closed
+OUTPUT_STALL_TIMEOUT = float(os.environ.get("S2S_OUTPUT_STALL_TIMEOUT", "30"))
+
 class S2sSessionManager:
     """Manages bidirectional streaming with AWS Bedrock using asyncio"""
     
-    def __init__(self, model_id, region, aws_key, aws_secret, logger=None):
-        """Initialize the stream manager."""
+    def __init__(self, model_id, region, aws_key, aws_secret, logger=None, open_stream=None):
+        """Initialize the stream manager.
+
+        open_stream, when given, is a coroutine function returning the stream to
+        use instead of a Bedrock one (the load-test backend); no AWS clients are
+        created then.
+        """
         self.model_id = model_id
+        self.open_stream = open_stream
         self.region = region
         self.aws_key = aws_key
         self.aws_secret = aws_secret
         if logger:
             self.logger = logger
         
-        # Audio and output queues
-        self.audio_input_queue = asyncio.Queue()
-        self.output_queue = asyncio.Queue()
+        # Audio and output queues. Audio input drops the oldest chunks when the
+        # Bedrock stream falls behind; output blocks the response reader (backpressure)
+        # after first folding text deltas together.
+        self.audio_input_queue = BoundedEventQueue(
+            maxsize=AUDIO_QUEUE_MAX_CHUNKS,
+            max_bytes=AUDIO_QUEUE_MAX_BYTES,
+            overflow=DROP_OLDEST,
+        )
+        self.output_queue = BoundedEventQueue(
+            maxsize=OUTPUT_QUEUE_MAX_EVENTS,
+            max_bytes=OUTPUT_QUEUE_MAX_BYTES,
+            overflow=BLOCK,
+            coalesce=coalesce_text_output,
+        )
+        # Optional speech gate in front of the audio queue (S2S_VAD=drop|thin)
+        self.vad = VoiceActivityDetector() if VAD_MODE in (DROP, THIN) else None
         
         self.response_task = None
+        self.audio_task = None
         self.stream = None
         self.is_active = False
         self.bedrock_client = None
+        self.credentials_expire_at = None
         
         # Session information
         self.prompt_name = None  # Will be set from frontend
@@ -48,64 +83,67 @@ class S2sSessionManager:
         self.toolName = ""
 
         # Boto3 clients
-        self.sts_client = None
         self.lambda_client = None
 
-    def _initialize_client(self):
-        # Get session token from sts using key and secret and set to env varaibles
-        if "AWS_SESSION_TOKEN" not in os.environ:
-            self.sts_client = boto3.client(
-                'sts',
-                aws_access_key_id=self.aws_key,
-                aws_secret_access_key=self.aws_secret,
-                region_name=self.region,
-            )
-            response = self.sts_client.get_session_token(DurationSeconds=7200)
-            credentials = response['Credentials']
-            os.environ["AWS_ACCESS_KEY_ID"] = credentials['AccessKeyId']
-            os.environ["AWS_SECRET_ACCESS_KEY"] = credentials['SecretAccessKey']
-            os.environ["AWS_SESSION_TOKEN"] = credentials['SessionToken']
-
-        # Init Lambda client
-        self.lambda_client = boto3.client('lambda',
-            aws_access_key_id=os.environ["AWS_ACCESS_KEY_ID"],
-            aws_secret_access_key=os.environ["AWS_SECRET_ACCESS_KEY"],
-            aws_session_token=os.environ["AWS_SESSION_TOKEN"],
+        # Patient lookups started at promptStart and reused by tool calls
+        self.patient_context = PatientContext(self.call_lambda, logger)
+
+    def _lambda_client(self, credentials):
+        return boto3.client('lambda',
+            aws_access_key_id=credentials.access_key_id,
+            aws_secret_access_key=credentials.secret_access_key,
+            aws_session_token=credentials.session_token,
             region_name=self.region,
         )
 
+    def _bedrock_client(self, credentials):
         """Initialize the Bedrock client."""
         config = Config(
             endpoint_uri=f"https://bedrock-runtime.{self.region}.amazonaws.com",
             region=self.region,
-            aws_credentials_identity_resolver=EnvironmentCredentialsResolver(),
+            aws_credentials_identity_resolver=StaticCredentialsResolver(credentials=AWSCredentialsIdentity(
+                access_key_id=credentials.access_key_id,
+                secret_access_key=credentials.secret_access_key,
+                session_token=credentials.session_token,
+            )),
             http_auth_scheme_resolver=HTTPAuthSchemeResolver(),
             http_auth_schemes={"aws.auth#sigv4": SigV4AuthScheme()}
         )
-        self.bedrock_client = BedrockRuntimeClient(config=config)
+        return BedrockRuntimeClient(config=config)
+
+    def _initialize_client(self):
+        """Get a session token from STS and the clients signed with it. Blocking; run off the event loop."""
+        credentials = refresh_credentials(self.aws_key, self.aws_secret, self.region)
+        self.credentials_expire_at = credentials.expire_at
+        self.lambda_client = pooled_client('lambda', self.region, credentials, self._lambda_client)
+        self.bedrock_client = pooled_client('bedrock', self.region, credentials, self._bedrock_client)
 
     async def initialize_stream(self):
         """Initialize the bidirectional stream with Bedrock."""
         try:
             #if not self.bedrock_client:
-            self._initialize_client()
-        except Exception as ex:
+            if self.open_stream is None:
+                await asyncio.to_thread(self._initialize_client)
+        except Exception as e:
             self.is_active = False
             self.logger.error(f"Failed to initialize Bedrock client: {str(e)}")
             raise
 
         try:
             # Initialize the stream
-            self.stream = await self.bedrock_client.invoke_model_with_bidirectional_stream(
-                InvokeModelWithBidirectionalStreamOperationInput(model_id=self.model_id)
-            )
+            if self.open_stream is not None:
+                self.stream = await self.open_stream()
+            else:
+                self.stream = await self.bedrock_client.invoke_model_with_bidirectional_stream(
+                    InvokeModelWithBidirectionalStreamOperationInput(model_id=self.model_id)
+                )
             self.is_active = True
             
             # Start listening for responses
             self.response_task = asyncio.create_task(self._process_responses())
 
             # Start processing audio input
-            asyncio.create_task(self._process_audio_input())
+            self.audio_task = asyncio.create_task(self._process_audio_input())
             
             # Wait a bit to ensure everything is set up
             await asyncio.sleep(0.1)
@@ -114,6 +152,7 @@ class S2sSessionManager:
             return self
         except Exception as e:
             self.is_active = False
+            metrics.bedrock_stream_errors.inc("initialize")
             self.logger.error(f"Failed to initialize stream: {str(e)}")
             raise
     
@@ -135,6 +174,7 @@ class S2sSessionManager:
                 self.close()
             
         except Exception as e:
+            metrics.bedrock_stream_errors.inc("send")
             self.logger.error(f"Error sending event: {str(e)}")
     
     async def _process_audio_input(self):
@@ -165,13 +205,25 @@ class S2sSessionManager:
                 self.logger.error(f"Error processing audio: {e}")
     
     def add_audio_chunk(self, prompt_name, content_name, audio_data):
-        """Add an audio chunk to the queue."""
+        """Add an audio chunk to the queue, dropping the oldest chunk if it is full.
+
+        With voice-activity detection enabled, silent chunks are dropped or
+        thinned here, before they take queue space or reach Bedrock.
+        """
         # The audio_data is already a base64 string from the frontend
-        self.audio_input_queue.put_nowait({
-            'prompt_name': prompt_name,
-            'content_name': content_name,
-            'audio_bytes': audio_data
-        })
+        chunks = [audio_data]
+        if self.vad:
+            try:
+                chunks = self.vad.process(audio_data)
+            except Exception as e:
+                # Fail open: an undecodable chunk is forwarded as before
+                self.logger.error(f"VAD error, forwarding chunk: {e}")
+        for chunk in chunks:
+            self.audio_input_queue.put_nowait({
+                'prompt_name': prompt_name,
+                'content_name': content_name,
+                'audio_bytes': chunk
+            })
     
     async def _process_responses(self):
         """Process incoming responses from Bedrock."""
@@ -189,6 +241,7 @@ class S2sSessionManager:
                     event_name = None
                     if 'event' in json_data:
                         event_name = list(json_data["event"].keys())[0]
+                        metrics.events_out.inc(event_name)
                         # Handle tool use detection
                         if event_name == 'toolUse':
                             self.toolUseContent = json_data['event']['toolUse']
@@ -200,7 +253,9 @@ class S2sSessionManager:
                         elif event_name == 'contentEnd' and json_data['event'][event_name].get('type') == 'TOOL':
                             prompt_name = json_data['event']['contentEnd'].get("promptName")
                             self.logger.debug("Processing tool use and sending result")
+                            tool_started = time.perf_counter()
                             tool_result, client_data = await self.processToolUse(self.toolName, self.toolUseContent)
+                            metrics.tool_latency_ms.observe(self.toolName, (time.perf_counter() - tool_started) * 1000)
                             if tool_result or client_data:
                                 # Send tool start event
                                 toolContent = str(uuid.uuid4())
@@ -223,30 +278,54 @@ class S2sSessionManager:
                                 # Send customized client events to client app
                                 if client_data:
                                     client_event = S2sEvent.client_custom(str(uuid.uuid4()), client_data)
-                                    await self.output_queue.put(client_event)
+                                    await self._put_output(client_event)
                                     client_data = None
                     
                     # Put the response in the output queue for forwarding to the frontend
-                    await self.output_queue.put(json_data)
+                    await self._put_output(json_data)
 
             except json.JSONDecodeError as ex:
                 self.logger.error(ex)
-                await self.output_queue.put({"raw_data": response_data})
+                await self._put_output({"raw_data": response_data})
+            except asyncio.TimeoutError:
+                self.logger.warning(f"Output queue stalled for {OUTPUT_STALL_TIMEOUT}s, closing session. Queue: {self.output_queue.stats()}")
+                break
             except StopAsyncIteration as ex:
                 # Stream has ended
                 self.logger.error(ex)
             except Exception as e:
                 # Handle ValidationException properly
                 if "ValidationException" in str(e):
+                    metrics.bedrock_stream_errors.inc("validation")
                     error_message = str(e)
                     self.logger.error(f"Validation error: {error_message}")
                 else:
+                    metrics.bedrock_stream_errors.inc("receive")
                     self.logger.error(f"Error receiving response: {e}")
                 break
 
         self.is_active = False
         self.close()
 
+    async def _put_output(self, event):
+        """Queue an event for the client, waiting at most OUTPUT_STALL_TIMEOUT for room."""
+        if OUTPUT_STALL_TIMEOUT > 0:
+            await asyncio.wait_for(self.output_queue.put(event), timeout=OUTPUT_STALL_TIMEOUT)
+        else:
+            await self.output_queue.put(event)
+
+    def memory_usage(self):
+        """Approximate bytes currently buffered by this session."""
+        return self.audio_input_queue.bytes + self.output_queue.bytes
+
+    def queue_stats(self):
+        return {
+            "audio_input": self.audio_input_queue.stats(),
+            "output": self.output_queue.stats(),
+            "buffered_bytes": self.memory_usage(),
+            **({"vad": self.vad.stats()} if self.vad else {}),
+        }
+
     async def processToolUse(self, toolName, toolUseContent):
         try:
             """Return the tool result"""
@@ -270,15 +349,21 @@ class S2sSessionManager:
                     client_data = {"citation": response.get("body").get("citation")}
 
             if toolName == "getKbTool":
-                result = {"result": kb.retrieve_kb(query)}
+                # Run off the event loop so identical queries from concurrent sessions share one KB call
+                result = {"result": await asyncio.to_thread(kb.retrieve_kb, query)}
             
+            if toolName == "getPatientVitalsTool":
+                result = {"result": await self.patient_context.vitals()}
+
             if toolName == "getDateTool":
                 from datetime import datetime, timezone
                 result = {"result": f"In UTC: {datetime.now(timezone.utc).strftime('%A, %Y-%m-%d %H-%M-%S')}"}
                 
             return result, client_data
         except Exception as ex:
+            metrics.tool_errors.inc(toolName)
             self.logger.error(f"Failed to process ToolUse event. ToolName: {toolName}, ToolUseContext: {toolUseContent} Exception: {ex}")
+            return None, None
     
     async def close(self):
         """Close the stream properly."""
@@ -286,6 +371,7 @@ class S2sSessionManager:
             return
             
         self.is_active = False
+        self.patient_context.close()
         
         if self.stream:
             await self.stream.input_stream.close()
@@ -297,13 +383,20 @@ class S2sSessionManager:
             except asyncio.CancelledError:
                 pass
 
-    def call_lambda(self, function_name, query):
+        # The audio task waits on the input queue, which may never get another chunk
+        if self.audio_task and not self.audio_task.done():
+            self.audio_task.cancel()
+
+    def call_lambda(self, function_name, query, **fields):
+        if self.lambda_client is None:
+            self.logger.warning(f"No Lambda client for this stream backend, not invoking {function_name}")
+            return None
         try:
             # Invoke the Lambda function
             response = self.lambda_client.invoke(
                 FunctionName=function_name,  # replace with your function name
                 InvocationType='RequestResponse',          # 'Event' for async
-                Payload=json.dumps({"query": query})
+                Payload=json.dumps({"query": query, **fields})
             )
 
             # Read and decode the response
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+import s2s_metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+# Bedrock streams opened ahead of time in each worker, so a new connection
+# skips client setup and invoke_model_with_bidirectional_stream. 0 disables the pool.
+WARM_POOL_SIZE = int(os.environ.get("S2S_WARM_POOL_SIZE", "0"))
+WARM_POOL_MAX_AGE_S = float(os.environ.get("S2S_WARM_POOL_MAX_AGE_S", "60"))                  # close idle streams before Bedrock times them out
+WARM_POOL_CREDENTIAL_MARGIN_S = float(os.environ.get("S2S_WARM_POOL_CREDENTIAL_MARGIN_S", "600"))  # stop handing out streams this long before the session token expires
+WARM_POOL_RETRY_S = float(os.environ.get("S2S_WARM_POOL_RETRY_S", "5"))                        # wait after a failed open
+
+
+class StreamPool:
+    """Opened session managers waiting for a connection.
+
+    A background task keeps `size` streams open. Each stream has a deadline:
+    WARM_POOL_MAX_AGE_S after it was opened, or WARM_POOL_CREDENTIAL_MARGIN_S
+    before the session token it was signed with expires, whichever is first.
+    Streams past their deadline are closed and replaced. acquire() hands out
+    the oldest live stream and wakes the task to open another.
+
+    Before opening, the task asks `credentials` (which may refresh the token)
+    when the session token expires. If that is already inside the margin, a
+    new stream could not be handed out anyway, so the pool stops refilling
+    instead of opening streams it would discard.
+    """
+
+    def __init__(self, open_session, size=WARM_POOL_SIZE, max_age=WARM_POOL_MAX_AGE_S, credentials=None):
+        self.open_session = open_session  # coroutine function returning an initialized S2sSessionManager
+        self.credentials = credentials    # blocking callable returning the token's expiry in epoch seconds, or None
+        self.size = size
+        self.max_age = max_age
+        self.ready = deque()  # (deadline, manager), oldest first
+        self._wake = asyncio.Event()
+        self._task = None
+        self._closed = False
+
+    def start(self):
+        if self.size > 0:
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    def deadline(self, manager, opened_at):
+        deadline = opened_at + self.max_age
+        if manager.credentials_expire_at:
+            deadline = min(deadline, manager.credentials_expire_at - WARM_POOL_CREDENTIAL_MARGIN_S)
+        return deadline
+
+    async def acquire(self):
+        """An opened session manager, or None when no live stream is waiting."""
+        if self._task is None:
+            return None
+        now = time.time()
+        manager = None
+        while self.ready and manager is None:
+            deadline, candidate = self.ready.popleft()
+            if deadline > now and candidate.is_active:
+                manager = candidate
+            else:
+                await self._discard(candidate)
+        metrics.warm_pool.inc("hit" if manager else "miss")
+        self._wake.set()
+        return manager
+
+    async def _discard(self, manager):
+        metrics.warm_pool.inc("expired")
+        try:
+            await manager.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled stream: {e}")
+
+    async def _open(self):
+        start = time.perf_counter()
+        manager = await self.open_session()
+        metrics.warm_pool_open_ms.observe((time.perf_counter() - start) * 1000)
+        deadline = self.deadline(manager, time.time())
+        if deadline <= time.time():
+            await self._discard(manager)
+            raise RuntimeError("session token expires too soon to pool a stream")
+        metrics.warm_pool.inc("opened")
+        self.ready.append((deadline, manager))
+
+    async def _expire(self):
+        now = time.time()
+        live = deque()
+        for deadline, manager in self.ready:
+            if deadline > now and manager.is_active:
+                live.append((deadline, manager))
+            else:
+                await self._discard(manager)
+        self.ready = live
+
+    async def _credentials_expiring(self):
+        """True when the session token expires too soon to pool another stream."""
+        if self.credentials is None:
+            return False
+        expire_at = await asyncio.to_thread(self.credentials)
+        if expire_at is None or expire_at - WARM_POOL_CREDENTIAL_MARGIN_S > time.time():
+            return False
+        metrics.warm_pool.inc("credentials_expiring")
+        logger.warning(f"Session token expires in {expire_at - time.time():.0f}s, inside "
+                       f"S2S_WARM_POOL_CREDENTIAL_MARGIN_S; the warm pool stops refilling")
+        return True
+
+    async def _run(self):
+        # wait_for can swallow a cancellation that lands as the event fires, hence the flag
+        while not self._closed:
+            self._wake.clear()
+            await self._expire()
+            missing = self.size - len(self.ready)
+            if missing > 0:
+                try:
+                    if await self._credentials_expiring():
+                        return
+                except Exception as e:
+                    metrics.warm_pool.inc("open_error")
+                    logger.warning(f"Failed to refresh credentials for pooled streams: {e}")
+                    await asyncio.sleep(WARM_POOL_RETRY_S)
+                    continue
+                results = await asyncio.gather(*(self._open() for _ in range(missing)), return_exceptions=True)
+                errors = [r for r in results if isinstance(r, Exception)]
+                if errors:
+                    metrics.warm_pool.inc("open_error", amount=len(errors))
+                    logger.warning(f"Failed to open {len(errors)} pooled streams: {errors[0]}")
+                    await asyncio.sleep(WARM_POOL_RETRY_S)
+                continue
+            # Sleep until the oldest stream expires or a connection takes one
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(0.0, self.ready[0][0] - time.time()))
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self):
+        """Stop refilling and close every waiting stream."""
+        self._closed = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self.ready:
+            _, manager = self.ready.popleft()
+            await manager.close()
+
+    def stats(self):
+        return {"size": self.size, "ready": len(self.ready)}
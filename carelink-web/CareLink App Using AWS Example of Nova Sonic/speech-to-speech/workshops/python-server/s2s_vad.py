@@ -0,0 +1,143 @@
+import base64
+import math
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+import s2s_metrics as metrics
+
+# Voice-activity detection on microphone audio before it is sent to Bedrock.
+# "off" forwards everything, "drop" discards silent chunks, "thin" forwards
+# one silent chunk per S2S_VAD_KEEPALIVE_MS so the stream never goes quiet.
+OFF, DROP, THIN = "off", "drop", "thin"
+VAD_MODE = os.environ.get("S2S_VAD", OFF).lower()
+
+VAD_SAMPLE_RATE = int(os.environ.get("S2S_VAD_SAMPLE_RATE", "16000"))       # 16-bit mono LPCM from the client
+VAD_FRAME_MS = int(os.environ.get("S2S_VAD_FRAME_MS", "20"))                # analysis frame length
+VAD_MIN_DBFS = float(os.environ.get("S2S_VAD_MIN_DBFS", "-50"))             # quieter frames are never speech
+VAD_MARGIN_DB = float(os.environ.get("S2S_VAD_MARGIN_DB", "9"))             # speech must clear the noise floor by this much
+VAD_ZCR_MAX = float(os.environ.get("S2S_VAD_ZCR_MAX", "0.35"))              # crossings per sample; above this, faint audio is hiss
+VAD_FLOOR_RISE_DB_S = float(os.environ.get("S2S_VAD_FLOOR_RISE_DB_S", "3"))  # how fast the noise floor follows louder rooms
+VAD_HANGOVER_MS = int(os.environ.get("S2S_VAD_HANGOVER_MS", "1200"))        # keep sending after speech so turn ends are heard
+VAD_PREROLL_MS = int(os.environ.get("S2S_VAD_PREROLL_MS", "200"))           # silence replayed ahead of a speech onset
+VAD_KEEPALIVE_MS = int(os.environ.get("S2S_VAD_KEEPALIVE_MS", "1000"))      # thin mode: one silent chunk per interval
+
+
+def frame_features(pcm, frame_len):
+    """Energy (dBFS) and zero-crossing rate of each whole frame of int16 samples.
+
+    A chunk shorter than one frame is analysed as a single frame.
+    """
+    count = len(pcm) // frame_len
+    if count == 0:
+        frames = pcm[None, :]
+    else:
+        frames = pcm[:count * frame_len].reshape(count, frame_len)
+    samples = frames.astype(np.float32)
+    rms = np.sqrt(np.mean(samples * samples, axis=1))
+    energy_db = 20 * np.log10(np.maximum(rms, 1.0) / 32768.0)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / max(1, frames.shape[1] - 1)
+    return energy_db, zcr
+
+
+class VoiceActivityDetector:
+    """Per-session speech gate for base64 microphone chunks.
+
+    Each chunk is split into frames. A frame is speech when its energy clears
+    an adaptive noise floor by VAD_MARGIN_DB and its zero-crossing rate looks
+    like voice rather than hiss (very loud frames pass regardless). The noise
+    floor drops straight to the quietest frame seen and rises slowly, so it
+    follows a room that gets noisier. After speech, chunks keep flowing for
+    the hangover window. The last VAD_PREROLL_MS of silence is held back and
+    sent ahead of the next onset so word beginnings are not clipped.
+    """
+
+    def __init__(self, mode=VAD_MODE, sample_rate=VAD_SAMPLE_RATE):
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.frame_len = max(2, sample_rate * VAD_FRAME_MS // 1000)
+        # Start low so a caregiver talking straight away is never gated out;
+        # in a noisy room this forwards some noise until the floor catches up
+        self.noise_floor_db = VAD_MIN_DBFS - VAD_MARGIN_DB
+        self.audio_ms = 0.0
+        self.last_speech_ms = -math.inf
+        self.last_sent_ms = -math.inf
+        self.preroll = deque()  # (chunk, duration_ms)
+        self.preroll_ms = 0.0
+        self.chunks = {}
+        self.bytes_dropped = 0
+
+    def _count(self, decision, chunk=None):
+        self.chunks[decision] = self.chunks.get(decision, 0) + 1
+        metrics.vad_chunks.inc(decision)
+        if decision == "dropped":
+            self.bytes_dropped += len(chunk)
+            metrics.vad_bytes_dropped.inc(amount=len(chunk))
+
+    def is_speech(self, pcm, duration_ms):
+        energy_db, zcr = frame_features(pcm, self.frame_len)
+        quietest = float(energy_db.min())
+        threshold = max(VAD_MIN_DBFS, self.noise_floor_db + VAD_MARGIN_DB)
+        # The zero-crossing test only matters for frames close to the threshold
+        active = (energy_db > threshold) & ((zcr < VAD_ZCR_MAX) | (energy_db > threshold + VAD_MARGIN_DB / 2))
+        self.noise_floor_db = min(quietest, self.noise_floor_db + VAD_FLOOR_RISE_DB_S * duration_ms / 1000)
+        return bool(active.any())
+
+    def _hold(self, audio_base64, duration_ms):
+        """Hold a silent chunk as pre-roll; whatever falls out of the window is dropped."""
+        self.preroll.append((audio_base64, duration_ms))
+        self.preroll_ms += duration_ms
+        while self.preroll and self.preroll_ms - self.preroll[0][1] >= VAD_PREROLL_MS:
+            chunk, held_ms = self.preroll.popleft()
+            self.preroll_ms -= held_ms
+            self._count("dropped", chunk)
+
+    def process(self, audio_base64):
+        """Chunks to forward for one incoming chunk: none, this one, or held pre-roll plus this one."""
+        start = time.perf_counter()
+        raw = base64.b64decode(audio_base64)
+        pcm = np.frombuffer(raw, dtype="<i2", count=len(raw) // 2)
+        if len(pcm) == 0:
+            return [audio_base64]
+        duration_ms = len(pcm) * 1000 / self.sample_rate
+        self.audio_ms += duration_ms
+        speech = self.is_speech(pcm, duration_ms)
+        metrics.vad_process_us.observe((time.perf_counter() - start) * 1e6)
+
+        if speech:
+            self.last_speech_ms = self.audio_ms
+            forward = [chunk for chunk, _ in self.preroll]
+            for _ in forward:
+                self._count("preroll")
+            self.preroll.clear()
+            self.preroll_ms = 0.0
+            self._count("speech")
+            forward.append(audio_base64)
+        elif self.audio_ms - self.last_speech_ms <= VAD_HANGOVER_MS:
+            self._count("hangover")
+            forward = [audio_base64]
+        elif self.mode == THIN and self.audio_ms - self.last_sent_ms >= VAD_KEEPALIVE_MS:
+            # The keepalive is the oldest held chunk, so everything left in the
+            # pre-roll is newer than it and a later onset replays in order
+            self._hold(audio_base64, duration_ms)
+            chunk, held_ms = self.preroll.popleft()
+            self.preroll_ms -= held_ms
+            self._count("keepalive")
+            forward = [chunk]
+        else:
+            self._hold(audio_base64, duration_ms)
+            return []
+
+        self.last_sent_ms = self.audio_ms
+        return forward
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "chunks": dict(self.chunks),
+            "bytes_dropped": self.bytes_dropped,
+            "noise_floor_dbfs": round(self.noise_floor_db, 1),
+        }
@@ -4,10 +4,17 @@ import json
 import logging
 import warnings
 from s2s_session_manager import S2sSessionManager
+from s2s_credentials import refresh_credentials
+from s2s_stream_pool import StreamPool
+from s2s_queues import event_size
+import s2s_metrics as metrics
+import bedrock_knowledge_bases as kb
 import argparse
-import http.server
-import threading
+import multiprocessing
 import os
+import signal
+import socket
+import time
 from http import HTTPStatus
 
 # Configure logging
@@ -29,74 +36,211 @@ if HEALTH_PORT:
     HEALTH_PORT = int(HEALTH_PORT)
 HOST = os.environ["HOST"]
 
-class HealthCheckHandler(http.server.BaseHTTPRequestHandler):
-    def do_GET(self):
-        client_ip = self.client_address[0]
-        logger.info(
-            f"Health check request received from {client_ip} for path: {self.path}"
-        )
+# "bedrock" streams to Nova Sonic; "fake" uses the local stand-in in s2s_fake_backend for load tests
+S2S_BACKEND = os.environ.get("S2S_BACKEND", "bedrock").lower()
+if S2S_BACKEND == "fake":
+    from s2s_fake_backend import open_fake_stream as open_stream
+else:
+    open_stream = None  # S2sSessionManager opens a Bedrock stream
+
+# Per-connection WebSocket buffer limits
+WS_MAX_MESSAGE_BYTES = int(os.environ.get("WS_MAX_MESSAGE_BYTES", str(1024 * 1024)))
+WS_MAX_QUEUE = int(os.environ.get("WS_MAX_QUEUE", "64"))
+WS_WRITE_LIMIT = int(os.environ.get("WS_WRITE_LIMIT", str(256 * 1024)))
+# A client that cannot take a message within this many seconds is disconnected
+WS_SEND_TIMEOUT = float(os.environ.get("WS_SEND_TIMEOUT", "10"))
+
+# Output batching: events already queued are sent together as one JSON array frame.
+# WS_BATCH_MAX_EVENTS=1 restores one frame per event.
+WS_BATCH_MAX_EVENTS = int(os.environ.get("WS_BATCH_MAX_EVENTS", "32"))
+WS_BATCH_MAX_BYTES = int(os.environ.get("WS_BATCH_MAX_BYTES", str(256 * 1024)))
+# Extra time to wait for more events once a batch has started; 0 sends whatever is ready
+WS_BATCH_WINDOW_MS = float(os.environ.get("WS_BATCH_WINDOW_MS", "0"))
+
+# Worker processes sharing the WebSocket port via SO_REUSEPORT; 1 runs a single process
+WS_WORKERS = int(os.environ.get("WS_WORKERS", "1"))
+# On SIGTERM, how long to let in-flight sessions finish before closing them
+WS_DRAIN_TIMEOUT = float(os.environ.get("WS_DRAIN_TIMEOUT", "30"))
+# Sessions per worker before /health reports the worker as not ready; 0 means no limit
+WS_MAX_SESSIONS = int(os.environ.get("WS_MAX_SESSIONS", "0"))
+# With several workers the supervisor serves HEALTH_PORT and worker i serves its own
+# /health and /metrics on WS_WORKER_HEALTH_BASE_PORT + i (default HEALTH_PORT + 1)
+WS_WORKER_HEALTH_BASE_PORT = int(os.environ.get("WS_WORKER_HEALTH_BASE_PORT", "0"))
+# How often the supervisor checks for exited workers, in seconds
+WORKER_CHECK_INTERVAL_S = 1.0
+
+# Open WebSocket connections in this process, mapped to their session manager
+active_sessions = {}
+draining = False
+# Pre-opened streams for new connections (S2S_WARM_POOL_SIZE)
+stream_pool = None
+# Index of this worker, and the per-worker session counts shared with the supervisor
+worker_index = 0
+worker_sessions = None
+# Worker processes by index, only in the supervisor
+worker_processes = None
+
+
+def session_counts():
+    """Return the active session count of every worker."""
+    if worker_sessions is None:
+        return [len(active_sessions)]
+    return list(worker_sessions)
+
+
+def _track_session(websocket, stream_manager=None, active=True):
+    if active:
+        active_sessions[websocket] = stream_manager
+    else:
+        active_sessions.pop(websocket, None)
+    if worker_sessions is not None:
+        worker_sessions[worker_index] = len(active_sessions)
+
+
+def workers_alive():
+    """Return whether each worker process is running; always true inside a worker."""
+    if worker_processes is None:
+        return [True] * len(session_counts())
+    return [process is not None and process.is_alive() for process in worker_processes]
+
+
+def health_status():
+    """Readiness: not ready while draining, with no live worker, or every live worker at WS_MAX_SESSIONS."""
+    counts = session_counts()
+    alive = workers_alive()
+    live_counts = [n for n, up in zip(counts, alive) if up]
+    if draining:
+        status, code = "draining", HTTPStatus.SERVICE_UNAVAILABLE
+    elif not live_counts:
+        status, code = "no_workers", HTTPStatus.SERVICE_UNAVAILABLE
+    elif WS_MAX_SESSIONS and sum(live_counts) >= WS_MAX_SESSIONS * len(live_counts):
+        status, code = "at_capacity", HTTPStatus.SERVICE_UNAVAILABLE
+    else:
+        status, code = "healthy", HTTPStatus.OK
+    return code, {
+        "status": status,
+        "worker": worker_index if worker_processes is None else "supervisor",
+        "sessions": sum(counts),
+        "max_sessions_per_worker": WS_MAX_SESSIONS,
+        "workers": [{"worker": i, "sessions": n, "alive": up} for i, (n, up) in enumerate(zip(counts, alive))],
+    }
+
+
+def supervisor_snapshot():
+    """Session counts and liveness of every worker, from shared memory and the process table."""
+    counts = session_counts()
+    return {
+        "worker": "supervisor",
+        "pid": os.getpid(),
+        "sessions": {"active": sum(counts), "workers": counts},
+        "workers": [
+            {
+                "worker": index,
+                "pid": process.pid if process else None,
+                "alive": up,
+                "exitcode": process.exitcode if process and not up else None,
+                "sessions": counts[index],
+            }
+            for index, (process, up) in enumerate(zip(worker_processes, workers_alive()))
+        ],
+    }
 
-        if self.path == "/health" or self.path == "/":
-            logger.info(f"Responding with 200 OK to health check from {client_ip}")
-            self.send_response(HTTPStatus.OK)
-            self.send_header("Content-Type", "application/json")
-            self.end_headers()
-            response = json.dumps({"status": "healthy"})
-            self.wfile.write(response.encode("utf-8"))
-            logger.info(f"Health check response sent: {response}")
-        else:
-            logger.info(
-                f"Responding with 404 Not Found to request for {self.path} from {client_ip}"
-            )
-            self.send_response(HTTPStatus.NOT_FOUND)
-            self.end_headers()
-
-    def log_message(self, format, *args):
-        # Override to use our logger instead
-        pass
 
+def metrics_snapshot():
+    """Hot-path metrics of this worker, or the supervisor's view of its workers."""
+    if worker_processes is not None:
+        return supervisor_snapshot()
+    managers = [m for m in active_sessions.values() if m is not None]
+    queues = [m.queue_stats() for m in managers]
+    return {
+        "worker": worker_index,
+        "pid": os.getpid(),
+        "sessions": {
+            "active": len(active_sessions),
+            "streaming": len(managers),
+            "warm_streams": len(stream_pool.ready) if stream_pool else 0,
+            "workers": session_counts(),
+        },
+        "queues": {
+            "audio_input_depth": sum(q["audio_input"]["depth"] for q in queues),
+            "audio_input_dropped": sum(q["audio_input"]["dropped"] for q in queues),
+            "output_depth": sum(q["output"]["depth"] for q in queues),
+            "output_max_depth": max((q["output"]["depth"] for q in queues), default=0),
+            "buffered_bytes": sum(q["buffered_bytes"] for q in queues),
+        },
+        "kb_cache": kb.cache_stats(),
+        **metrics.snapshot(),
+    }
 
-def start_health_check_server(health_host, health_port):
-    """Start the HTTP health check server on port 80."""
+
+async def handle_health_request(reader, writer):
+    """Minimal HTTP/1.1 handler for /health and /metrics."""
     try:
-        # Create the server with a socket timeout to prevent hanging
-        httpd = http.server.HTTPServer((health_host, health_port), HealthCheckHandler)
-        httpd.timeout = 5  # 5 second timeout
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=5)
+            if line in (b"\r\n", b"\n", b""):
+                break
 
-        logger.info(f"Starting health check server on {health_host}:{health_port}")
+        parts = request_line.decode("latin-1").split()
+        path = parts[1].split("?")[0] if len(parts) >= 2 else "/"
+        if path in ("/", "/health"):
+            code, body = health_status()
+        elif path == "/metrics":
+            code, body = HTTPStatus.OK, metrics_snapshot()
+        else:
+            code, body = HTTPStatus.NOT_FOUND, {"error": "not found"}
+        logger.debug(f"Health endpoint {path} -> {code.value}")
 
-        # Run the server in a separate thread
-        thread = threading.Thread(target=httpd.serve_forever)
-        thread.daemon = (
-            True  # This ensures the thread will exit when the main program exits
+        payload = json.dumps(body).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {code.value} {code.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + payload
         )
-        thread.start()
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
 
-        # Verify the server is running
-        logger.info(
-            f"Health check server started at http://{health_host}:{health_port}/health"
-        )
-        logger.info(f"Health check thread is alive: {thread.is_alive()}")
 
-        # Try to make a local request to verify the server is responding
-        try:
-            import urllib.request
-
-            with urllib.request.urlopen(
-                f"http://localhost:{health_port}/health", timeout=2
-            ) as response:
-                logger.info(
-                    f"Local health check test: {response.status} - {response.read().decode('utf-8')}"
-                )
-        except Exception as e:
-            logger.warning(f"Local health check test failed: {e}")
+async def start_health_check_server(health_host, health_port, sock=None):
+    """Serve /health and /metrics from the running event loop."""
+    if sock is not None:
+        server = await asyncio.start_server(handle_health_request, sock=sock)
+    else:
+        server = await asyncio.start_server(handle_health_request, health_host, health_port)
+    logger.info(f"Health check server started at http://{health_host}:{health_port}/health")
+    return server
+
+
+def worker_health_port(health_port, index):
+    """Port of worker index's own health server when the supervisor owns health_port."""
+    return (WS_WORKER_HEALTH_BASE_PORT or health_port + 1) + index
+
+
+async def open_session():
+    """Create a session manager for this worker and open its stream."""
+    stream_manager = S2sSessionManager(model_id=NOVA_SONIC_MODEL_ID,
+                                       region=AWS_DEFAULT_REGION,
+                                       aws_key=AWS_ACCESS_KEY_ID,
+                                       aws_secret=AWS_SECRET_ACCESS_KEY,
+                                       logger=logger,
+                                       open_stream=open_stream)
+    return await stream_manager.initialize_stream()
 
-    except Exception as e:
-        logger.error(f"Failed to start health check server: {e}", exc_info=True)
+
+def session_credentials():
+    """Refresh this process's STS session token if needed; returns when it expires."""
+    return refresh_credentials(AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_DEFAULT_REGION).expire_at
 
 
 async def websocket_handler(websocket):
     stream_manager = None
+    forward_task = None
+    _track_session(websocket)
     try:
         async for message in websocket:
             try:
@@ -106,24 +250,26 @@ async def websocket_handler(websocket):
                 if 'event' in data:
                     if stream_manager == None:
                         """Handle WebSocket connections from the frontend."""
-                        # Create a new stream manager for this connection
-                        stream_manager = S2sSessionManager(model_id=NOVA_SONIC_MODEL_ID, 
-                                                           region=AWS_DEFAULT_REGION, 
-                                                           aws_key=AWS_ACCESS_KEY_ID, 
-                                                           aws_secret=AWS_SECRET_ACCESS_KEY, 
-                                                           logger=logger)
-                        
-                        # Initialize the Bedrock stream
-                        await stream_manager.initialize_stream()
+                        # Attach a pre-opened stream if one is waiting, otherwise open one now
+                        setup_start = time.perf_counter()
+                        stream_manager = await stream_pool.acquire() if stream_pool else None
+                        warm = stream_manager is not None
+                        if not warm:
+                            stream_manager = await open_session()
+                        metrics.session_setup_ms.observe("warm" if warm else "cold", (time.perf_counter() - setup_start) * 1000)
+                        _track_session(websocket, stream_manager)
                         
                         # Start a task to forward responses from Bedrock to the WebSocket
                         forward_task = asyncio.create_task(forward_responses(websocket, stream_manager))
 
-                        event_type = list(data['event'].keys())[0]
+                    event_type = list(data['event'].keys())[0]
+                    metrics.events_in.inc(event_type)
 
                     # Store prompt name and content names if provided
                     if event_type and event_type == 'promptStart':
                         stream_manager.prompt_name = data['event']['promptStart']['promptName']
+                        # deviceId is ours, not part of the Nova Sonic event
+                        stream_manager.patient_context.start(data['event']['promptStart'].pop('deviceId', None))
                     elif event_type == 'contentStart' and data['event']['contentStart'].get('type') == 'AUDIO':
                         stream_manager.audio_content_name = data['event']['contentStart']['contentName']
                     
@@ -149,25 +295,65 @@ async def websocket_handler(websocket):
     finally:
         # Clean up
         print("cleaning up")
-        await stream_manager.close()
-        forward_task.cancel()
+        _track_session(websocket, active=False)
+        if stream_manager:
+            await stream_manager.close()
+        if forward_task:
+            forward_task.cancel()
         if websocket:
-            websocket.close()
+            await websocket.close()
+
+
+async def next_batch(queue):
+    """Wait for one event, then collect whatever else is ready within the batch budget."""
+    loop = asyncio.get_running_loop()
+    batch = [await queue.get()]
+    metrics.forward_queue_delay_ms.observe(queue.last_wait * 1000)
+    size = event_size(batch[0])
+    deadline = loop.time() + WS_BATCH_WINDOW_MS / 1000
+
+    while len(batch) < WS_BATCH_MAX_EVENTS and size < WS_BATCH_MAX_BYTES:
+        if queue.empty():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+        else:
+            item = queue.get_nowait()
+        metrics.forward_queue_delay_ms.observe(queue.last_wait * 1000)
+        batch.append(item)
+        size += event_size(item)
+
+    return batch
 
 
 async def forward_responses(websocket, stream_manager):
     """Forward responses from Bedrock to the WebSocket."""
     try:
         while True:
-            # Get next response from the output queue
-            response = await stream_manager.output_queue.get()
+            # Get the next responses from the output queue, in order
+            batch = await next_batch(stream_manager.output_queue)
+            metrics.forward_batch_size.observe(len(batch))
+            metrics.forward_events.inc(amount=len(batch))
+            metrics.forward_frames.inc()
             
-            # Send to WebSocket
+            # Send to WebSocket. A single event is sent as-is, several as a JSON array.
+            # send() waits while the socket's write buffer is above WS_WRITE_LIMIT,
+            # which stops this loop draining the output queue and in turn pauses
+            # the Bedrock response reader.
             try:
-                event = json.dumps(response)
-                await websocket.send(event)
+                event = json.dumps(batch[0] if len(batch) == 1 else batch)
+                await asyncio.wait_for(websocket.send(event), timeout=WS_SEND_TIMEOUT)
             except websockets.exceptions.ConnectionClosed:
                 break
+            except asyncio.TimeoutError:
+                logger.warning(f"Client stalled for {WS_SEND_TIMEOUT}s, closing connection. Queues: {stream_manager.queue_stats()}")
+                await websocket.close()
+                await stream_manager.close()
+                break
     except asyncio.CancelledError:
         # Task was cancelled
         pass
@@ -177,30 +363,151 @@ async def forward_responses(websocket, stream_manager):
         websocket.close()
         stream_manager.close()
 
-async def main(host, port, health_port):
+async def close_session(websocket, stream_manager):
+    """Close a session's Bedrock stream and its WebSocket."""
+    if stream_manager:
+        await stream_manager.close()
+    await websocket.close(code=1001, reason="server shutting down")
+
+
+async def drain_sessions(timeout):
+    """Wait up to timeout seconds for open sessions to finish on their own, then close the rest."""
+    deadline = time.monotonic() + timeout
+    while active_sessions and time.monotonic() < deadline:
+        await asyncio.sleep(0.5)
+    if active_sessions:
+        logger.warning(f"Closing {len(active_sessions)} sessions still open after {timeout}s drain")
+        results = await asyncio.gather(*(close_session(ws, m) for ws, m in list(active_sessions.items())),
+                                       return_exceptions=True)
+        for error in (r for r in results if isinstance(r, Exception)):
+            logger.debug(f"Error closing session: {error}")
 
-    if health_port:
-        try:
-            start_health_check_server(host, health_port)
-        except Exception as ex:
-            print("Failed to start health check endpoint",ex)
 
+async def serve(host, port, health_port=None, reuse_port=False):
+    """Serve WebSocket sessions until SIGTERM/SIGINT, then drain them."""
+    global draining, stream_pool
+    loop = asyncio.get_running_loop()
+    stop = loop.create_future()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, lambda: stop.done() or stop.set_result(None))
+
+    lag_task = asyncio.create_task(metrics.monitor_loop_lag())
+    try:
+        stream_pool = StreamPool(open_session, credentials=session_credentials if open_stream is None else None).start()
+        if health_port:
+            try:
+                await start_health_check_server(host, health_port)
+            except Exception as ex:
+                print("Failed to start health check endpoint",ex)
+
+        async with websockets.serve(websocket_handler, host, port,
+                                    reuse_port=reuse_port,
+                                    max_size=WS_MAX_MESSAGE_BYTES,
+                                    max_queue=WS_MAX_QUEUE,
+                                    write_limit=WS_WRITE_LIMIT) as server:
+            print(f"WebSocket server started at host:{host}, port:{port}, worker:{worker_index}, pid:{os.getpid()}")
+            await stop
+
+            # Stop accepting new connections and let in-flight sessions finish
+            logger.info(f"Worker {worker_index} draining {len(active_sessions)} sessions")
+            draining = True
+            server.close(close_connections=False)
+            await stream_pool.close()
+            await drain_sessions(WS_DRAIN_TIMEOUT)
+    finally:
+        lag_task.cancel()
+
+
+async def main(host, port, health_port):
     """Main function to run the WebSocket server."""
     try:
-        # Start WebSocket server
-        async with websockets.serve(websocket_handler, host, port):
-            print(f"WebSocket server started at host:{host}, port:{port}")
-            
-            # Keep the server running forever
-            await asyncio.Future()
+        await serve(host, port, health_port)
     except Exception as ex:
         print("Failed to start websocket service",ex)
 
+
+def run_worker(index, host, port, health_port):
+    """Entry point of a forked worker process."""
+    global worker_index, worker_processes
+    worker_index = index
+    worker_processes = None  # the supervisor's Process objects are not ours to poll
+    signal.set_wakeup_fd(-1)  # forked from the supervisor's event loop
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the supervisor decides when to stop
+    try:
+        asyncio.run(serve(host, port, health_port, reuse_port=True))
+    except Exception as ex:
+        print(f"Worker {index} failed", ex)
+        os._exit(1)
+    os._exit(0)
+
+
+async def supervise(host, port, health_port, workers):
+    """Keep `workers` worker processes running and serve HEALTH_PORT until SIGTERM/SIGINT."""
+    global worker_sessions, worker_processes, draining
+    worker_sessions = multiprocessing.Array('i', workers, lock=False)
+    worker_processes = [None] * workers
+    context = multiprocessing.get_context("fork")
+    loop = asyncio.get_running_loop()
+    stop = loop.create_future()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, lambda: stop.done() or stop.set_result(None))
+
+    health_socket = socket.create_server((host, health_port)) if health_port else None
+
+    def start_worker(index):
+        if health_socket:
+            health_socket.close()  # workers must not hold the supervisor's port
+        run_worker(index, host, port, worker_health_port(health_port, index) if health_port else None)
+
+    def spawn(index):
+        process = context.Process(target=start_worker, args=(index,), name=f"worker-{index}")
+        process.start()
+        worker_processes[index] = process
+
+    for index in range(workers):
+        spawn(index)
+    health_server = None
+    if health_socket:
+        health_server = await start_health_check_server(host, health_port, sock=health_socket)
+    print(f"Supervisor {os.getpid()} started {workers} workers on host:{host}, port:{port}")
+
+    while not stop.done():
+        await asyncio.wait([stop], timeout=WORKER_CHECK_INTERVAL_S)
+        if stop.done():
+            break
+        for index, process in enumerate(worker_processes):
+            if not process.is_alive():
+                worker_sessions[index] = 0
+                logger.warning(f"Worker {index} (pid {process.pid}) exited with status {process.exitcode}, restarting")
+                spawn(index)
+
+    # Workers drain their own sessions; /health reports draining meanwhile
+    draining = True
+    for process in worker_processes:
+        if process.is_alive():
+            process.terminate()
+    while any(process.is_alive() for process in worker_processes):
+        await asyncio.sleep(WORKER_CHECK_INTERVAL_S / 10)
+    for index in range(workers):
+        worker_sessions[index] = 0
+    if health_server:
+        health_server.close()
+    print("All workers stopped")
+
+
+def run_supervisor(host, port, health_port, workers):
+    """Fork workers that share the port through SO_REUSEPORT and keep them running."""
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise RuntimeError("SO_REUSEPORT is not supported on this platform, run with --workers 1")
+    asyncio.run(supervise(host, port, health_port, workers))
+
 if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description='Nova S2S WebSocket Server')
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
+    parser.add_argument('--workers', type=int, default=WS_WORKERS, help='Number of worker processes sharing the port')
     args = parser.parse_args()
 
     if not AWS_ACCESS_KEY_ID or not AWS_SECRET_ACCESS_KEY:
@@ -209,7 +516,10 @@ if __name__ == "__main__":
         print(f"HOST and PORT are required. Received HOST: {HOST}, PORT: {WS_PORT}")
     else:
         try:
-            asyncio.run(main(HOST, WS_PORT, HEALTH_PORT))
+            if args.workers > 1:
+                run_supervisor(HOST, WS_PORT, HEALTH_PORT, args.workers)
+            else:
+                asyncio.run(main(HOST, WS_PORT, HEALTH_PORT))
         except KeyboardInterrupt:
             print("Server stopped by user")
         except Exception as e:
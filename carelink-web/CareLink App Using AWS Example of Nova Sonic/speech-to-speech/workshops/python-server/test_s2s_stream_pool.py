@@ -0,0 +1,147 @@
+import asyncio
+import time
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+import s2s_credentials
+import s2s_metrics as metrics
+from s2s_stream_pool import WARM_POOL_CREDENTIAL_MARGIN_S, StreamPool
+
+
+class FakeManager:
+    def __init__(self, credentials_expire_at=None):
+        self.credentials_expire_at = credentials_expire_at
+        self.is_active = True
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+        self.is_active = False
+
+
+class StreamPoolCredentialsTest(unittest.IsolatedAsyncioTestCase):
+    """The warm pool must not open paid streams it could never hand out."""
+
+    def setUp(self):
+        self.opened = []
+        self.expire_at = time.time() + 7200
+
+    async def open_session(self):
+        manager = FakeManager(self.expire_at)
+        self.opened.append(manager)
+        return manager
+
+    def credentials(self):
+        return self.expire_at
+
+    async def settle(self, done):
+        for _ in range(100):
+            if done():
+                return
+            await asyncio.sleep(0.01)
+
+    async def test_fills_with_current_credentials(self):
+        pool = StreamPool(self.open_session, size=2, credentials=self.credentials).start()
+        await self.settle(lambda: len(pool.ready) == 2)
+        self.assertEqual(len(self.opened), 2)
+        self.assertIs(await pool.acquire(), self.opened[0])
+        await pool.close()
+
+    async def test_expiring_credentials_stop_refilling_without_opening(self):
+        self.expire_at = time.time() + WARM_POOL_CREDENTIAL_MARGIN_S / 2
+        expiring = metrics.warm_pool.value("credentials_expiring")
+        pool = StreamPool(self.open_session, size=2, credentials=self.credentials).start()
+        await self.settle(lambda: pool._task.done())
+        self.assertEqual(self.opened, [])
+        self.assertTrue(pool._task.done())
+        self.assertIsNone(await pool.acquire())
+        self.assertEqual(metrics.warm_pool.value("credentials_expiring"), expiring + 1)
+        await pool.close()
+
+    async def test_credentials_expiring_after_open_are_discarded(self):
+        # A token supplied from outside has no known expiry until a stream reports one
+        self.expire_at = time.time() + WARM_POOL_CREDENTIAL_MARGIN_S / 2
+        pool = StreamPool(self.open_session, size=1, credentials=lambda: None).start()
+        await self.settle(lambda: self.opened and self.opened[0].closed)
+        self.assertEqual(len(self.opened), 1)
+        self.assertTrue(self.opened[0].closed)
+        self.assertEqual(len(pool.ready), 0)
+        await pool.close()
+
+
+class RefreshCredentialsTest(unittest.TestCase):
+    """Session tokens are fetched only when missing or expiring, and clients follow them."""
+
+    def setUp(self):
+        self.tokens = 0
+        self.expires_in = 7200
+        self.sts = mock.Mock()
+        self.sts.get_session_token.side_effect = self.get_session_token
+        patcher = mock.patch.object(s2s_credentials.boto3, "client", return_value=self.sts)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name in ("_current", "_client_pool"):
+            patcher = mock.patch.object(s2s_credentials, name, getattr(s2s_credentials, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        s2s_credentials._current = None
+        s2s_credentials._client_pool = {}
+
+    def get_session_token(self, DurationSeconds):
+        self.tokens += 1
+        return {"Credentials": {
+            "AccessKeyId": "key",
+            "SecretAccessKey": "secret",
+            "SessionToken": f"token-{self.tokens}",
+            "Expiration": datetime.fromtimestamp(time.time() + self.expires_in, timezone.utc),
+        }}
+
+    def refresh(self):
+        return s2s_credentials.refresh_credentials("id", "secret", "us-east-1")
+
+    def test_reuses_token_until_it_expires_within_refresh_window(self):
+        first = self.refresh()
+        self.assertEqual(first.session_token, "token-1")
+        self.assertAlmostEqual(first.expire_at, time.time() + 7200, delta=5)
+        self.assertIs(self.refresh(), first)
+        self.assertEqual(self.sts.get_session_token.call_count, 1)
+
+        s2s_credentials._current = first._replace(expire_at=time.time() + s2s_credentials.CREDENTIAL_REFRESH_S / 2)
+        self.assertEqual(self.refresh().session_token, "token-2")
+        self.assertEqual(self.sts.get_session_token.call_count, 2)
+
+    def test_supplied_token_is_never_refreshed(self):
+        supplied = s2s_credentials.Credentials("key", "secret", "supplied", None)
+        s2s_credentials._current = supplied
+        self.assertIs(self.refresh(), supplied)
+        self.sts.get_session_token.assert_not_called()
+
+    def test_refresh_swaps_client_pool_without_touching_old_one(self):
+        first = self.refresh()
+        old_pool = s2s_credentials._client_pool
+        client = s2s_credentials.pooled_client("lambda", "us-east-1", first, lambda c: ("lambda", c.session_token))
+        self.assertIs(s2s_credentials.pooled_client("lambda", "us-east-1", first, mock.Mock()), client)
+
+        s2s_credentials._current = first._replace(expire_at=time.time())
+        second = self.refresh()
+        self.assertIsNot(s2s_credentials._client_pool, old_pool)
+        self.assertEqual(old_pool, {("lambda", "us-east-1", "token-1"): client})
+        # A session still holding the old token cannot put its client where new sessions look
+        s2s_credentials.pooled_client("lambda", "us-east-1", first, lambda c: ("lambda", c.session_token))
+        self.assertEqual(
+            s2s_credentials.pooled_client("lambda", "us-east-1", second, lambda c: ("lambda", c.session_token)),
+            ("lambda", "token-2"),
+        )
+
+    def test_concurrent_sessions_fetch_one_token(self):
+        async def initialize_all():
+            return await asyncio.gather(*(asyncio.to_thread(self.refresh) for _ in range(8)))
+
+        results = asyncio.run(initialize_all())
+        self.assertEqual(self.sts.get_session_token.call_count, 1)
+        self.assertEqual({credentials.session_token for credentials in results}, {"token-1"})
+
+
+if __name__ == "__main__":
+    unittest.main()
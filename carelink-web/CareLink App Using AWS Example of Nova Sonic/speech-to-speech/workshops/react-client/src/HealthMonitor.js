@@ -17,6 +17,18 @@ ChartJS.register(LineElement, PointElement, LinearScale, CategoryScale, Legend,
 
 const API_BASE_URL = 'https://pxn0fm1db2.execute-api.eu-north-1.amazonaws.com/prod';
 
+// The charts and the voice prompt read the parallel arrays of a
+// history_format=columns response as they are. A backend that still returns
+// vitals_history (one object per reading) is converted once.
+function columnsFromHistory(history) {
+  return {
+    epoch_ms: history.map((v) => new Date(v.timestamp).getTime()),
+    heart_rate: history.map((v) => v.heart_rate),
+    blood_oxygen: history.map((v) => v.blood_oxygen),
+    temperature: history.map((v) => v.temperature),
+  };
+}
+
 function HealthMonitor() {
   const [aiResult, setAiResult] = useState(null);
   const [loading, setLoading] = useState(false);
@@ -28,12 +40,17 @@ function HealthMonitor() {
         params: {
           device_id: 'carelink-health-monitor',
           months_back: 3,
+          history_format: 'columns',
         }
       });
       const resultBody = JSON.parse(response.data.body);
+      if (!resultBody.vitals_columns) {
+        resultBody.vitals_columns = columnsFromHistory(resultBody.vitals_history || []);
+        delete resultBody.vitals_history;
+      }
       setAiResult(resultBody);
       localStorage.setItem('carelink_summary', resultBody.bedrock_summary || '');
-      localStorage.setItem('carelink_vitals', JSON.stringify(resultBody.vitals_history || []));
+      localStorage.setItem('carelink_vitals_columns', JSON.stringify(resultBody.vitals_columns));
       setLoading(false);
     } catch (error) {
       console.error(error);
@@ -43,19 +60,17 @@ function HealthMonitor() {
   };
 
   const prepareChartData = () => {
-    if (!aiResult || !aiResult.vitals_history) return null;
+    if (!aiResult || !aiResult.vitals_columns) return null;
 
-    const labels = aiResult.vitals_history.map((v) => new Date(v.timestamp).toLocaleString());
-    const heartRateData = aiResult.vitals_history.map((v) => v.heart_rate);
-    const oxygenData = aiResult.vitals_history.map((v) => v.blood_oxygen);
-    const temperatureData = aiResult.vitals_history.map((v) => v.temperature);
+    const columns = aiResult.vitals_columns;
+    const labels = columns.epoch_ms.map((ms) => new Date(ms).toLocaleString());
 
     return {
       labels,
       datasets: [
         {
           label: 'Heart Rate (bpm)',
-          data: heartRateData,
+          data: columns.heart_rate,
           borderColor: '#f87171',
           tension: 0.2,
           pointRadius: 0,
@@ -64,7 +79,7 @@ function HealthMonitor() {
         },
         {
           label: 'Blood Oxygen (%)',
-          data: oxygenData,
+          data: columns.blood_oxygen,
           borderColor: '#60a5fa',
           tension: 0.2,
           pointRadius: 0,
@@ -73,7 +88,7 @@ function HealthMonitor() {
         },
         {
           label: 'Temperature (°C)',
-          data: temperatureData,
+          data: columns.temperature,
           borderColor: '#34d399',
           tension: 0.2,
           pointRadius: 0,
@@ -117,6 +132,9 @@ function HealthMonitor() {
     );
   };
 
+  const vitals = aiResult && aiResult.vitals_columns;
+  const latest = vitals ? vitals.epoch_ms.length - 1 : -1;
+
   return (
     <div style={{ padding: '20px' }}>
       <h1>CareLink: Remote Health Monitor</h1>
@@ -132,7 +150,7 @@ function HealthMonitor() {
       )}
 
       {/* Most Recent Vitals Card */}
-      {aiResult && aiResult.vitals_history && aiResult.vitals_history.length > 0 && (
+      {latest >= 0 && (
         <div style={{
           border: '1px solid #ccc',
           borderRadius: '8px',
@@ -142,10 +160,10 @@ function HealthMonitor() {
           background: '#fafbfc',
         }}>
           <h3>Most Recent Vitals</h3>
-          <div><b>Time:</b> {new Date(aiResult.vitals_history[aiResult.vitals_history.length - 1].timestamp).toLocaleString()}</div>
-          <div><b>Heart Rate:</b> {aiResult.vitals_history[aiResult.vitals_history.length - 1].heart_rate} bpm</div>
-          <div><b>Blood Oxygen:</b> {aiResult.vitals_history[aiResult.vitals_history.length - 1].blood_oxygen} %</div>
-          <div><b>Temperature:</b> {aiResult.vitals_history[aiResult.vitals_history.length - 1].temperature} °C</div>
+          <div><b>Time:</b> {new Date(vitals.epoch_ms[latest]).toLocaleString()}</div>
+          <div><b>Heart Rate:</b> {vitals.heart_rate[latest]} bpm</div>
+          <div><b>Blood Oxygen:</b> {vitals.blood_oxygen[latest]} %</div>
+          <div><b>Temperature:</b> {vitals.temperature[latest]} °C</div>
         </div>
       )}
 
@@ -7,6 +7,9 @@ class S2sEvent {
   
     static DEFAULT_SYSTEM_PROMPT = "You are a friend. The user and you will engage in a spoken dialog exchanging the transcripts of a natural real-time conversation. Keep your responses short, generally two or three sentences for chatty scenarios. You may start each of your sentences with emotions in square brackets such as [amused], [neutral] or any other stage direction such as [joyful]. Only use a single pair of square brackets for indicating a stage command.";
   
+    // Patient whose context the server prefetches for getPatientVitalsTool (the HealthMonitor dashboard's device)
+    static DEFAULT_DEVICE_ID = "carelink-health-monitor";
+
     static DEFAULT_AUDIO_INPUT_CONFIG = {
       mediaType: "audio/lpcm",
       sampleRateHertz: 16000,
@@ -41,6 +44,20 @@ class S2sEvent {
           }
         }
       },
+      {
+        toolSpec: {
+          name: "getPatientVitalsTool",
+          description: "get the patient's most recent vitals readings, and the risk score and trend summary when the server is configured to include them",
+          inputSchema: {
+            json: JSON.stringify({
+                "type": "object",
+                "properties": {},
+                "required": []
+                }
+            )
+          }
+        }
+      },
       {
         toolSpec: {
           name: "getKbTool",
@@ -93,11 +110,13 @@ class S2sEvent {
       return { event: { sessionStart: { inferenceConfiguration: inferenceConfig } } };
     }
   
-    static promptStart(promptName, audioOutputConfig = S2sEvent.DEFAULT_AUDIO_OUTPUT_CONFIG, toolConfig = S2sEvent.DEFAULT_TOOL_CONFIG) {
+    static promptStart(promptName, audioOutputConfig = S2sEvent.DEFAULT_AUDIO_OUTPUT_CONFIG, toolConfig = S2sEvent.DEFAULT_TOOL_CONFIG, deviceId = S2sEvent.DEFAULT_DEVICE_ID) {
       return {
         "event": {
           "promptStart": {
             "promptName": promptName,
+            // Read and removed by the server before the event reaches Bedrock
+            "deviceId": deviceId,
             "textOutputConfiguration": {
               "mediaType": "text/plain"
             },
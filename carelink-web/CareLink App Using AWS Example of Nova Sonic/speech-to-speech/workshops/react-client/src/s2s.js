@@ -275,21 +275,21 @@ class S2sChatBot extends React.Component {
             customPrompt = DEFAULT_PROMPT;
         }
 
-        // Get all vitals history
-        let vitalsHistory = [];
+        // Get all vitals history (parallel arrays stored by the HealthMonitor dashboard)
+        let vitals = null;
         try {
-            vitalsHistory = JSON.parse(localStorage.getItem('carelink_vitals') || '[]');
+            vitals = JSON.parse(localStorage.getItem('carelink_vitals_columns') || 'null');
         } catch (e) {
-            vitalsHistory = [];
+            vitals = null;
         }
         // Format as markdown table with explicit instruction
         let vitalsString = '';
-        if (vitalsHistory.length > 0) {
+        if (vitals && vitals.epoch_ms && vitals.epoch_ms.length > 0) {
             vitalsString = "\n\nHere is the patient's vitals history as a table:\n" +
                 '| Time | Heart Rate | Blood Oxygen | Temperature |\n' +
                 '|------|------------|--------------|-------------|\n' +
-                vitalsHistory.map(v =>
-                    `| ${new Date(v.timestamp).toLocaleString()} | ${v.heart_rate} | ${v.blood_oxygen} | ${v.temperature} |`
+                vitals.epoch_ms.map((ms, i) =>
+                    `| ${new Date(ms).toLocaleString()} | ${vitals.heart_rate[i]} | ${vitals.blood_oxygen[i]} | ${vitals.temperature[i]} |`
                 ).join('\n') +
                 '\n\nIf you are asked for a value at a specific time, look it up in the table above and answer precisely.';
         }
@@ -354,9 +354,13 @@ class S2sChatBot extends React.Component {
               };
 
             // Handle incoming messages
+            // The server may batch several events into one JSON array frame
             this.socket.onmessage = (message) => {
-                const event = JSON.parse(message.data);
-                this.handleIncomingMessage(event);
+                const data = JSON.parse(message.data);
+                const events = Array.isArray(data) ? data : [data];
+                for (const event of events) {
+                    this.handleIncomingMessage(event);
+                }
             };
         
             // Handle errors